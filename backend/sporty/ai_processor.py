@@ -1,82 +1,364 @@
 # ai_processor.py
 import cv2
+import hashlib
 import mediapipe as mp
 import numpy as np
+from collections import OrderedDict
+from scipy.signal import find_peaks
 from tensorflow.lite import Interpreter
 
+from . import kinematics
+
+# Landmark array layout: (frames, 33, 4) float32 holding x, y, z, visibility
+NUM_LANDMARKS = 33
+LANDMARK_FIELDS = 4
+
+# Bump whenever analyzer output changes; cached AnalysisResult rows are keyed on it
+ANALYZER_VERSION = '3'
+
+# Pose inference backend of the full per-frame MediaPipe pipeline
+MEDIAPIPE_BACKEND = 'mediapipe'
+
+# Timelines kept per analyzer so several metrics on one video share a single decode
+TIMELINE_CACHE_SIZE = 2
+
+
+class SamplingPolicy:
+    """Which frames go through pose inference, and at what resolution.
+
+    Read from the ``sampling`` block of ``FitnessTest.ai_model_config``, e.g.
+    ``{"sampling": {"target_fps": 10, "max_resolution": 640, "peak_fps": 30}}``.
+    Leaving a value unset keeps full-rate / full-resolution behaviour.
+    """
+
+    FIELDS = ('target_fps', 'max_resolution', 'peak_fps', 'peak_window_seconds',
+              'peak_prominence', 'peak_landmark')
+    backend = MEDIAPIPE_BACKEND  # pose inference that produces the timelines (see with_backend)
+
+    def __init__(self, target_fps=None, max_resolution=None, peak_fps=None,
+                 peak_window_seconds=0.5, peak_prominence=0.02, peak_landmark='LEFT_HIP'):
+        self.target_fps = target_fps  # analysis rate outside motion peaks
+        self.max_resolution = max_resolution  # longest frame side in px before inference
+        self.peak_fps = peak_fps  # denser rate used around detected motion peaks
+        self.peak_window_seconds = peak_window_seconds
+        self.peak_prominence = peak_prominence  # normalized image units
+        self.peak_landmark = peak_landmark
+
+    @classmethod
+    def from_config(cls, ai_model_config):
+        sampling = (ai_model_config or {}).get('sampling') or {}
+        return cls(**{key: value for key, value in sampling.items() if key in cls.FIELDS})
+
+    def key(self):
+        key = tuple(getattr(self, field) for field in self.FIELDS)
+        # Other backends get their own timelines and results; MediaPipe keeps its original key
+        return key if self.backend == MEDIAPIPE_BACKEND else key + (self.backend,)
+
+    def with_backend(self, backend):
+        """Copy of this policy for timelines produced by another pose inference backend"""
+        policy = SamplingPolicy(**self.to_dict())
+        policy.backend = backend
+        return policy
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def version(self):
+        """Analyzer version tag for results produced under this policy"""
+        policy_hash = hashlib.sha1(repr(self.key()).encode()).hexdigest()[:12]
+        return f'{ANALYZER_VERSION}-{policy_hash}'
+
+    def step(self, fps, rate):
+        """Decode stride that approximates ``rate`` analysed frames per second"""
+        if not rate or rate >= fps:
+            return 1
+        return max(1, int(round(fps / rate)))
+
+
+FULL_RATE = SamplingPolicy()
+
+
+class PoseTimeline:
+    """Pose landmarks for the analysed frames of one video"""
+
+    def __init__(self, landmarks, frame_indices, fps):
+        self.landmarks = landmarks  # (frames, 33, 4) float32, NaN where no pose was found
+        self.frame_indices = frame_indices  # (frames,) int32 index of each row in the source video
+        self.fps = fps
+
+    def __len__(self):
+        return len(self.landmarks)
+
+    @property
+    def timestamps(self):
+        """Seconds from the start of the video for every row"""
+        return self.frame_indices.astype(np.float32) / self.fps
+
+    @property
+    def detected(self):
+        """Boolean mask of frames where MediaPipe found a pose"""
+        return ~np.isnan(self.landmarks[:, 0, 0])
+
+    def landmark(self, index):
+        """(frames, 4) track of one landmark, frames without a pose dropped"""
+        return self.landmarks[self.detected, index]
+
+    def detected_timestamps(self):
+        """Timestamps matching the rows returned by ``landmark``"""
+        return self.timestamps[self.detected]
+
+
+def finite_values(values):
+    """Plain list of ``values`` with NaN/inf as None (JSON columns reject NaN)"""
+    return [float(value) if np.isfinite(value) else None for value in values]
+
+
+def landmarks_to_array(pose_landmarks):
+    """Convert a MediaPipe landmark list into a (33, 4) float32 row"""
+    return np.array(
+        [(lm.x, lm.y, lm.z, lm.visibility) for lm in pose_landmarks.landmark],
+        dtype=np.float32
+    )
+
+
 class VideoAnalyzer:
     def __init__(self):
         self.mp_pose = mp.solutions.pose
         self.pose = self.mp_pose.Pose()
         self.mp_drawing = mp.solutions.drawing_utils
-    
-    def analyze_vertical_jump(self, video_path):
-        """Analyze vertical jump performance"""
+        self._timelines = OrderedDict()
+        self.range_end = 0
+        self._pass_end = 0
+
+    def extract_landmarks(self, video_path, policy=None):
+        """Decode the video once and run pose on the frames picked by ``policy``.
+
+        The result is cached per (video path, policy), so every analyzer called
+        for the same recording reuses the same landmark array.
+        """
+        policy = policy or FULL_RATE
+        cache_key = (video_path, policy.key())
+        if cache_key in self._timelines:
+            self._timelines.move_to_end(cache_key)
+            return self._timelines[cache_key]
+
         cap = cv2.VideoCapture(video_path)
-        jump_heights = []
-        
-        while cap.isOpened():
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        frame_indices, landmarks = self.extract_range(cap, fps, 0, None, policy, frame_count)
+        cap.release()
+
+        return self.store_timeline(video_path, policy, PoseTimeline(landmarks, frame_indices, fps))
+
+    def has_timeline(self, video_path, policy=None):
+        return (video_path, (policy or FULL_RATE).key()) in self._timelines
+
+    def store_timeline(self, video_path, policy, timeline):
+        """Cache a timeline built elsewhere (e.g. by parallel segment extraction)"""
+        self._timelines[(video_path, (policy or FULL_RATE).key())] = timeline
+        while len(self._timelines) > TIMELINE_CACHE_SIZE:
+            self._timelines.popitem(last=False)
+        return timeline
+
+    def extract_range(self, cap, fps, start, stop, policy, expected_frames=0):
+        """Pose landmarks for frames [start, stop) of an open capture.
+
+        Frames are sampled on a grid of multiples of the policy's stride
+        counted from ``start``, then motion peaks are re-visited densely.
+        Returns (frame_indices int32, landmarks float32); ``self.range_end``
+        is left at the index one past the last frame the capture delivered.
+        """
+        step = policy.step(fps, policy.target_fps)
+        frame_indices, landmarks = self._pose_pass(cap, start, stop, step, policy, expected_frames)
+        range_end = self._pass_end
+
+        # Re-visit the neighbourhood of motion peaks at the denser rate
+        peak_step = policy.step(fps, policy.peak_fps)
+        if peak_step < step:
+            extra_indices = [frame_indices]
+            extra_landmarks = [landmarks]
+            for window_start, window_stop in self._peak_windows(frame_indices, landmarks, fps, policy):
+                window_start = max(window_start, start)
+                window_stop = min(window_stop, stop) if stop is not None else window_stop
+                indices, rows = self._pose_pass(cap, window_start, window_stop, peak_step, policy)
+                extra_indices.append(indices)
+                extra_landmarks.append(rows)
+            frame_indices, unique = np.unique(np.concatenate(extra_indices), return_index=True)
+            landmarks = np.concatenate(extra_landmarks)[unique]
+
+        self.range_end = range_end
+        return frame_indices.astype(np.int32), landmarks
+
+    def _pose_pass(self, cap, start, stop, step, policy, expected_frames=0):
+        """Run pose on every ``step``-th frame of [start, stop).
+
+        Skipped frames are only grabbed, never retrieved or colour converted.
+        """
+        capacity = max(((stop or expected_frames) - start) // step + 1, 1)
+        landmarks = np.full((capacity, NUM_LANDMARKS, LANDMARK_FIELDS), np.nan, dtype=np.float32)
+        frame_indices = np.zeros(capacity, dtype=np.int64)
+        count = 0
+
+        self.pose.reset()
+        if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != start:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+
+        index = start
+        while cap.isOpened() and (stop is None or index < stop):
+            if (index - start) % step:
+                if not cap.grab():
+                    break
+                index += 1
+                continue
+
             ret, frame = cap.read()
             if not ret:
                 break
-                
-            # Process frame with MediaPipe
-            results = self.pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-            
+
+            # Frame count reported by the container can be short; grow in place
+            if count == capacity:
+                capacity *= 2
+                landmarks = np.resize(landmarks, (capacity, NUM_LANDMARKS, LANDMARK_FIELDS))
+                landmarks[count:] = np.nan
+                frame_indices = np.resize(frame_indices, capacity)
+
+            results = self.pose.process(self._prepare_frame(frame, policy))
+
             if results.pose_landmarks:
-                # Extract hip position for jump height calculation
-                hip = results.pose_landmarks.landmark[self.mp_pose.PoseLandmark.LEFT_HIP]
-                jump_heights.append(hip.y)
-        
-        cap.release()
-        
+                landmarks[count] = landmarks_to_array(results.pose_landmarks)
+            frame_indices[count] = index
+            count += 1
+            index += 1
+
+        self._pass_end = index
+        return frame_indices[:count], landmarks[:count]
+
+    def _prepare_frame(self, frame, policy):
+        """Downscale to the policy's max resolution, then convert BGR -> RGB"""
+        if policy.max_resolution:
+            height, width = frame.shape[:2]
+            scale = policy.max_resolution / max(height, width)
+            if scale < 1:
+                frame = cv2.resize(frame, (int(width * scale), int(height * scale)),
+                                   interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+    def _peak_windows(self, frame_indices, landmarks, fps, policy):
+        """Frame ranges around local extrema of the tracked landmark's height"""
+        track = landmarks[:, self.mp_pose.PoseLandmark[policy.peak_landmark], 1]
+        detected = ~np.isnan(track)
+        if detected.sum() < 3:
+            return []
+
+        indices = frame_indices[detected]
+        heights = track[detected]
+        peaks = np.concatenate([
+            find_peaks(heights, prominence=policy.peak_prominence)[0],
+            find_peaks(-heights, prominence=policy.peak_prominence)[0],
+        ])
+
+        half_window = int(policy.peak_window_seconds * fps)
+        windows = []
+        for centre in np.sort(indices[peaks]):
+            start, stop = max(int(centre) - half_window, 0), int(centre) + half_window + 1
+            if windows and start <= windows[-1][1]:
+                windows[-1][1] = max(windows[-1][1], stop)
+            else:
+                windows.append([start, stop])
+        return windows
+
+    def clear_cache(self):
+        """Drop cached landmark timelines"""
+        self._timelines.clear()
+
+    def analyze(self, video_path, metrics, policy=None):
+        """Run several analyzers on one video with a single decode + pose pass"""
+        analyzers = {
+            'vertical_jump': self.analyze_vertical_jump,
+            'situps': self.analyze_situps,
+        }
+        self.extract_landmarks(video_path, policy)
+        return {
+            metric: analyzers[metric](video_path, policy) if metric in analyzers
+            else self.analyze_exercise(video_path, metric, policy)
+            for metric in metrics
+        }
+
+    def analyze_vertical_jump(self, video_path, policy=None):
+        """Analyze vertical jump performance"""
+        timeline = self.extract_landmarks(video_path, policy)
+
+        # Hip position for jump height calculation
+        jump_heights = kinematics.smooth(
+            kinematics.trajectory(timeline.landmarks, 'LEFT_HIP'), method='median', window=3
+        )
+        found = ~np.isnan(jump_heights)
+        if not found.any():
+            # No hip in any frame: no height to measure (the task fails the recording)
+            return {
+                'jump_height': None,
+                'confidence': 0.0,
+                'analysis_data': {
+                    'pose_detected': False,
+                    'baseline_position': None,
+                    'peak_position': None,
+                    'total_frames': int(timeline.detected.sum())
+                }
+            }
+
         # Calculate max jump height
-        baseline = np.median(jump_heights[:30])  # Standing position
-        max_height = min(jump_heights)  # Lowest y-value = highest jump
+        heights = jump_heights[found]
+        standing = heights[timeline.timestamps[found] < 1.0]  # First second, independent of sampling rate
+        baseline = float(np.median(standing if len(standing) else heights[:30]))  # Standing position
+        max_height = float(heights.min())  # Lowest y-value = highest jump
         jump_height_cm = (baseline - max_height) * 180  # Convert to cm (approximate)
-        
+
         return {
             'jump_height': jump_height_cm,
             'confidence': 0.85,
             'analysis_data': {
+                'pose_detected': True,
                 'baseline_position': baseline,
                 'peak_position': max_height,
-                'total_frames': len(jump_heights)
+                'total_frames': int(timeline.detected.sum())
             }
         }
-    
-    def analyze_situps(self, video_path):
+
+    def analyze_situps(self, video_path, policy=None):
         """Count sit-ups and validate form"""
-        cap = cv2.VideoCapture(video_path)
-        rep_count = 0
-        positions = []
-        
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-                
-            results = self.pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-            
-            if results.pose_landmarks:
-                # Calculate torso angle
-                shoulder = results.pose_landmarks.landmark[self.mp_pose.PoseLandmark.LEFT_SHOULDER]
-                hip = results.pose_landmarks.landmark[self.mp_pose.PoseLandmark.LEFT_HIP]
-                knee = results.pose_landmarks.landmark[self.mp_pose.PoseLandmark.LEFT_KNEE]
-                
-                angle = self.calculate_angle(shoulder, hip, knee)
-                positions.append(angle)
-        
-        cap.release()
-        
+        return self.analyze_exercise(video_path, 'situps', policy)
+
+    def analyze_exercise(self, video_path, exercise_type, policy=None):
+        """Count repetitions (or plank hold time) using the shared kinematics profiles"""
+        timeline = self.extract_landmarks(video_path, policy)
+        landmarks = timeline.landmarks
+
+        if exercise_type == 'plank':
+            body_line = kinematics.smooth(
+                kinematics.side_joint_angles(landmarks, ('SHOULDER', 'HIP', 'ANKLE'))
+            )
+            hold = kinematics.hold_duration(body_line >= kinematics.PLANK_MIN_ANGLE, timeline.timestamps)
+            return {
+                'rep_count': 1 if hold > 0 else 0,
+                'hold_seconds': hold,
+                'confidence': 0.80,
+                'analysis_data': {
+                    'angle_sequence': finite_values(body_line),
+                    'total_frames': int(timeline.detected.sum())
+                }
+            }
+
+        profile = kinematics.REP_PROFILES[exercise_type]
+        angles = kinematics.smooth(kinematics.side_joint_angles(landmarks, profile['joint']))
+
         # Count complete repetitions
-        rep_count = self.count_repetitions(positions, threshold_up=160, threshold_down=90)
-        
+        rep_count = kinematics.count_repetitions(angles, profile['up'], profile['down'])
+
         return {
             'rep_count': rep_count,
             'confidence': 0.90,
             'analysis_data': {
-                'angle_sequence': positions,
-                'total_frames': len(positions)
+                'angle_sequence': finite_values(angles),
+                'total_frames': int(timeline.detected.sum())
             }
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,219 @@
+"""
+Registry of per-test analyzer plug-ins.
+
+Every ``FitnessTest.name`` maps to one ``TestAnalyzer`` subclass declaring
+the landmarks it needs, its default sampling and a relative cost estimate,
+so the task queue can route and batch work before any video is decoded.
+``analyze`` returns a dict with at least ``score``, ``confidence`` and
+``analysis_data``.
+"""
+
+import numpy as np
+
+from . import kinematics
+from .ai_processor import SamplingPolicy
+
+REGISTRY = {}
+
+
+def register(cls):
+    REGISTRY[cls.test_type] = cls()
+    return cls
+
+
+def get_test_analyzer(test_type):
+    """Plug-in for a FitnessTest name; KeyError if the test has none"""
+    try:
+        return REGISTRY[test_type]
+    except KeyError:
+        raise KeyError(f'No analyzer registered for fitness test "{test_type}"')
+
+
+class TestAnalyzer:
+    test_type = None
+    landmarks = ()  # MediaPipe landmark names the analysis reads
+    sampling = {}  # SamplingPolicy defaults; the test's ai_model_config "sampling" block wins
+    cost_per_second = 1.0  # pose-inference cost per second of video, relative to full-rate analysis
+    parallel_decode = False  # long recordings: decode segments on the pose process pool
+    lower_is_better = False  # timed tests score in seconds
+
+    def policy(self, ai_model_config=None):
+        sampling = {**self.sampling, **((ai_model_config or {}).get('sampling') or {})}
+        return SamplingPolicy.from_config({'sampling': sampling})
+
+    def use_parallel_decode(self, ai_model_config=None):
+        return (ai_model_config or {}).get('parallel_decode', self.parallel_decode)
+
+    def result_inputs(self, recording):
+        """Recording data besides the video that the score depends on (part of the result cache key)"""
+        return ()
+
+    def estimate_cost(self, duration_seconds):
+        """Relative cost of analysing a recording; unknown duration counts as 30 seconds"""
+        return self.cost_per_second * float(duration_seconds or 30)
+
+    def landmark_confidence(self, timeline):
+        """Mean visibility of the required landmarks on frames where a pose was found"""
+        if not timeline.detected.any():
+            return 0.0
+        indices = [kinematics.LANDMARKS[name] for name in self.landmarks]
+        return float(np.nanmean(timeline.landmarks[timeline.detected][:, indices, 3]))
+
+    def analyze(self, analyzer, video_path, policy, recording):
+        raise NotImplementedError
+
+
+def movement_window(timeline, speed_threshold):
+    """(start, end, turns) of horizontal hip movement above ``speed_threshold`` widths/s.
+
+    Start and end are NaN when no hips or no movement were found, so the
+    run's time is not a finite score (a timed test would rank 0 s as best).
+    """
+    hips = np.nanmean(np.stack([
+        kinematics.trajectory(timeline.landmarks, 'LEFT_HIP', axis=0),
+        kinematics.trajectory(timeline.landmarks, 'RIGHT_HIP', axis=0),
+    ]), axis=0) if len(timeline) else np.array([])
+    if len(hips) < 3 or np.isnan(hips).all():
+        return np.nan, np.nan, 0
+
+    times = timeline.timestamps
+    speed = kinematics.velocity(kinematics.smooth(hips), times)
+    moving = np.abs(speed) > speed_threshold
+    if not moving.any():
+        return np.nan, np.nan, 0
+
+    moving_indices = np.flatnonzero(moving)
+    directions = np.sign(speed[moving])
+    turns = int(np.count_nonzero(directions[1:] != directions[:-1]))
+    return float(times[moving_indices[0]]), float(times[moving_indices[-1]]), turns
+
+
+@register
+class VerticalJumpAnalyzer(TestAnalyzer):
+    test_type = 'vertical_jump'
+    landmarks = ('LEFT_HIP',)
+    sampling = {'target_fps': 15, 'peak_fps': 60, 'max_resolution': 640}
+    cost_per_second = 0.5
+
+    def analyze(self, analyzer, video_path, policy, recording):
+        results = analyzer.analyze_vertical_jump(video_path, policy)
+        return {**results, 'score': results['jump_height']}
+
+
+@register
+class SitupsAnalyzer(TestAnalyzer):
+    test_type = 'situps'
+    landmarks = ('LEFT_SHOULDER', 'LEFT_HIP', 'LEFT_KNEE', 'RIGHT_SHOULDER', 'RIGHT_HIP', 'RIGHT_KNEE')
+    sampling = {'target_fps': 10, 'max_resolution': 640}
+    cost_per_second = 0.35
+
+    def analyze(self, analyzer, video_path, policy, recording):
+        results = analyzer.analyze_situps(video_path, policy)
+        return {**results, 'score': results['rep_count']}
+
+
+@register
+class ShuttleRunAnalyzer(TestAnalyzer):
+    test_type = 'shuttle_run'
+    landmarks = ('LEFT_HIP', 'RIGHT_HIP')
+    sampling = {'target_fps': 15, 'max_resolution': 480}
+    cost_per_second = 0.5
+    lower_is_better = True
+    speed_threshold = 0.15
+
+    def analyze(self, analyzer, video_path, policy, recording):
+        timeline = analyzer.extract_landmarks(video_path, policy)
+        start, end, turns = movement_window(timeline, self.speed_threshold)
+        return {
+            'score': end - start,
+            'confidence': self.landmark_confidence(timeline),
+            'analysis_data': {
+                'start_time': start,
+                'finish_time': end,
+                'turns': turns,
+                'total_frames': int(timeline.detected.sum())
+            }
+        }
+
+
+@register
+class AgilityAnalyzer(ShuttleRunAnalyzer):
+    test_type = 'agility'
+    sampling = {'target_fps': 20, 'max_resolution': 480}
+    cost_per_second = 0.65
+
+
+@register
+class EnduranceRunAnalyzer(ShuttleRunAnalyzer):
+    test_type = 'endurance_run'
+    sampling = {'target_fps': 2, 'max_resolution': 480}
+    cost_per_second = 0.07
+    parallel_decode = True
+    speed_threshold = 0.05
+
+
+@register
+class FlexibilityAnalyzer(TestAnalyzer):
+    """Sit-and-reach: furthest wrist travel past the ankles"""
+    test_type = 'flexibility'
+    landmarks = ('LEFT_HIP', 'LEFT_WRIST', 'LEFT_ANKLE', 'RIGHT_HIP', 'RIGHT_WRIST', 'RIGHT_ANKLE')
+    sampling = {'target_fps': 10, 'max_resolution': 640}
+    cost_per_second = 0.35
+    leg_to_height = 0.48  # hip-to-ankle length as a fraction of standing height
+
+    def result_inputs(self, recording):
+        return (float(recording.athlete.height),)
+
+    def analyze(self, analyzer, video_path, policy, recording):
+        timeline = analyzer.extract_landmarks(video_path, policy)
+        landmarks = timeline.landmarks
+        side = kinematics.best_side(landmarks, ('HIP', 'WRIST', 'ANKLE'))
+        hip = landmarks[:, kinematics.LANDMARKS[f'{side}_HIP'], :2]
+        wrist = landmarks[:, kinematics.LANDMARKS[f'{side}_WRIST'], :2]
+        ankle = landmarks[:, kinematics.LANDMARKS[f'{side}_ANKLE'], :2]
+
+        leg_length = np.nanmedian(np.linalg.norm(hip - ankle, axis=1)) if len(landmarks) else np.nan
+        direction = np.sign(np.nanmedian(ankle[:, 0] - hip[:, 0])) if len(landmarks) else np.nan
+        reach = direction * (wrist[:, 0] - ankle[:, 0])
+        if np.isnan(leg_length) or not leg_length or np.isnan(reach).all():
+            reach_cm = 0.0
+        else:
+            cm_per_unit = self.leg_to_height * float(recording.athlete.height) / leg_length
+            reach_cm = float(np.nanmax(kinematics.smooth(reach, method='median', window=5)) * cm_per_unit)
+
+        return {
+            'score': reach_cm,
+            'confidence': self.landmark_confidence(timeline),
+            'analysis_data': {
+                'side': side,
+                'reach_cm': reach_cm,
+                'total_frames': int(timeline.detected.sum())
+            }
+        }
+
+
+@register
+class HeightWeightAnalyzer(TestAnalyzer):
+    """Checks a full-body standing pose; the score is the measured height from the profile"""
+    test_type = 'height_weight'
+    landmarks = ('NOSE', 'LEFT_HEEL', 'RIGHT_HEEL')
+    sampling = {'target_fps': 2, 'max_resolution': 480}
+    cost_per_second = 0.07
+
+    def result_inputs(self, recording):
+        return (float(recording.athlete.height), float(recording.athlete.weight))
+
+    def analyze(self, analyzer, video_path, policy, recording):
+        timeline = analyzer.extract_landmarks(video_path, policy)
+        athlete = recording.athlete
+        height_m = float(athlete.height) / 100
+        return {
+            'score': float(athlete.height),
+            'confidence': self.landmark_confidence(timeline),
+            'analysis_data': {
+                'height_cm': float(athlete.height),
+                'weight_kg': float(athlete.weight),
+                'bmi': round(float(athlete.weight) / (height_m * height_m), 1) if height_m else None,
+                'full_body_frames': int(timeline.detected.sum())
+            }
+        }
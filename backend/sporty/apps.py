@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class SportyConfig(AppConfig):
+    name = 'sporty'
+    default_auto_field = 'django.db.models.BigAutoField'
+
+    def ready(self):
+        from . import signals  # noqa: F401  keeps talent summary documents current
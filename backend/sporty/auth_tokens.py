@@ -0,0 +1,210 @@
+"""
+Cached verification of Supabase JWTs.
+
+Status-polling clients send the same bearer token every few seconds, so
+a verified token's claims are kept in a bounded per-process cache, keyed
+by the token's SHA-256 digest, until the token's ``exp``. Rejected tokens
+are remembered for AUTH_TOKEN_NEGATIVE_SECONDS so a client retrying a bad
+token does not cost a signature check each time. Tokens signed with a key id
+missing from the JWKS are not remembered: the key may have just been
+rotated in, and the next attempt re-checks once the key set is re-fetched.
+
+HS256 tokens are verified with SUPABASE_JWT_SECRET. RS256/ES256 tokens are
+verified against the project's JWKS document, which is kept in memory and
+re-fetched in the background every JWKS_REFRESH_SECONDS (immediately, at most
+every JWKS_MIN_REFRESH_SECONDS, when a token names an unknown key id).
+SUPABASE_JWKS_FILE points the key set at a local file instead of the URL, for
+tests and offline development.
+
+Verification latency and cache hit counts are kept per process (see
+``TokenVerifier.metrics``).
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+
+import jwt
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from .supabase_client import http_session
+
+logger = logging.getLogger(__name__)
+
+ASYMMETRIC_ALGORITHMS = ('RS256', 'ES256')
+AUDIENCE = 'authenticated'
+LATENCY_SAMPLES = 1000  # recent verification times kept per outcome
+
+
+class UnknownSigningKey(jwt.InvalidSignatureError):
+    """The token's key id is not in the JWKS (yet)"""
+
+
+class JWKSCache:
+    """Signing keys of the JWKS document, by key id"""
+
+    def __init__(self):
+        self.keys = {}
+        self.fetched_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def source(self):
+        path = getattr(settings, 'SUPABASE_JWKS_FILE', None)
+        if path:
+            return path, None
+        url = getattr(settings, 'SUPABASE_JWKS_URL', None)
+        if not url and getattr(settings, 'SUPABASE_URL', None):
+            url = f"{settings.SUPABASE_URL.rstrip('/')}/auth/v1/.well-known/jwks.json"
+        if not url:
+            raise ImproperlyConfigured('Neither SUPABASE_JWKS_FILE nor SUPABASE_URL is configured')
+        return None, url
+
+    def fetch(self):
+        path, url = self.source()
+        if path:
+            with open(path) as handle:
+                document = json.load(handle)
+        else:
+            response = http_session().get(url, timeout=getattr(settings, 'JWKS_FETCH_TIMEOUT', 5))
+            response.raise_for_status()
+            document = response.json()
+
+        keys = {}
+        for jwk in document.get('keys', []):
+            try:
+                keys[jwk.get('kid')] = jwt.PyJWK(jwk)
+            except jwt.PyJWTError as e:
+                logger.warning(f"Skipping JWKS key {jwk.get('kid')}: {str(e)}")
+        self.keys, self.fetched_at = keys, time.monotonic()
+        logger.info(f'Loaded {len(keys)} JWKS signing keys')
+
+    def _refresh_in_background(self):
+        def run():
+            try:
+                self.fetch()
+            except Exception as e:
+                logger.warning(f'JWKS refresh failed, keeping {len(self.keys)} cached keys: {str(e)}')
+            finally:
+                self._refreshing = False
+
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=run, name='jwks-refresh', daemon=True).start()
+
+    def get_key(self, kid):
+        age = time.monotonic() - self.fetched_at
+        if not self.keys:
+            with self._lock:
+                if not self.keys:
+                    self.fetch()
+        elif age > getattr(settings, 'JWKS_REFRESH_SECONDS', 600):
+            self._refresh_in_background()
+
+        if kid not in self.keys and age > getattr(settings, 'JWKS_MIN_REFRESH_SECONDS', 30):
+            # Possibly a rotated key: re-fetch now, rate limited
+            with self._lock:
+                if time.monotonic() - self.fetched_at > getattr(settings, 'JWKS_MIN_REFRESH_SECONDS', 30):
+                    self.fetch()
+
+        if kid not in self.keys:
+            raise UnknownSigningKey(f'Unknown signing key {kid}')
+        return self.keys[kid]
+
+
+class TokenVerifier:
+    def __init__(self):
+        self.jwks = JWKSCache()
+        self._valid = OrderedDict()  # digest -> (claims, expires at)
+        self._invalid = OrderedDict()  # digest -> (exception class, message, expires at)
+        self._lock = threading.Lock()
+        self._latencies = {}
+        self._counts = {}
+
+    def _record(self, outcome, started):
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._counts[outcome] = self._counts.get(outcome, 0) + 1
+            self._latencies.setdefault(outcome, deque(maxlen=LATENCY_SAMPLES)).append(elapsed)
+
+    def _remember(self, entries, digest, value):
+        with self._lock:
+            entries[digest] = value
+            entries.move_to_end(digest)
+            while len(entries) > getattr(settings, 'AUTH_TOKEN_CACHE_SIZE', 10000):
+                entries.popitem(last=False)
+
+    def decode(self, token):
+        """Full verification, no caching"""
+        if getattr(settings, 'SUPABASE_SKIP_JWT_VERIFICATION', False):
+            # Decode without verification (DEVELOPMENT ONLY)
+            return jwt.decode(token, options={'verify_signature': False})
+
+        header = jwt.get_unverified_header(token)
+        algorithm = header.get('alg')
+        if algorithm == 'HS256':
+            key = getattr(settings, 'SUPABASE_JWT_SECRET', None)
+            if not key:
+                raise ImproperlyConfigured('SUPABASE_JWT_SECRET not configured in settings')
+        elif algorithm in ASYMMETRIC_ALGORITHMS:
+            key = self.jwks.get_key(header.get('kid')).key
+        else:
+            raise jwt.InvalidAlgorithmError(f'Unsupported token algorithm {algorithm}')
+        return jwt.decode(token, key, algorithms=[algorithm], audience=AUDIENCE)
+
+    def verify(self, token):
+        """Claims of a valid token; raises jwt.InvalidTokenError (or a subclass) otherwise"""
+        started = time.perf_counter()
+        digest = hashlib.sha256(token.encode()).hexdigest()
+        now = time.time()
+
+        cached = self._valid.get(digest)
+        if cached and cached[1] > now:
+            self._record('hit', started)
+            return cached[0]
+        rejected = self._invalid.get(digest)
+        if rejected and rejected[2] > now:
+            self._record('negative_hit', started)
+            raise rejected[0](rejected[1])
+
+        try:
+            claims = self.decode(token)
+        except UnknownSigningKey:
+            self._record('rejected', started)
+            raise
+        except jwt.InvalidTokenError as e:
+            negative_seconds = getattr(settings, 'AUTH_TOKEN_NEGATIVE_SECONDS', 60)
+            self._remember(self._invalid, digest, (type(e), str(e), now + negative_seconds))
+            self._record('rejected', started)
+            raise
+
+        expires_at = claims.get('exp') or now + getattr(settings, 'AUTH_TOKEN_CACHE_SECONDS', 300)
+        self._remember(self._valid, digest, (claims, expires_at))
+        self._record('verified', started)
+        return claims
+
+    def metrics(self):
+        """Counts and latency (milliseconds) per outcome for this process"""
+        with self._lock:
+            samples = {outcome: sorted(values) for outcome, values in self._latencies.items()}
+            counts = dict(self._counts)
+            cached = len(self._valid)
+        metrics = {'cached_tokens': cached, 'outcomes': {}}
+        for outcome, values in samples.items():
+            metrics['outcomes'][outcome] = {
+                'count': counts[outcome],
+                'mean_ms': round(sum(values) / len(values) * 1000, 3),
+                'p50_ms': round(values[len(values) // 2] * 1000, 3),
+                'p95_ms': round(values[min(int(0.95 * len(values)), len(values) - 1)] * 1000, 3),
+                'max_ms': round(values[-1] * 1000, 3),
+            }
+        return metrics
+
+
+token_verifier = TokenVerifier()
@@ -0,0 +1,204 @@
+"""
+Batched CPU pose inference across several videos.
+
+``mp.solutions.pose`` runs one frame per call, so with many short clips the
+per-call overhead dominates. Here frames sampled from several recordings are
+letterboxed into one fixed-size input tensor and the MediaPipe pose-landmark
+model runs through the TFLite ``Interpreter`` with multi-threaded XNNPACK.
+Landmarks are scattered back into one ``PoseTimeline`` per video.
+
+The landmark model sees the whole letterboxed frame (no detector crop), so
+it suits full-body clips shot by a fixed phone camera. Its pose flag is not
+reliable without the detector stage, so each video is gated by the full
+MediaPipe pipeline: frames count only once a person has been confirmed (checked
+about once per second until then). Only the coarse sampling grid of a
+policy is used; dense peak windows are not revisited.
+"""
+
+import logging
+import os
+from collections import deque
+
+import cv2
+import mediapipe as mp
+import numpy as np
+from django.conf import settings
+from tensorflow.lite import Interpreter
+
+from .ai_processor import PoseTimeline, NUM_LANDMARKS, LANDMARK_FIELDS
+
+logger = logging.getLogger(__name__)
+
+BACKEND = 'tflite-batch'  # SamplingPolicy.backend of timelines (and results) produced here
+MODEL_INPUT_SIZE = 256
+MODEL_LANDMARKS = 39  # 33 body landmarks + 6 auxiliary ROI points
+MODEL_LANDMARK_VALUES = 5  # x, y, z, visibility logit, presence logit
+
+_estimator = None
+
+
+def default_model_path():
+    return os.path.join(os.path.dirname(mp.__file__), 'modules', 'pose_landmark', 'pose_landmark_full.tflite')
+
+
+def _sigmoid(values):
+    return 1.0 / (1.0 + np.exp(-values))
+
+
+def letterbox(frame, out, size=MODEL_INPUT_SIZE):
+    """Write a BGR frame into ``out`` (size, size, 3) as RGB float32 in [0, 1].
+
+    Returns (content width, content height, pad x, pad y) in model pixels.
+    """
+    height, width = frame.shape[:2]
+    scale = size / max(height, width)
+    resized_width, resized_height = int(round(width * scale)), int(round(height * scale))
+    resized = cv2.resize(frame, (resized_width, resized_height), interpolation=cv2.INTER_AREA)
+
+    pad_x, pad_y = (size - resized_width) // 2, (size - resized_height) // 2
+    out[:] = 0
+    out[pad_y:pad_y + resized_height, pad_x:pad_x + resized_width] = resized[:, :, ::-1]
+    out *= 1.0 / 255.0
+    return resized_width, resized_height, pad_x, pad_y
+
+
+def sampled_frames(video_path, policy):
+    """(fps, iterator of (frame index, BGR frame)) on the policy's coarse sampling grid"""
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    step = policy.step(fps, policy.target_fps)
+
+    def frames():
+        index = 0
+        try:
+            while cap.isOpened():
+                if index % step:
+                    if not cap.grab():
+                        break
+                else:
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    yield index, frame
+                index += 1
+        finally:
+            cap.release()
+
+    return fps, frames()
+
+
+class BatchPoseEstimator:
+    """Pose-landmark TFLite model with a fixed batch dimension"""
+
+    def __init__(self, model_path=None, batch_size=None, num_threads=None, min_pose_score=None):
+        self.batch_size = batch_size or getattr(settings, 'POSE_BATCH_SIZE', 16)
+        self.min_pose_score = min_pose_score or getattr(settings, 'POSE_BATCH_MIN_SCORE', 0.5)
+        self.interpreter = Interpreter(
+            model_path=model_path or getattr(settings, 'POSE_LANDMARK_MODEL_PATH', None) or default_model_path(),
+            num_threads=num_threads or getattr(settings, 'POSE_BATCH_THREADS', None) or os.cpu_count(),
+        )
+        self.input_index = self.interpreter.get_input_details()[0]['index']
+        self.interpreter.resize_tensor_input(
+            self.input_index, [self.batch_size, MODEL_INPUT_SIZE, MODEL_INPUT_SIZE, 3]
+        )
+        self.interpreter.allocate_tensors()
+
+        # Outputs are matched by shape: (N, 195) landmarks and (N, 1) pose score
+        for output in self.interpreter.get_output_details():
+            if tuple(output['shape'][1:]) == (MODEL_LANDMARKS * MODEL_LANDMARK_VALUES,):
+                self.landmarks_index = output['index']
+            elif tuple(output['shape'][1:]) == (1,):
+                self.score_index = output['index']
+        self._input = np.zeros((self.batch_size, MODEL_INPUT_SIZE, MODEL_INPUT_SIZE, 3), dtype=np.float32)
+        self._gate = mp.solutions.pose.Pose(static_image_mode=True)
+        self._empty_row = np.full((NUM_LANDMARKS, LANDMARK_FIELDS), np.nan, dtype=np.float32)
+
+    def person_present(self, frame):
+        """Full MediaPipe detector + landmark pass on one frame"""
+        return self._gate.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)).pose_landmarks is not None
+
+    def infer(self, count, boxes):
+        """Landmarks for the first ``count`` letterboxed inputs -> (count, 33, 4), NaN where no pose"""
+        self._input[count:] = 0
+        self.interpreter.set_tensor(self.input_index, self._input)
+        self.interpreter.invoke()
+
+        raw = self.interpreter.get_tensor(self.landmarks_index)[:count]
+        raw = raw.reshape(count, MODEL_LANDMARKS, MODEL_LANDMARK_VALUES)[:, :NUM_LANDMARKS]
+        scores = self.interpreter.get_tensor(self.score_index)[:count, 0]
+
+        # Undo the letterbox: model pixels -> coordinates normalized to the source frame
+        boxes = np.asarray(boxes, dtype=np.float32)
+        content_width, content_height = boxes[:, 0:1], boxes[:, 1:2]
+        pad_x, pad_y = boxes[:, 2:3], boxes[:, 3:4]
+
+        landmarks = np.empty((count, NUM_LANDMARKS, LANDMARK_FIELDS), dtype=np.float32)
+        landmarks[:, :, 0] = (raw[:, :, 0] - pad_x) / content_width
+        landmarks[:, :, 1] = (raw[:, :, 1] - pad_y) / content_height
+        landmarks[:, :, 2] = raw[:, :, 2] / content_width
+        landmarks[:, :, 3] = _sigmoid(raw[:, :, 3])
+        landmarks[scores < self.min_pose_score] = np.nan
+        return landmarks
+
+    def run(self, videos):
+        """Pose timelines for ``{key: (video_path, policy)}``.
+
+        Frames are taken round-robin from every video so each batch mixes
+        clips and all of them finish at about the same time.
+        """
+        streams = deque()
+        fps_by_key = {}
+        results = {key: ([], []) for key in videos}
+        next_check = {}  # frame index of the next person check; None once confirmed
+        for key, (video_path, policy) in videos.items():
+            fps_by_key[key], frames = sampled_frames(video_path, policy)
+            streams.append((key, frames))
+            next_check[key] = 0
+
+        pending = []
+        while streams:
+            key, frames = streams.popleft()
+            item = next(frames, None)
+            if item is None:
+                continue
+            streams.append((key, frames))
+
+            index, frame = item
+            if next_check[key] is not None:
+                if index < next_check[key] or not self.person_present(frame):
+                    if index >= next_check[key]:
+                        next_check[key] = index + int(fps_by_key[key])
+                    results[key][0].append(index)
+                    results[key][1].append(self._empty_row)
+                    continue
+                next_check[key] = None
+
+            box = letterbox(frame, self._input[len(pending)])
+            pending.append((key, index, box))
+            if len(pending) == self.batch_size:
+                self._flush(pending, results)
+                pending = []
+        if pending:
+            self._flush(pending, results)
+
+        timelines = {}
+        for key, (indices, rows) in results.items():
+            landmarks = (np.stack(rows) if rows
+                         else np.empty((0, NUM_LANDMARKS, LANDMARK_FIELDS), dtype=np.float32))
+            timelines[key] = PoseTimeline(landmarks, np.asarray(indices, dtype=np.int32), fps_by_key[key])
+        return timelines
+
+    def _flush(self, pending, results):
+        landmarks = self.infer(len(pending), [item[2] for item in pending])
+        for (key, index, _), row in zip(pending, landmarks):
+            results[key][0].append(index)
+            results[key][1].append(row)
+
+
+def get_estimator():
+    """Per-process estimator, built on first use and kept warm"""
+    global _estimator
+    if _estimator is None:
+        _estimator = BatchPoseEstimator()
+        logger.info(f'Loaded batch pose estimator (batch size {_estimator.batch_size})')
+    return _estimator
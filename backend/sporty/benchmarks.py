@@ -0,0 +1,87 @@
+"""
+In-process AgeBenchmark index.
+
+AgeBenchmark is a small table that rarely changes but is read for every
+graded recording and every status poll. Each process keeps all rows grouped
+by (fitness test, gender) and sorted by age_min, so a lookup is a bisect
+without a query. The index version is the table's row count and latest
+``updated_at``, which every save, insert and delete changes. Processes
+read it from the database at most every BENCHMARK_INDEX_CHECK_SECONDS and
+reload when it changed, so no shared cache is needed. Celery workers
+preload the index when their process starts.
+"""
+
+import bisect
+import logging
+import time
+
+from celery.signals import worker_process_init
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+
+from .models import AgeBenchmark
+
+logger = logging.getLogger(__name__)
+
+
+def table_version():
+    """(row count, latest updated_at) of AgeBenchmark"""
+    version = AgeBenchmark.objects.aggregate(rows=Count('id'), updated=Max('updated_at'))
+    return version['rows'], version['updated']
+
+
+class BenchmarkIndex:
+    def __init__(self):
+        self.version = None
+        self.checked_at = 0.0
+        self._groups = None  # (fitness test id, gender) -> (age_min list, benchmarks)
+
+    def load(self):
+        groups = {}
+        for benchmark in AgeBenchmark.objects.select_related('fitness_test').order_by('age_min', 'id'):
+            groups.setdefault((benchmark.fitness_test_id, benchmark.gender), []).append(benchmark)
+        self._groups = {key: ([row.age_min for row in rows], rows) for key, rows in groups.items()}
+        logger.info(f'Loaded {sum(len(rows) for _, rows in self._groups.values())} age benchmarks (version {self.version})')
+
+    def refresh(self, force=False):
+        """Reload if another process changed the benchmarks since the last check"""
+        now = time.monotonic()
+        interval = getattr(settings, 'BENCHMARK_INDEX_CHECK_SECONDS', 5)
+        if not force and self._groups is not None and now - self.checked_at < interval:
+            return
+        self.checked_at = now
+
+        version = table_version()
+        if force or self._groups is None or version != self.version:
+            self.version = version
+            self.load()
+
+    def lookup(self, fitness_test_id, gender, age):
+        """Benchmark whose [age_min, age_max] contains ``age`` (the narrowest-starting one on overlap)"""
+        if age is None:
+            return None
+        self.refresh()
+        starts, rows = self._groups.get((fitness_test_id, gender), ((), ()))
+        for position in range(bisect.bisect_right(starts, age) - 1, -1, -1):
+            if rows[position].age_max >= age:
+                return rows[position]
+        return None
+
+
+benchmark_index = BenchmarkIndex()
+
+
+def invalidate():
+    """Check the version on this process's next lookup, once the current transaction has committed"""
+    def recheck():
+        benchmark_index.checked_at = 0.0
+    transaction.on_commit(recheck)
+
+
+@worker_process_init.connect
+def _preload(**kwargs):
+    try:
+        benchmark_index.refresh(force=True)
+    except Exception as e:
+        logger.warning(f'Could not preload age benchmarks: {str(e)}')
@@ -0,0 +1,15 @@
+"""
+Celery application for sporty background tasks (video analysis).
+
+Start a worker with ``python manage.py run_pose_worker``.
+"""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sporty.settings')
+
+app = Celery('sporty')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks(['sporty'])
@@ -0,0 +1,67 @@
+"""
+Content-addressed storage for uploaded videos.
+
+Uploads are written once, under a pending name, through the configured
+storage backend; each chunk is hashed (SHA-256) as it is written and the
+object is then moved under its digest. A byte-identical retry finds that
+digest already stored and its pending copy is dropped, so one object is
+kept per content. The digest is also the key of the analysis-result cache
+(see ``AnalysisResult``).
+"""
+
+import hashlib
+import os
+import uuid
+
+from .storage import get_storage, chunk_size
+
+VIDEO_PREFIX = 'videos'
+PENDING_PREFIX = f'{VIDEO_PREFIX}/pending'
+
+
+def digest_path(digest, extension='.mp4'):
+    """Storage name of the video with this digest"""
+    return f'{VIDEO_PREFIX}/{digest[:2]}/{digest}{extension}'
+
+
+def _file_blocks(path):
+    with open(path, 'rb') as f:
+        yield from iter(lambda: f.read(chunk_size()), b'')
+
+
+def _store_blocks(blocks, extension):
+    """Write blocks under a pending name, hashing them on the way, then file the object under its digest"""
+    storage = get_storage()
+    pending = f'{PENDING_PREFIX}/{uuid.uuid4().hex}{extension}'
+    sha = hashlib.sha256()
+    storage.save_stream(pending, blocks, sha)
+    digest = sha.hexdigest()
+
+    name = digest_path(digest, extension)
+    if storage.exists(name):
+        storage.delete(pending)
+    else:
+        storage.move(pending, name)
+    return digest, name
+
+
+def store_upload(uploaded_file, extension='.mp4'):
+    """Store an uploaded file under its digest in a single read.
+
+    The file is read in ``chunk_size`` blocks, so memory stays bounded for
+    any file size. Returns (digest, storage name).
+    """
+    uploaded_file.seek(0)
+    return _store_blocks(uploaded_file.chunks(chunk_size()), extension)
+
+
+def store_file(path, extension='.mp4'):
+    """Move a complete local file (e.g. a finished streaming spool) into the store"""
+    digest, name = _store_blocks(_file_blocks(path), extension)
+    os.remove(path)
+    return digest, name
+
+
+def media_url(request, name):
+    """Stored reference of a file, for model fields (see ``storage.resolve_url``)"""
+    return get_storage().reference(name, request)
@@ -0,0 +1,105 @@
+"""
+Per-endpoint database policies: statement timeouts and read-replica reads.
+
+``@read_replica`` sends an endpoint's reads to the ``replica`` database,
+when one is configured (SUPABASE_DB_REPLICA_URL; see db_routers.py).
+Reads inside a write transaction on the primary (``select_for_update``,
+``update_or_create``) stay on the primary. ``@statement_timeout(ms)`` runs
+the endpoint in a transaction with a transaction-local statement_timeout,
+which also works behind pgbouncer in transaction pooling mode. A cancelled
+query answers 503 instead of holding a connection.
+
+Stack them with ``@read_replica`` outermost, so the timeout applies to the
+database the reads go to.
+
+``StatementTimeoutMiddleware`` gives the other queries of web processes a
+default, DB_STATEMENT_TIMEOUT_MS. Migrations, management commands and Celery
+tasks (leaderboard, platform stats and percentile rebuilds) never load
+middleware, so they keep PostgreSQL's unlimited default.
+"""
+
+import logging
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+from django.db.backends.signals import connection_created
+from rest_framework import status
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+REPLICA_ALIAS = 'replica'
+QUERY_CANCELED = '57014'  # SQLSTATE of a statement_timeout cancellation
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def read_alias():
+    """Database that reads go to at this point of the request"""
+    if (_replica_reads.get() and REPLICA_ALIAS in connections.databases
+            and not connections[DEFAULT_DB_ALIAS].in_atomic_block):
+        return REPLICA_ALIAS
+    return DEFAULT_DB_ALIAS
+
+
+def read_replica(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = _replica_reads.set(True)
+        try:
+            return view(*args, **kwargs)
+        finally:
+            _replica_reads.reset(token)
+    return wrapper
+
+
+def is_query_timeout(error):
+    cause = error.__cause__
+    return QUERY_CANCELED in (getattr(cause, 'pgcode', None), getattr(cause, 'sqlstate', None))
+
+
+def statement_timeout(milliseconds):
+    """Cancel the endpoint's queries after ``milliseconds`` (PostgreSQL only)"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            alias = read_alias()
+            connection = connections[alias]
+            if connection.vendor != 'postgresql':
+                return view(*args, **kwargs)
+            try:
+                with transaction.atomic(using=alias):
+                    with connection.cursor() as cursor:
+                        cursor.execute("SELECT set_config('statement_timeout', %s, true)", [str(milliseconds)])
+                    return view(*args, **kwargs)
+            except OperationalError as e:
+                if not is_query_timeout(e):
+                    raise
+                logger.warning(f'{view.__name__} exceeded its {milliseconds} ms statement timeout on {alias}')
+                return Response({'error': 'The request took too long, please retry'},
+                                status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return wrapper
+    return decorator
+
+
+def _set_default_timeout(sender, connection, **kwargs):
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT set_config('statement_timeout', %s, false)", [str(settings.DB_STATEMENT_TIMEOUT_MS)])
+
+
+class StatementTimeoutMiddleware:
+    """Session statement_timeout of DB_STATEMENT_TIMEOUT_MS on the connections this web process opens.
+
+    Only hooks connection_created and then drops out of the request chain.
+    Behind pgbouncer in transaction pooling mode session settings would leak
+    to other clients, so there only ``@statement_timeout`` applies.
+    """
+
+    def __init__(self, get_response):
+        if getattr(settings, 'DB_STATEMENT_TIMEOUT_MS', None) and not getattr(settings, 'DB_PGBOUNCER', False):
+            connection_created.connect(_set_default_timeout, dispatch_uid='sporty.db.statement_timeout')
+        raise MiddlewareNotUsed
@@ -0,0 +1,22 @@
+from django.db import DEFAULT_DB_ALIAS
+
+from .db import read_alias
+
+
+class ReplicaRouter:
+    """
+    Reads of @read_replica endpoints go to the replica database (see db.py);
+    everything else, and every write and migration, uses the primary
+    """
+
+    def db_for_read(self, model, **hints):
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
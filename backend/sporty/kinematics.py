@@ -0,0 +1,144 @@
+"""
+Vectorized kinematics over pose landmark arrays.
+
+Every function works on whole (frames, 33, 4) landmark arrays or (frames,)
+signals at once, so post-pose processing of a long clip is a handful of
+NumPy calls instead of a Python loop over per-frame landmark objects.
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import savgol_filter
+
+# MediaPipe Pose landmark indices used by the analyzers
+LANDMARKS = {
+    'NOSE': 0,
+    'LEFT_SHOULDER': 11, 'RIGHT_SHOULDER': 12,
+    'LEFT_ELBOW': 13, 'RIGHT_ELBOW': 14,
+    'LEFT_WRIST': 15, 'RIGHT_WRIST': 16,
+    'LEFT_HIP': 23, 'RIGHT_HIP': 24,
+    'LEFT_KNEE': 25, 'RIGHT_KNEE': 26,
+    'LEFT_ANKLE': 27, 'RIGHT_ANKLE': 28,
+    'LEFT_HEEL': 29, 'RIGHT_HEEL': 30,
+    'LEFT_FOOT_INDEX': 31, 'RIGHT_FOOT_INDEX': 32,
+}
+
+# Joint triple (angle measured at the middle landmark) and hysteresis
+# thresholds in degrees. One repetition is a pass below ``down`` followed by
+# a pass above ``up``. Keys cover FitnessTest.TEST_TYPES and
+# ExerciseUpload.EXERCISE_CHOICES that are scored by counting reps.
+REP_PROFILES = {
+    'situps': {'joint': ('SHOULDER', 'HIP', 'KNEE'), 'up': 160, 'down': 90},
+    'sit_ups': {'joint': ('SHOULDER', 'HIP', 'KNEE'), 'up': 160, 'down': 90},
+    'pushup': {'joint': ('SHOULDER', 'ELBOW', 'WRIST'), 'up': 160, 'down': 90},
+    'pull_ups': {'joint': ('SHOULDER', 'ELBOW', 'WRIST'), 'up': 150, 'down': 70},
+    'squat': {'joint': ('HIP', 'KNEE', 'ANKLE'), 'up': 160, 'down': 100},
+    'lunges': {'joint': ('HIP', 'KNEE', 'ANKLE'), 'up': 160, 'down': 100},
+    'burpees': {'joint': ('SHOULDER', 'HIP', 'KNEE'), 'up': 160, 'down': 100},
+    'mountain_climbers': {'joint': ('SHOULDER', 'HIP', 'KNEE'), 'up': 150, 'down': 90},
+    'high_knees': {'joint': ('SHOULDER', 'HIP', 'KNEE'), 'up': 160, 'down': 110},
+    'jumping_jacks': {'joint': ('HIP', 'SHOULDER', 'WRIST'), 'up': 120, 'down': 40},
+}
+
+# Body-line angle (shoulder-hip-ankle) an athlete must hold for a plank
+PLANK_MIN_ANGLE = 160
+
+
+def fill_gaps(signal):
+    """Linearly interpolate NaN samples (frames where no pose was found)"""
+    signal = np.asarray(signal, dtype=np.float64)
+    missing = np.isnan(signal)
+    if not missing.any() or missing.all():
+        return signal
+    positions = np.arange(len(signal))
+    filled = signal.copy()
+    filled[missing] = np.interp(positions[missing], positions[~missing], signal[~missing])
+    return filled
+
+
+def moving_median(signal, window=5):
+    """Centred moving median with edge padding"""
+    signal = np.asarray(signal, dtype=np.float64)
+    if window < 2 or len(signal) < window:
+        return signal
+    half = window // 2
+    padded = np.pad(signal, (half, window - 1 - half), mode='edge')
+    return np.median(sliding_window_view(padded, window), axis=-1)
+
+
+def smooth(signal, method='savgol', window=7, polyorder=2):
+    """Fill gaps, then smooth with Savitzky-Golay or a moving median (all-NaN signals are returned as is)"""
+    signal = fill_gaps(signal)
+    if np.isnan(signal).all():
+        return signal
+    if method == 'median':
+        return moving_median(signal, window)
+    if method != 'savgol':
+        raise ValueError(f'Unknown smoothing method: {method}')
+
+    # savgol needs an odd window longer than the polynomial order
+    window = min(window, len(signal) if len(signal) % 2 else len(signal) - 1)
+    if window <= polyorder:
+        return signal
+    return savgol_filter(signal, window, polyorder)
+
+
+def joint_angles(landmarks, a, b, c):
+    """Angle at ``b`` in degrees for every frame, NaN where no pose was found"""
+    ba = landmarks[:, a, :2] - landmarks[:, b, :2]
+    bc = landmarks[:, c, :2] - landmarks[:, b, :2]
+    radians = np.arctan2(bc[:, 1], bc[:, 0]) - np.arctan2(ba[:, 1], ba[:, 0])
+    angle = np.abs(np.degrees(radians))
+    return np.where(angle > 180, 360 - angle, angle)
+
+
+def best_side(landmarks, joints):
+    """'LEFT' or 'RIGHT', whichever side has the higher mean visibility for ``joints``"""
+    def visibility(side):
+        indices = [LANDMARKS[f'{side}_{joint}'] for joint in joints]
+        return np.nanmean(landmarks[:, indices, 3]) if len(landmarks) else 0.0
+
+    left, right = visibility('LEFT'), visibility('RIGHT')
+    return 'RIGHT' if np.nan_to_num(right) > np.nan_to_num(left) else 'LEFT'
+
+
+def side_joint_angles(landmarks, joints, side=None):
+    """Joint angles for a (proximal, middle, distal) joint name triple on one body side"""
+    side = side or best_side(landmarks, joints)
+    a, b, c = (LANDMARKS[f'{side}_{joint}'] for joint in joints)
+    return joint_angles(landmarks, a, b, c)
+
+
+def trajectory(landmarks, name, axis=1):
+    """(frames,) coordinate track of one landmark; axis 0 = x, 1 = y, 2 = z"""
+    return landmarks[:, LANDMARKS[name], axis]
+
+
+def velocity(signal, timestamps):
+    """Time derivative of a signal sampled at (possibly irregular) timestamps"""
+    if len(signal) < 2:
+        return np.zeros_like(signal)
+    return np.gradient(signal, timestamps)
+
+
+def count_repetitions(signal, threshold_up, threshold_down):
+    """Count down -> up cycles with a hysteresis state machine over the whole array.
+
+    Samples below ``threshold_down`` set the state to down, samples above
+    ``threshold_up`` set it to up, anything in between keeps the previous
+    state. Every down -> up transition is one repetition.
+    """
+    signal = np.asarray(signal, dtype=np.float64)
+    state = np.where(signal > threshold_up, 1, np.where(signal < threshold_down, -1, 0))
+    states = state[state != 0]
+    if len(states) < 2:
+        return 0
+    return int(np.count_nonzero((states[:-1] == -1) & (states[1:] == 1)))
+
+
+def hold_duration(mask, timestamps):
+    """Total seconds covered by samples where ``mask`` is true"""
+    if len(timestamps) < 2:
+        return 0.0
+    durations = np.diff(timestamps, append=timestamps[-1])
+    return float(durations[np.asarray(mask, dtype=bool)].sum())
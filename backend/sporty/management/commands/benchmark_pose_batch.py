@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from sporty.ai_processor import VideoAnalyzer, SamplingPolicy
+from sporty.batch_inference import BatchPoseEstimator
+
+
+class Command(BaseCommand):
+    help = 'Compare pose frames per second of per-frame MediaPipe against batched TFLite inference'
+
+    def add_arguments(self, parser):
+        parser.add_argument('videos', nargs='+', help='Local video files to analyze')
+        parser.add_argument('--target-fps', type=float, default=10)
+        parser.add_argument('--batch-size', type=int, default=16)
+        parser.add_argument('--threads', type=int, default=None)
+
+    def handle(self, *args, **options):
+        policy = SamplingPolicy(target_fps=options['target_fps'])
+        videos = options['videos']
+
+        analyzer = VideoAnalyzer()
+        started = time.perf_counter()
+        sequential_frames = sum(len(analyzer.extract_landmarks(video, policy)) for video in videos)
+        sequential_time = time.perf_counter() - started
+
+        estimator = BatchPoseEstimator(batch_size=options['batch_size'], num_threads=options['threads'])
+        started = time.perf_counter()
+        timelines = estimator.run({video: (video, policy) for video in videos})
+        batched_time = time.perf_counter() - started
+        batched_frames = sum(len(timeline) for timeline in timelines.values())
+
+        self.stdout.write(f'Sampling policy: {policy.to_dict()}, batch size {estimator.batch_size}')
+        self.stdout.write('=' * 60)
+        for video in videos:
+            timeline = timelines[video]
+            self.stdout.write(f'{video}: {len(timeline)} frames, pose found on {int(timeline.detected.sum())}')
+        self.stdout.write('=' * 60)
+        sequential_fps = sequential_frames / sequential_time if sequential_time else 0.0
+        batched_fps = batched_frames / batched_time if batched_time else 0.0
+        self.stdout.write(self.style.SUCCESS(
+            f'Per-frame MediaPipe: {sequential_fps:.1f} frames/s, '
+            f'batched TFLite: {batched_fps:.1f} frames/s '
+            f'({batched_fps / sequential_fps if sequential_fps else 0:.1f}x)'
+        ))
@@ -0,0 +1,78 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from sporty.ai_processor import VideoAnalyzer, SamplingPolicy, FULL_RATE
+from sporty.models import FitnessTest
+
+
+class Command(BaseCommand):
+    help = 'Report the accuracy delta of a sampling policy against full-rate pose analysis'
+
+    METRICS = {
+        'vertical_jump': 'jump_height',
+        'situps': 'rep_count',
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument('videos', nargs='+', help='Local video files to analyze')
+        parser.add_argument('--test', choices=sorted(self.METRICS), required=True)
+        parser.add_argument('--from-db', action='store_true',
+                            help='Use the sampling block of the FitnessTest ai_model_config')
+        parser.add_argument('--target-fps', type=float)
+        parser.add_argument('--max-resolution', type=int)
+        parser.add_argument('--peak-fps', type=float)
+
+    def handle(self, *args, **options):
+        test_name = options['test']
+        metric = self.METRICS[test_name]
+
+        if options['from_db']:
+            try:
+                config = FitnessTest.objects.get(name=test_name).ai_model_config
+            except FitnessTest.DoesNotExist:
+                raise CommandError(f'No FitnessTest named {test_name}')
+            policy = SamplingPolicy.from_config(config)
+        else:
+            policy = SamplingPolicy(
+                target_fps=options['target_fps'],
+                max_resolution=options['max_resolution'],
+                peak_fps=options['peak_fps'],
+            )
+
+        self.stdout.write(f'Sampling policy: {policy.to_dict()}')
+        self.stdout.write('=' * 60)
+
+        analyzer = VideoAnalyzer()
+        deltas = []
+        speedups = []
+
+        for video in options['videos']:
+            full, full_frames, full_time = self._run(analyzer, video, test_name, FULL_RATE)
+            sampled, sampled_frames, sampled_time = self._run(analyzer, video, test_name, policy)
+
+            delta = sampled[metric] - full[metric]
+            speedup = full_time / sampled_time if sampled_time else float('inf')
+            deltas.append(abs(delta))
+            speedups.append(speedup)
+
+            self.stdout.write(
+                f'{video}\n'
+                f'  full rate: {metric}={full[metric]:.2f} frames={full_frames} time={full_time:.2f}s\n'
+                f'  sampled:   {metric}={sampled[metric]:.2f} frames={sampled_frames} time={sampled_time:.2f}s\n'
+                f'  delta={delta:+.2f} speedup={speedup:.1f}x'
+            )
+
+        self.stdout.write('=' * 60)
+        self.stdout.write(self.style.SUCCESS(
+            f'Mean |delta| {metric}: {sum(deltas) / len(deltas):.3f}, '
+            f'max |delta|: {max(deltas):.3f}, '
+            f'mean speedup: {sum(speedups) / len(speedups):.1f}x'
+        ))
+
+    def _run(self, analyzer, video, test_name, policy):
+        analyzer.clear_cache()
+        started = time.perf_counter()
+        timeline = analyzer.extract_landmarks(video, policy)
+        result = analyzer.analyze(video, [test_name], policy)[test_name]
+        return result, len(timeline), time.perf_counter() - started
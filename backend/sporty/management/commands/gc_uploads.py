@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from sporty.tasks import cleanup_stale_uploads
+
+
+class Command(BaseCommand):
+    help = 'Expire stalled resumable uploads and delete their partial bytes'
+
+    def handle(self, *args, **options):
+        result = cleanup_stale_uploads()
+        self.stdout.write(self.style.SUCCESS(
+            f"Expired {result['expired_uploads']} uploads, removed {result['removed_spools']} spools"
+        ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from sporty.models import FitnessTest
+from sporty.ranking import rebuild_leaderboards
+
+
+class Command(BaseCommand):
+    help = 'Re-rank every leaderboard of one or all fitness tests from the ranked recordings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--test', help='FitnessTest name (default: all active tests)')
+
+    def handle(self, *args, **options):
+        tests = FitnessTest.objects.filter(is_active=True)
+        if options['test']:
+            tests = FitnessTest.objects.filter(name=options['test'])
+
+        for fitness_test in tests:
+            rows = rebuild_leaderboards(fitness_test)
+            self.stdout.write(self.style.SUCCESS(f'{fitness_test.name}: {rows} leaderboard rows'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from sporty.models import FitnessTest
+from sporty.percentiles import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-cohort score histograms and report their percentile error against exact values'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--test', help='FitnessTest name (default: all active tests)')
+
+    def handle(self, *args, **options):
+        tests = FitnessTest.objects.filter(is_active=True)
+        if options['test']:
+            tests = FitnessTest.objects.filter(name=options['test'])
+
+        for fitness_test in tests:
+            for report in rebuild(fitness_test):
+                before = report['before'] or {}
+                after = report.get('after') or {}
+                self.stdout.write(self.style.SUCCESS(
+                    f"{fitness_test.name} {report['age_group']}/{report['gender']}: {report['scores']} scores, "
+                    f"drift {report['drift_before']}, "
+                    f"error before mean {before.get('mean_error')} max {before.get('max_error')}, "
+                    f"after mean {after.get('mean_error')} max {after.get('max_error')}"
+                ))
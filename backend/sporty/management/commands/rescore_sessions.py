@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from sporty.models import AssessmentSession
+from sporty.scoring import rescore_sessions
+
+
+class Command(BaseCommand):
+    help = 'Re-grade completed recordings against the current benchmarks and recompute session and athlete scores'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--test', help='Only sessions with a recording of this FitnessTest name')
+        parser.add_argument('--state', help='Only sessions of athletes from this state')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--no-regrade', action='store_true',
+                            help='Keep recording grades/points, only recompute the rollups')
+
+    def handle(self, *args, **options):
+        sessions = AssessmentSession.objects.filter(recordings__processing_status='completed')
+        if options['test']:
+            sessions = sessions.filter(recordings__fitness_test__name=options['test'])
+        if options['state']:
+            sessions = sessions.filter(athlete__state=options['state'])
+
+        def progress(done, total):
+            self.stdout.write(f'{done}/{total} sessions')
+
+        stats = rescore_sessions(
+            sessions.distinct(),
+            regrade=not options['no_regrade'],
+            batch_size=options['batch_size'],
+            progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Re-scored {stats['sessions']} sessions: {stats['recordings_changed']} recordings, "
+            f"{stats['sessions_changed']} sessions and {stats['athletes_changed']} athletes changed"
+        ))
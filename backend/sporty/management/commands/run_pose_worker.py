@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from sporty.celery import app
+from sporty.scheduling import ANALYSIS_QUEUES
+
+
+class Command(BaseCommand):
+    help = 'Run a long-lived Celery worker that keeps one warm pose graph per process'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=settings.POSE_WORKER_PROCESSES,
+                            help='Worker processes (default: one per core)')
+        parser.add_argument('--max-videos', type=int, default=settings.POSE_WORKER_MAX_VIDEOS,
+                            help='Recycle a worker process after this many videos')
+        parser.add_argument('--queues', default=','.join(ANALYSIS_QUEUES + ('celery',)),
+                            help='Comma-separated queues to consume, e.g. analysis.priority,analysis.short '
+                                 'for a pool reserved for short clips')
+        parser.add_argument('--loglevel', default='info')
+
+    def handle(self, *args, **options):
+        argv = [
+            'worker',
+            '--pool=prefork',
+            f"--concurrency={options['processes']}",
+            f"--max-tasks-per-child={options['max_videos']}",
+            f"--loglevel={options['loglevel']}",
+        ]
+        if options['queues']:
+            argv.append(f"--queues={options['queues']}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Starting pose worker: {options['processes']} processes, "
+            f"recycling after {options['max_videos']} videos"
+        ))
+        app.worker_main(argv)
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from sporty.supabase_stub import make_server
+
+
+class Command(BaseCommand):
+    help = 'Serve an in-memory stand-in for Supabase Auth/REST (point SUPABASE_URL at it)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=54321)
+
+    def handle(self, *args, **options):
+        secret = getattr(settings, 'SUPABASE_JWT_SECRET', None) or 'supabase-stub-secret'
+        server = make_server(options['host'], options['port'], secret)
+        host, port = server.server_address[:2]
+        self.stdout.write(self.style.SUCCESS(
+            f'Supabase stub on http://{host}:{port} (tokens signed with SUPABASE_JWT_SECRET)'
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.server_close()
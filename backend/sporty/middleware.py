@@ -4,13 +4,16 @@ Validates Supabase JWT tokens and sets request.user_id
 """
 
 import jwt
-import requests
-import json
+import logging
 from django.http import JsonResponse
 from django.conf import settings
 from django.utils.deprecation import MiddlewareMixin
 from functools import wraps
 
+from .auth_tokens import token_verifier
+
+logger = logging.getLogger(__name__)
+
 
 class SupabaseAuthMiddleware(MiddlewareMixin):
     """
@@ -19,8 +22,6 @@ class SupabaseAuthMiddleware(MiddlewareMixin):
     
     def __init__(self, get_response):
         self.get_response = get_response
-        # Cache for Supabase JWT secrets
-        self._jwt_secret = None
         super().__init__(get_response)
     
     def process_request(self, request):
@@ -94,6 +95,7 @@ class SupabaseAuthMiddleware(MiddlewareMixin):
                 'message': 'The provided JWT token is malformed or invalid'
             }, status=401)
         except Exception as e:
+            logger.error(f"JWT validation error: {str(e)}")
             return JsonResponse({
                 'error': 'Authentication error',
                 'message': f'Error validating token: {str(e)}'
@@ -101,32 +103,9 @@ class SupabaseAuthMiddleware(MiddlewareMixin):
     
     def validate_supabase_token(self, token):
         """
-        Validate Supabase JWT token
+        Validate Supabase JWT token (cached, see auth_tokens.py)
         """
-        try:
-            # For development, you can skip verification
-            # In production, you should verify with Supabase's public key
-            if getattr(settings, 'SUPABASE_SKIP_JWT_VERIFICATION', False):
-                # Decode without verification (DEVELOPMENT ONLY)
-                decoded = jwt.decode(token, options={"verify_signature": False})
-                return decoded
-            
-            # Production: Verify with Supabase JWT secret
-            supabase_jwt_secret = getattr(settings, 'SUPABASE_JWT_SECRET', None)
-            if not supabase_jwt_secret:
-                raise Exception("SUPABASE_JWT_SECRET not configured in settings")
-            
-            decoded = jwt.decode(
-                token, 
-                supabase_jwt_secret, 
-                algorithms=['HS256'],
-                audience='authenticated'
-            )
-            return decoded
-            
-        except Exception as e:
-            print(f"JWT validation error: {e}")
-            return None
+        return token_verifier.verify(token)
 
 
 def supabase_auth_required(view_func):
@@ -146,16 +125,28 @@ def supabase_auth_required(view_func):
 
 def get_current_user_profile(request):
     """
-    Helper function to get the current user's athlete profile
+    The current user's athlete profile (None without one).
+    Resolved lazily, at most once per request, through the shared profile cache (profiles.py)
     """
+    request = getattr(request, '_request', request)  # DRF Request wraps the HttpRequest
     if not getattr(request, 'is_authenticated', False):
         return None
     
-    from .models import AthleteProfile
-    try:
-        return AthleteProfile.objects.get(auth_user_id=request.user_id)
-    except AthleteProfile.DoesNotExist:
-        return None
+    if not hasattr(request, '_athlete_profile'):
+        from .profiles import load_athlete
+        request._athlete_profile = load_athlete(request.user_id)
+    return request._athlete_profile
+
+
+def current_athlete(request):
+    """
+    Like get_current_user_profile, but raises AthleteProfile.DoesNotExist when there is no profile
+    """
+    athlete = get_current_user_profile(request)
+    if athlete is None:
+        from .models import AthleteProfile
+        raise AthleteProfile.DoesNotExist('Athlete profile not found')
+    return athlete
 
 
 class SupabaseUser:
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-17 18:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sporty', '0002_exerciseupload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testrecording',
+            name='video_digest',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+        migrations.CreateModel(
+            name='AnalysisResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('video_digest', models.CharField(max_length=64)),
+                ('test_type', models.CharField(max_length=50)),
+                ('analyzer_version', models.CharField(max_length=100)),
+                ('results', models.JSONField(help_text='Analyzer output (score, confidence, analysis_data)')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('source_recording', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='sporty.testrecording')),
+            ],
+            options={
+                'db_table': 'analysis_results',
+                'unique_together': {('video_digest', 'test_type', 'analyzer_version')},
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-17 18:40
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sporty', '0003_analysis_result_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumableUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(blank=True, max_length=255)),
+                ('upload_length', models.BigIntegerField(help_text='Total size in bytes declared by the client')),
+                ('upload_offset', models.BigIntegerField(default=0, help_text='Bytes received so far')),
+                ('status', models.CharField(choices=[('in_progress', 'In Progress'), ('completed', 'All Bytes Received'), ('finalized', 'Attached to Recording'), ('expired', 'Expired')], default='in_progress', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('athlete', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumable_uploads', to='sporty.athleteprofile')),
+            ],
+            options={
+                'db_table': 'resumable_uploads',
+            },
+        ),
+    ]
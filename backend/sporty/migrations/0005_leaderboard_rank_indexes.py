@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-17 18:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sporty', '0004_resumableupload'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='leaderboard',
+            index=models.Index(fields=['leaderboard_type', 'fitness_test', 'age_group', 'gender', 'current_rank'], name='leaderboard_national_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaderboard',
+            index=models.Index(fields=['leaderboard_type', 'state', 'current_rank'], name='leaderboard_state_rank_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-17 18:56
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sporty', '0005_leaderboard_rank_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TalentSummary',
+            fields=[
+                ('athlete', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='talent_summary_document', serialize=False, to='sporty.athleteprofile')),
+                ('document', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('rankings_stale', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'talent_summaries',
+            },
+        ),
+    ]
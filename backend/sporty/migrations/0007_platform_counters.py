@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-17 18:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sporty', '0006_talent_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlatformCounter',
+            fields=[
+                ('key', models.CharField(max_length=150, primary_key=True, serialize=False)),
+                ('count', models.BigIntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+            ],
+            options={
+                'db_table': 'platform_counters',
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-17 19:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sporty', '0007_platform_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoreDistribution',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('age_group', models.CharField(max_length=20)),
+                ('gender', models.CharField(max_length=10)),
+                ('low', models.FloatField()),
+                ('high', models.FloatField()),
+                ('counts', models.JSONField(default=list)),
+                ('underflow', models.BigIntegerField(default=0)),
+                ('overflow', models.BigIntegerField(default=0)),
+                ('total', models.BigIntegerField(default=0)),
+                ('rebuilt_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('fitness_test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='sporty.fitnesstest')),
+            ],
+            options={
+                'db_table': 'score_distributions',
+                'unique_together': {('fitness_test', 'age_group', 'gender')},
+            },
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.2.6 on 2026-10-17 19:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+# ranking.PARTITION_FIELDS when this migration was written
+PARTITION_FIELDS = {
+    'national': (),
+    'state': ('state',),
+    'district': ('state', 'district'),
+    'age_group': ('age_group', 'gender'),
+}
+
+
+def create_partitions(apps, schema_editor):
+    """One LeaderboardPartition per ranked partition, counted from its rows"""
+    Leaderboard = apps.get_model('sporty', 'Leaderboard')
+    LeaderboardPartition = apps.get_model('sporty', 'LeaderboardPartition')
+    for leaderboard_type, names in PARTITION_FIELDS.items():
+        groups = Leaderboard.objects.filter(
+            leaderboard_type=leaderboard_type, fitness_test__isnull=False
+        ).values('fitness_test_id', *names).annotate(participants=Count('id'))
+        for group in groups:
+            values = {name: group[name] for name in names}
+            key = ':'.join([leaderboard_type, str(group['fitness_test_id']),
+                            *(values[name] or '' for name in names)])
+            partition = LeaderboardPartition.objects.create(
+                key=key, leaderboard_type=leaderboard_type, fitness_test_id=group['fitness_test_id'],
+                participants=group['participants'], **values
+            )
+            Leaderboard.objects.filter(
+                leaderboard_type=leaderboard_type, fitness_test_id=group['fitness_test_id'], **values
+            ).update(partition=partition)
+
+
+def restore_totals(apps, schema_editor):
+    LeaderboardPartition = apps.get_model('sporty', 'LeaderboardPartition')
+    for partition in LeaderboardPartition.objects.all():
+        partition.rows.update(total_participants=partition.participants)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sporty', '0008_score_distributions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardPartition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255, unique=True)),
+                ('leaderboard_type', models.CharField(choices=[('national', 'National'), ('state', 'State'), ('district', 'District'), ('age_group', 'Age Group'), ('test_specific', 'Test Specific')], max_length=20)),
+                ('age_group', models.CharField(blank=True, max_length=20, null=True)),
+                ('gender', models.CharField(blank=True, max_length=10, null=True)),
+                ('state', models.CharField(blank=True, max_length=100, null=True)),
+                ('district', models.CharField(blank=True, max_length=100, null=True)),
+                ('participants', models.IntegerField(default=0)),
+                ('version', models.CharField(blank=True, max_length=32)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('fitness_test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='sporty.fitnesstest')),
+            ],
+            options={
+                'db_table': 'leaderboard_partitions',
+            },
+        ),
+        migrations.AddField(
+            model_name='leaderboard',
+            name='partition',
+            field=models.ForeignKey(blank=True, help_text='Ranked partition (holds the participant count)', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rows', to='sporty.leaderboardpartition'),
+        ),
+        migrations.RunPython(create_partitions, restore_totals),
+        # A default lets the column be re-added when migrating backwards
+        migrations.AlterField(
+            model_name='leaderboard',
+            name='total_participants',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RemoveField(
+            model_name='leaderboard',
+            name='total_participants',
+        ),
+    ]
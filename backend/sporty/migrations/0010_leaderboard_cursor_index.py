@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-17 19:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sporty', '0009_leaderboard_partitions'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='leaderboard',
+            index=models.Index(fields=['leaderboard_type', 'fitness_test', 'current_rank', 'id'], name='leaderboard_test_cursor_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 19:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sporty', '0010_leaderboard_cursor_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agebenchmark',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
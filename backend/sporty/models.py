@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.core.serializers.json import DjangoJSONEncoder
 import uuid
 
 class AthleteProfile(models.Model):
@@ -195,6 +196,7 @@ class AgeBenchmark(models.Model):
     below_average_points = models.IntegerField(default=40)
     
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # part of the benchmark index version (benchmarks.py)
 
     class Meta:
         db_table = 'age_benchmarks'
@@ -267,6 +269,7 @@ class TestRecording(models.Model):
     thumbnail_url = models.URLField(null=True, blank=True)
     video_duration = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
     video_size_mb = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
+    video_digest = models.CharField(max_length=64, null=True, blank=True, db_index=True)  # SHA-256 of the video bytes
     
     # Device Analysis (On-device results)
     device_analysis_score = models.DecimalField(max_digits=10, decimal_places=3, null=True, blank=True)
@@ -305,6 +308,21 @@ class TestRecording(models.Model):
     class Meta:
         db_table = 'test_recordings'
 
+class AnalysisResult(models.Model):
+    """Server AI result for one video content digest, reused by byte-identical uploads"""
+    video_digest = models.CharField(max_length=64)
+    test_type = models.CharField(max_length=50)
+    analyzer_version = models.CharField(max_length=100)
+    
+    results = models.JSONField(help_text="Analyzer output (score, confidence, analysis_data)")
+    source_recording = models.ForeignKey(TestRecording, on_delete=models.SET_NULL, null=True, blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'analysis_results'
+        unique_together = ['video_digest', 'test_type', 'analyzer_version']
+
 class Leaderboard(models.Model):
     """Gamified leaderboards for athlete engagement"""
     LEADERBOARD_TYPES = [
@@ -322,7 +340,8 @@ class Leaderboard(models.Model):
     # Ranking Info
     current_rank = models.IntegerField()
     previous_rank = models.IntegerField(null=True, blank=True)
-    total_participants = models.IntegerField()
+    partition = models.ForeignKey('LeaderboardPartition', on_delete=models.CASCADE, null=True, blank=True,
+                                  related_name='rows', help_text="Ranked partition (holds the participant count)")
     
     # Score Info
     best_score = models.DecimalField(max_digits=10, decimal_places=3)
@@ -338,6 +357,36 @@ class Leaderboard(models.Model):
 
     class Meta:
         db_table = 'leaderboards'
+        indexes = [
+            # Keyset pages of national_rankings / state_rankings ordered by current_rank
+            models.Index(fields=['leaderboard_type', 'fitness_test', 'age_group', 'gender', 'current_rank'],
+                         name='leaderboard_national_rank_idx'),
+            models.Index(fields=['leaderboard_type', 'state', 'current_rank'], name='leaderboard_state_rank_idx'),
+            # Keyset cursor on (current_rank, id) within one test's leaderboard
+            models.Index(fields=['leaderboard_type', 'fitness_test', 'current_rank', 'id'],
+                         name='leaderboard_test_cursor_idx'),
+        ]
+
+class LeaderboardPartition(models.Model):
+    """One ranked leaderboard (type, test and filter values) and its participant count.
+
+    Re-ranking locks this row and gives it a new ``version``, which tells
+    every process that its in-memory rank index is out of date.
+    """
+    key = models.CharField(max_length=255, unique=True)
+    leaderboard_type = models.CharField(max_length=20, choices=Leaderboard.LEADERBOARD_TYPES)
+    fitness_test = models.ForeignKey(FitnessTest, on_delete=models.CASCADE)
+    age_group = models.CharField(max_length=20, null=True, blank=True)
+    gender = models.CharField(max_length=10, null=True, blank=True)
+    state = models.CharField(max_length=100, null=True, blank=True)
+    district = models.CharField(max_length=100, null=True, blank=True)
+    
+    participants = models.IntegerField(default=0)
+    version = models.CharField(max_length=32, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'leaderboard_partitions'
 
 class Badge(models.Model):
     """Achievement badges for gamification"""
@@ -378,6 +427,48 @@ class AthleteBadge(models.Model):
         db_table = 'athlete_badges'
         unique_together = ['athlete', 'badge']
 
+class TalentSummary(models.Model):
+    """Precomputed talent_summary document (app home screen), kept current by sporty/summaries.py"""
+    athlete = models.OneToOneField(AthleteProfile, on_delete=models.CASCADE, primary_key=True,
+                                   related_name='talent_summary_document')
+    document = models.JSONField(encoder=DjangoJSONEncoder)
+    rankings_stale = models.BooleanField(default=False)  # another athlete's result moved this athlete's ranks
+    
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'talent_summaries'
+
+class ScoreDistribution(models.Model):
+    """Histogram of ranked scores for one (test, age group, gender) cohort, see sporty/percentiles.py"""
+    fitness_test = models.ForeignKey(FitnessTest, on_delete=models.CASCADE)
+    age_group = models.CharField(max_length=20)
+    gender = models.CharField(max_length=10)
+    
+    # Equal-width bins over [low, high); scores outside land in underflow / overflow
+    low = models.FloatField()
+    high = models.FloatField()
+    counts = models.JSONField(default=list)
+    underflow = models.BigIntegerField(default=0)
+    overflow = models.BigIntegerField(default=0)
+    total = models.BigIntegerField(default=0)
+    
+    rebuilt_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'score_distributions'
+        unique_together = ['fitness_test', 'age_group', 'gender']
+
+class PlatformCounter(models.Model):
+    """Running count and sum behind platform_stats, updated on write (see sporty/platform_stats.py)"""
+    key = models.CharField(max_length=150, primary_key=True)
+    count = models.BigIntegerField(default=0)
+    total = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'platform_counters'
+
 class SAISubmission(models.Model):
     """Track submissions to SAI for official review"""
     STATUS_CHOICES = [
@@ -412,4 +503,27 @@ class SAISubmission(models.Model):
     reviewed_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
-        db_table = 'sai_submissions'
\ No newline at end of file
+        db_table = 'sai_submissions'
+
+class ResumableUpload(models.Model):
+    """Byte-range video upload that survives dropped connections (tus-style)"""
+    STATUS_CHOICES = [
+        ('in_progress', 'In Progress'),
+        ('completed', 'All Bytes Received'),
+        ('finalized', 'Attached to Recording'),
+        ('expired', 'Expired'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    athlete = models.ForeignKey(AthleteProfile, on_delete=models.CASCADE, related_name='resumable_uploads')
+    filename = models.CharField(max_length=255, blank=True)
+    
+    upload_length = models.BigIntegerField(help_text="Total size in bytes declared by the client")
+    upload_offset = models.BigIntegerField(default=0, help_text="Bytes received so far")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='in_progress')
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'resumable_uploads'
@@ -0,0 +1,46 @@
+"""
+Keyset (seek) pagination for ranked lists.
+
+Pages are ordered by (current_rank, id) and the cursor carries the last
+(rank, id) served. The cursor filter, ``current_rank > rank OR
+(current_rank = rank AND id > row_id)``, seeks from the cursor on the
+(type, test, current_rank, id) index, so page N is as cheap as page one.
+Rows tied on current_rank are split by id. Offsets are never used.
+"""
+
+import base64
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(rank, row_id):
+    return base64.urlsafe_b64encode(f'{rank}:{row_id}'.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(rank, id) from a cursor string; InvalidCursor if it was not produced by encode_cursor"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        rank, row_id = base64.urlsafe_b64decode(padded.encode()).decode().split(':')
+        return int(rank), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidCursor('Invalid cursor')
+
+
+def keyset_page(queryset, cursor=None, limit=50):
+    """(rows, next cursor or None) of the page after ``cursor``, ordered by current_rank then id"""
+    queryset = queryset.order_by('current_rank', 'id')
+    if cursor:
+        rank, row_id = decode_cursor(cursor)
+        queryset = queryset.filter(Q(current_rank__gt=rank) | Q(current_rank=rank, id__gt=row_id))
+
+    rows = list(queryset[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].current_rank, rows[-1].id)
+    return rows, next_cursor
@@ -0,0 +1,216 @@
+"""
+Empirical percentiles from per-cohort score histograms.
+
+Each (fitness test, age group, gender) cohort keeps a ``ScoreDistribution``:
+PERCENTILE_BINS equal-width bins plus underflow/overflow counts. A
+completed score is added under a row lock. A percentile is a prefix sum
+plus linear interpolation inside one bin, so its cost does not depend on
+cohort size. Percentiles are mid-rank (ties count half) and "higher is
+better" is mirrored for timed tests.
+
+``rebuild`` recomputes a cohort from the ranked TestRecording rows. It
+re-fits the bin range to the data and reports the error of the histogram
+percentiles against exact ones, before and after the rebuild.
+"""
+
+import bisect
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .analyzers import REGISTRY
+from .benchmarks import benchmark_index
+from .models import ScoreDistribution, TestRecording
+from .ranking import RANKED_STATUSES, age_group
+
+logger = logging.getLogger(__name__)
+
+RANGE_PADDING = 0.05  # fraction of the observed range added on both sides at rebuild
+
+
+def lower_is_better(fitness_test):
+    return getattr(REGISTRY.get(fitness_test.name), 'lower_is_better', False)
+
+
+def cohort(recording):
+    athlete = recording.athlete
+    return {'fitness_test': recording.fitness_test, 'age_group': age_group(athlete.age), 'gender': athlete.gender}
+
+
+def is_ranked(recording):
+    return (recording.processing_status in RANKED_STATUSES and not recording.is_suspicious
+            and recording.final_score is not None)
+
+
+def initial_range(recording):
+    """Bin range for a new cohort: around the age benchmark thresholds, else around the first score"""
+    athlete = recording.athlete
+    benchmark = benchmark_index.lookup(recording.fitness_test_id, athlete.gender, athlete.age)
+    if benchmark:
+        thresholds = [float(benchmark.below_average_threshold), float(benchmark.excellent_threshold)]
+        low, high = min(thresholds), max(thresholds)
+        span = (high - low) or abs(high) or 1.0
+        return low - span, high + span
+    score = float(recording.final_score)
+    return min(0.0, 2 * score), max(0.0, 2 * score) or 1.0
+
+
+class Histogram:
+    """Read-side view of a ScoreDistribution with prefix sums"""
+
+    def __init__(self, distribution, lower_is_better=False):
+        self.distribution = distribution
+        self.lower_is_better = lower_is_better
+        self.prefix = [0]
+        for count in distribution.counts:
+            self.prefix.append(self.prefix[-1] + count)
+
+    def percentile(self, score):
+        """Share of the cohort (0-100) this score beats, ties counted half; None for an empty cohort"""
+        distribution = self.distribution
+        if not distribution.total:
+            return None
+        score = float(score)
+        bins = len(distribution.counts)
+        width = (distribution.high - distribution.low) / bins
+
+        if score < distribution.low:
+            below = distribution.underflow / 2
+        elif score >= distribution.high:
+            below = distribution.total - distribution.overflow / 2
+        else:
+            position = (score - distribution.low) / width
+            index = min(int(position), bins - 1)
+            below = distribution.underflow + self.prefix[index] + distribution.counts[index] * (position - index)
+
+        share = below / distribution.total * 100
+        if self.lower_is_better:
+            share = 100 - share
+        return round(min(max(share, 0.0), 100.0), 2)
+
+
+def _bin(distribution, score, delta):
+    bins = len(distribution.counts)
+    if score < distribution.low:
+        distribution.underflow += delta
+    elif score >= distribution.high:
+        distribution.overflow += delta
+    else:
+        index = min(int((score - distribution.low) / (distribution.high - distribution.low) * bins), bins - 1)
+        distribution.counts[index] += delta
+    distribution.total += delta
+
+
+def record(recording, previous_score=None):
+    """Add a completed recording's score to its cohort and return its percentile.
+
+    ``previous_score`` is removed first (re-analysis of an already counted
+    recording). Returns None while the cohort is smaller than
+    PERCENTILE_MIN_COHORT, so callers can fall back to benchmark percentiles.
+    """
+    bins = getattr(settings, 'PERCENTILE_BINS', 200)
+    with transaction.atomic():
+        distribution = ScoreDistribution.objects.select_for_update().filter(**cohort(recording)).first()
+        if distribution is None:
+            low, high = initial_range(recording)
+            distribution, _ = ScoreDistribution.objects.get_or_create(
+                **cohort(recording), defaults={'low': low, 'high': high, 'counts': [0] * bins}
+            )
+            distribution = ScoreDistribution.objects.select_for_update().get(pk=distribution.pk)
+
+        if previous_score is not None:
+            _bin(distribution, float(previous_score), -1)
+        if is_ranked(recording):
+            _bin(distribution, float(recording.final_score), 1)
+        distribution.save()
+
+    if distribution.total < getattr(settings, 'PERCENTILE_MIN_COHORT', 30) or not is_ranked(recording):
+        return None
+    return Histogram(distribution, lower_is_better(recording.fitness_test)).percentile(recording.final_score)
+
+
+def lookup(recording, histograms=None):
+    """Cohort percentile of a recording's current score without changing the histogram.
+
+    ``histograms`` caches cohort histograms across calls (bulk re-scoring).
+    None for small cohorts, as in ``record``.
+    """
+    key = cohort(recording)
+    cache_key = (recording.fitness_test_id, key['age_group'], key['gender'])
+    if histograms is None:
+        histograms = {}
+    if cache_key not in histograms:
+        distribution = ScoreDistribution.objects.filter(**key).first()
+        histograms[cache_key] = distribution and Histogram(distribution, lower_is_better(recording.fitness_test))
+    histogram = histograms[cache_key]
+    if (histogram is None or not is_ranked(recording)
+            or histogram.distribution.total < getattr(settings, 'PERCENTILE_MIN_COHORT', 30)):
+        return None
+    return histogram.percentile(recording.final_score)
+
+
+def exact_percentile(sorted_scores, score, lower_is_better=False):
+    below = (bisect.bisect_left(sorted_scores, score) + bisect.bisect_right(sorted_scores, score)) / 2
+    share = below / len(sorted_scores) * 100
+    return 100 - share if lower_is_better else share
+
+
+def error_report(histogram, sorted_scores, samples=1000):
+    """Mean and max absolute percentile error over (up to) ``samples`` evenly spaced cohort scores"""
+    if not sorted_scores or not histogram.distribution.total:
+        return {'mean_error': None, 'max_error': None}
+    step = max(1, len(sorted_scores) // samples)
+    errors = [
+        abs(histogram.percentile(score) - exact_percentile(sorted_scores, score, histogram.lower_is_better))
+        for score in sorted_scores[::step]
+    ]
+    return {'mean_error': round(sum(errors) / len(errors), 3), 'max_error': round(max(errors), 3)}
+
+
+def rebuild(fitness_test):
+    """Recompute every cohort of a test from the ranked recordings; returns one report per cohort"""
+    bins = getattr(settings, 'PERCENTILE_BINS', 200)
+    scores = {}
+    recordings = TestRecording.objects.filter(
+        fitness_test=fitness_test,
+        processing_status__in=RANKED_STATUSES,
+        is_suspicious=False,
+        final_score__isnull=False,
+    ).values_list('athlete__age', 'athlete__gender', 'final_score')
+    for age, gender, score in recordings.iterator(chunk_size=5000):
+        scores.setdefault((age_group(age), gender), []).append(float(score))
+
+    reports = []
+    existing = {(row.age_group, row.gender): row for row in ScoreDistribution.objects.filter(fitness_test=fitness_test)}
+    mirrored = lower_is_better(fitness_test)
+    for key in sorted(set(scores) | set(existing)):
+        cohort_scores = sorted(scores.get(key, []))
+        previous = existing.get(key)
+        report = {
+            'age_group': key[0],
+            'gender': key[1],
+            'scores': len(cohort_scores),
+            'drift_before': previous.total - len(cohort_scores) if previous else None,
+            'before': error_report(Histogram(previous, mirrored), cohort_scores) if previous else None,
+        }
+
+        if cohort_scores:
+            low, high = cohort_scores[0], cohort_scores[-1]
+            padding = (high - low) * RANGE_PADDING or abs(high) * RANGE_PADDING or 1.0
+            distribution = previous or ScoreDistribution(fitness_test=fitness_test, age_group=key[0], gender=key[1])
+            distribution.low, distribution.high = low - padding, high + padding
+            distribution.counts = [0] * bins
+            distribution.underflow = distribution.overflow = distribution.total = 0
+            for score in cohort_scores:
+                _bin(distribution, score, 1)
+            distribution.rebuilt_at = timezone.now()
+            distribution.save()
+            report['after'] = error_report(Histogram(distribution, mirrored), cohort_scores)
+        elif previous:
+            previous.delete()
+        reports.append(report)
+
+    logger.info(f"Rebuilt {len(reports)} score distributions for {fitness_test.name}")
+    return reports
@@ -0,0 +1,177 @@
+"""
+Incrementally maintained platform statistics.
+
+``platform_stats`` used to run full-table COUNT/AVG/GROUP BY queries on
+every dashboard refresh. Instead, model signals (signals.py) apply deltas
+to ``PlatformCounter`` rows as athletes, sessions and recordings are
+written:
+
+* ``athletes`` / ``assessments_completed`` / ``videos_analyzed``: counts
+* ``talent_score`` and ``state:<name>``: count and sum of talent scores
+* ``athletes:day:<date>`` / ``assessments:day:<date>``: daily buckets;
+  "this week" is the sum of the last seven
+
+The endpoint serves a document built from those rows and cached for
+PLATFORM_STATS_CACHE_SECONDS, so staleness is bounded by that timeout.
+Writes that bypass signals (``QuerySet.update``, raw SQL) are corrected
+by the periodic ``rebuild``.
+"""
+
+import logging
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import AthleteProfile, AssessmentSession, TestRecording, PlatformCounter
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY = 'platform_stats'
+STATE_PREFIX = 'state:'
+WEEK_DAYS = 7
+BUCKET_RETENTION_DAYS = 35
+
+
+def day_key(prefix, day):
+    return f'{prefix}:day:{day.isoformat()}'
+
+
+def bump(key, count=0, total=0):
+    """Add to a counter row, creating it on first use"""
+    if not count and not total:
+        return
+    updated = PlatformCounter.objects.filter(key=key).update(count=F('count') + count, total=F('total') + total)
+    if not updated:
+        with transaction.atomic():
+            counter, _ = PlatformCounter.objects.select_for_update().get_or_create(key=key)
+            counter.count += count
+            counter.total += Decimal(total)
+            counter.save()
+
+
+def _score_delta(score, state, sign):
+    if score is None:
+        return
+    bump('talent_score', sign, sign * score)
+    bump(f'{STATE_PREFIX}{state}', sign, sign * score)
+
+
+# Called from signals.py; ``previous`` holds the values the instance was loaded with
+
+def athlete_saved(athlete, created, previous):
+    if created:
+        bump('athletes', 1)
+        bump(day_key('athletes', timezone.localdate(athlete.created_at)), 1)
+    elif previous == (athlete.overall_talent_score, athlete.state):
+        return
+    else:
+        _score_delta(*previous, -1)
+    _score_delta(athlete.overall_talent_score, athlete.state, 1)
+
+
+def athlete_deleted(athlete, previous):
+    bump('athletes', -1)
+    bump(day_key('athletes', timezone.localdate(athlete.created_at)), -1)
+    _score_delta(*previous, -1)
+
+
+def session_saved(session, created, previous_status):
+    if created:
+        bump(day_key('assessments', timezone.localdate(session.created_at)), 1)
+    was_completed = not created and previous_status == 'completed'
+    bump('assessments_completed', (session.status == 'completed') - was_completed)
+
+
+def session_deleted(session, previous_status):
+    bump(day_key('assessments', timezone.localdate(session.created_at)), -1)
+    bump('assessments_completed', -(previous_status == 'completed'))
+
+
+def recording_saved(recording, created, previous_status):
+    was_completed = not created and previous_status == 'completed'
+    bump('videos_analyzed', (recording.processing_status == 'completed') - was_completed)
+
+
+def recording_deleted(recording, previous_status):
+    bump('videos_analyzed', -(previous_status == 'completed'))
+
+
+def compute():
+    """The platform_stats document from the counter rows (one query)"""
+    today = timezone.localdate()
+    days = [today - timedelta(days=offset) for offset in range(WEEK_DAYS)]
+    week_keys = [day_key(prefix, day) for prefix in ('athletes', 'assessments') for day in days]
+
+    counters = {counter.key: counter for counter in PlatformCounter.objects.filter(
+        Q(key__in=['athletes', 'assessments_completed', 'videos_analyzed', 'talent_score', *week_keys])
+        | Q(key__startswith=STATE_PREFIX)
+    )}
+
+    def count(key):
+        return counters[key].count if key in counters else 0
+
+    def average(counter):
+        return round(counter.total / counter.count, 2) if counter.count else None
+
+    states = [
+        {'state': key[len(STATE_PREFIX):], 'avg_score': average(counter)}
+        for key, counter in counters.items() if key.startswith(STATE_PREFIX) and counter.count
+    ]
+    states.sort(key=lambda state: state['avg_score'], reverse=True)
+
+    return {
+        'total_athletes': count('athletes'),
+        'total_assessments': count('assessments_completed'),
+        'total_videos_analyzed': count('videos_analyzed'),
+        'avg_talent_score': average(counters['talent_score']) if 'talent_score' in counters else None,
+        'top_performing_states': states[:10],
+        'recent_activity': {
+            'new_athletes_this_week': sum(count(day_key('athletes', day)) for day in days),
+            'assessments_this_week': sum(count(day_key('assessments', day)) for day in days),
+        },
+        'generated_at': timezone.now(),
+    }
+
+
+def get_platform_stats():
+    stats = cache.get(CACHE_KEY)
+    if stats is None:
+        stats = compute()
+        cache.set(CACHE_KEY, stats, getattr(settings, 'PLATFORM_STATS_CACHE_SECONDS', 60))
+    return stats
+
+
+def rebuild():
+    """Recompute every counter from the tables (full aggregates; run periodically, not per request)"""
+    cutoff = timezone.now() - timedelta(days=BUCKET_RETENTION_DAYS)
+    counters = {
+        'athletes': (AthleteProfile.objects.count(), 0),
+        'assessments_completed': (AssessmentSession.objects.filter(status='completed').count(), 0),
+        'videos_analyzed': (TestRecording.objects.filter(processing_status='completed').count(), 0),
+    }
+    scores = AthleteProfile.objects.filter(overall_talent_score__isnull=False)
+    totals = scores.aggregate(count=Count('id'), total=Sum('overall_talent_score'))
+    counters['talent_score'] = (totals['count'], totals['total'] or 0)
+    for row in scores.values('state').annotate(count=Count('id'), total=Sum('overall_talent_score')):
+        counters[f"{STATE_PREFIX}{row['state']}"] = (row['count'], row['total'])
+
+    for prefix, model in (('athletes', AthleteProfile), ('assessments', AssessmentSession)):
+        days = (model.objects.filter(created_at__gte=cutoff)
+                .annotate(day=TruncDate('created_at')).values('day').annotate(count=Count('pk')))
+        for row in days:
+            counters[day_key(prefix, row['day'])] = (row['count'], 0)
+
+    with transaction.atomic():
+        PlatformCounter.objects.all().delete()
+        PlatformCounter.objects.bulk_create(
+            PlatformCounter(key=key, count=count, total=total) for key, (count, total) in counters.items()
+        )
+    cache.delete(CACHE_KEY)
+    logger.info(f"Rebuilt {len(counters)} platform counters")
+    return len(counters)
@@ -0,0 +1,177 @@
+"""
+Warm, per-process pose inference.
+
+MediaPipe Pose (and the TFLite runtime behind it) is expensive to load, so
+each worker process builds one VideoAnalyzer, warms it up once, and reuses
+it for every video it handles. Memory growth is bounded by replacing the
+whole process after POSE_WORKER_MAX_VIDEOS tasks (Celery's
+max-tasks-per-child), which also releases native TFLite allocations that
+closing the graph would not.
+
+Long recordings can also be split into time-range segments whose pose
+extraction runs in parallel on threads of the worker process, each with its
+own capture and pose graph. Threads, unlike a process pool, can be started
+from a daemonic prefork child; OpenCV decoding and MediaPipe inference
+release the GIL.
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+from celery.signals import worker_process_init
+from django.apps import apps
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_analyzer = None
+_pool = None
+_segment_thread = threading.local()
+
+
+def pool_size():
+    """Worker processes to run: POSE_WORKER_PROCESSES, or one per core"""
+    return getattr(settings, 'POSE_WORKER_PROCESSES', None) or os.cpu_count() or 1
+
+
+def max_videos_per_process():
+    return getattr(settings, 'POSE_WORKER_MAX_VIDEOS', 200)
+
+
+def segment_threads():
+    """Threads decoding segments of one long video: POSE_PARALLEL_SEGMENT_THREADS"""
+    return getattr(settings, 'POSE_PARALLEL_SEGMENT_THREADS', None) or min(4, os.cpu_count() or 1)
+
+
+def _load_analyzer():
+    global _analyzer
+    from .ai_processor import VideoAnalyzer
+
+    started = time.perf_counter()
+    _analyzer = VideoAnalyzer()
+    logger.info(f"Loaded pose graph in pid {os.getpid()} ({time.perf_counter() - started:.2f}s)")
+    return _analyzer
+
+
+def get_analyzer():
+    """VideoAnalyzer shared by every video handled in this process"""
+    return _analyzer or _load_analyzer()
+
+
+def warm_up():
+    """Load the pose graph and push one blank frame through it.
+
+    Used as the per-process initializer for Celery workers, so the first
+    real video does not pay graph and delegate setup.
+    """
+    if not apps.ready:
+        import django
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sporty.settings')
+        django.setup()
+
+    analyzer = _analyzer or _load_analyzer()
+    analyzer.pose.process(np.zeros((256, 256, 3), dtype=np.uint8))
+    analyzer.pose.reset()
+
+
+@worker_process_init.connect
+def _warm_up_worker_process(**kwargs):
+    if getattr(settings, 'POSE_WORKER_WARM_UP', True):
+        warm_up()
+
+
+def get_pool():
+    """Thread pool of this process used for parallel segment extraction (replaced with the process)"""
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=segment_threads(), thread_name_prefix='pose-segment')
+    return _pool
+
+
+def segment_analyzer():
+    """VideoAnalyzer of the current segment thread; pose graphs are not thread-safe"""
+    analyzer = getattr(_segment_thread, 'analyzer', None)
+    if analyzer is None:
+        from .ai_processor import VideoAnalyzer
+        analyzer = _segment_thread.analyzer = VideoAnalyzer()
+    return analyzer
+
+
+def plan_segments(frame_count, fps, step, segment_seconds, overlap_seconds):
+    """Split [0, frame_count) into (warm_start, start, stop) frame ranges.
+
+    Every boundary sits on a multiple of ``step`` so the sampling grid is the
+    same as a sequential pass. Frames in [warm_start, start) only prime the
+    pose tracker and are dropped again when the segments are merged. The
+    last segment's stop is None: containers can under-report their frame
+    count, so it reads to the end of the stream.
+    """
+    segment_frames = max(int(segment_seconds * fps) // step, 1) * step
+    overlap_frames = int(overlap_seconds * fps) // step * step
+
+    segments = []
+    for start in range(0, frame_count, segment_frames):
+        stop = start + segment_frames if start + segment_frames < frame_count else None
+        segments.append((max(start - overlap_frames, 0), start, stop))
+    return segments
+
+
+def extract_segment(video_path, warm_start, start, stop, policy):
+    """Pose landmarks for frames [start, stop) (to the end when stop is None), run on a segment thread"""
+    analyzer = segment_analyzer()
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    frame_indices, landmarks = analyzer.extract_range(cap, fps, warm_start, stop, policy)
+    cap.release()
+
+    keep = frame_indices >= start
+    return frame_indices[keep], landmarks[keep]
+
+
+def extract_landmarks_parallel(video_path, policy=None, segment_seconds=None, overlap_seconds=None):
+    """Decode a long video as parallel time-range segments and stitch the timelines.
+
+    Falls back to a sequential pass, with a warning, when a segment fails;
+    videos shorter than two segments are decoded sequentially anyway.
+    """
+    from .ai_processor import FULL_RATE, PoseTimeline
+
+    policy = policy or FULL_RATE
+    segment_seconds = segment_seconds or getattr(settings, 'POSE_PARALLEL_SEGMENT_SECONDS', 30)
+    overlap_seconds = overlap_seconds if overlap_seconds is not None else \
+        getattr(settings, 'POSE_PARALLEL_OVERLAP_SECONDS', 1.0)
+
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    step = policy.step(fps, policy.target_fps)
+    segments = plan_segments(frame_count, fps, step, segment_seconds, overlap_seconds)
+    if len(segments) < 2:
+        return get_analyzer().extract_landmarks(video_path, policy)
+
+    started = time.perf_counter()
+    try:
+        pool = get_pool()
+        futures = [
+            pool.submit(extract_segment, video_path, warm_start, start, stop, policy)
+            for warm_start, start, stop in segments
+        ]
+        parts = [future.result() for future in futures]
+    except Exception as e:
+        logger.warning(f"Parallel extraction of {video_path} failed ({e}); decoding it sequentially", exc_info=True)
+        return get_analyzer().extract_landmarks(video_path, policy)
+
+    frame_indices, unique = np.unique(np.concatenate([part[0] for part in parts]), return_index=True)
+    landmarks = np.concatenate([part[1] for part in parts])[unique]
+    logger.info(
+        f"Extracted {len(frame_indices)} frames of {video_path} in {len(segments)} segments "
+        f"({time.perf_counter() - started:.2f}s)"
+    )
+    return PoseTimeline(landmarks, frame_indices.astype(np.int32), fps)
@@ -0,0 +1,55 @@
+"""
+Cached AthleteProfile lookups by Supabase user id.
+
+Nearly every authenticated endpoint needs the caller's profile. Profiles
+are kept in the Django cache for ATHLETE_PROFILE_CACHE_SECONDS (users
+without a profile are cached too) and dropped when a profile is saved or
+deleted (signals.py). Saves made by one process (e.g. a Celery worker
+updating the talent score) must be dropped for all of them, so profiles
+are only cached when the default cache is shared between processes
+(Redis, see CACHES in settings); with a per-process cache every request
+reads the row. Within one request the profile is resolved at most once,
+see ``middleware.get_current_user_profile``.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .models import AthleteProfile
+
+MISSING = 'missing'  # cached for users that have no profile
+PER_PROCESS_CACHES = ('django.core.cache.backends.locmem.LocMemCache', 'django.core.cache.backends.dummy.DummyCache')
+
+
+def cache_key(auth_user_id):
+    return f'athlete_profile:{auth_user_id}'
+
+
+def shared_cache():
+    """Whether the default cache is seen by every web and worker process"""
+    return settings.CACHES['default']['BACKEND'] not in PER_PROCESS_CACHES
+
+
+def load_athlete(auth_user_id):
+    """AthleteProfile of a Supabase user, or None"""
+    if not auth_user_id:
+        return None
+    key = cache_key(auth_user_id)
+    shared = shared_cache()
+    athlete = cache.get(key) if shared else None
+    if athlete is None:
+        try:
+            athlete = AthleteProfile.objects.filter(auth_user_id=auth_user_id).first() or MISSING
+        except ValidationError:  # not a UUID
+            return None
+        if shared:
+            cache.set(key, athlete, getattr(settings, 'ATHLETE_PROFILE_CACHE_SECONDS', 60))
+    return None if athlete == MISSING else athlete
+
+
+def forget_athletes(auth_user_ids):
+    """Drop cached profiles once the current transaction commits"""
+    keys = [cache_key(auth_user_id) for auth_user_id in auth_user_ids]
+    transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,524 @@
+"""
+Incremental leaderboard ranking.
+
+Every leaderboard partition (national / state / district / age group, per
+fitness test) is mirrored in memory by an order-statistic index over the
+athletes' best scores. A new best score is placed in O(log n), which yields
+the athlete's new rank and the score range of the rows whose rank shifts by
+one. Those rows are moved with a single range UPDATE; the rest of the
+partition is not touched.
+
+Ranks are competition ranks (tied scores share a rank). Indexes are loaded
+lazily from the ``leaderboards`` table and kept warm per process. Each
+partition has a ``LeaderboardPartition`` row holding its participant count:
+writers lock that row (select_for_update) for their transaction and give it
+a new version, and a process whose index carries an older version reloads
+it first. Both work across processes and hosts without a shared cache.
+"""
+
+import logging
+import random
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .analyzers import REGISTRY
+from .models import Leaderboard, LeaderboardPartition, TestRecording
+from .summaries import mark_rankings_stale, refresh_on_commit
+
+logger = logging.getLogger(__name__)
+
+RANKED_STATUSES = ('completed', 'manually_verified')
+
+# Leaderboard type -> athlete fields that split it into partitions (always per fitness test)
+PARTITION_FIELDS = {
+    'national': (),
+    'state': ('state',),
+    'district': ('state', 'district'),
+    'age_group': ('age_group', 'gender'),
+}
+
+AGE_GROUPS = (
+    # (maximum age, label)
+    (11, 'U12'),
+    (13, 'U14'),
+    (15, 'U16'),
+    (17, 'U18'),
+    (20, 'U21'),
+)
+OPEN_AGE_GROUP = 'Open'
+
+INFINITY = Decimal('Infinity')
+
+
+def age_group(age):
+    for max_age, label in AGE_GROUPS:
+        if age <= max_age:
+            return label
+    return OPEN_AGE_GROUP
+
+
+class _Node:
+    __slots__ = ('value', 'next', 'width')
+
+    def __init__(self, value, levels):
+        self.value = value
+        self.next = [None] * levels
+        self.width = [1] * levels
+
+
+class OrderStatisticIndex:
+    """Sorted multiset of numbers with O(log n) insert, remove and rank (indexable skip list)"""
+
+    MAX_LEVELS = 32
+
+    def __init__(self):
+        self.size = 0
+        self._tail = _Node(INFINITY, 0)
+        self._head = _Node(None, self.MAX_LEVELS)
+        self._head.next = [self._tail] * self.MAX_LEVELS
+
+    def __len__(self):
+        return self.size
+
+    def _random_levels(self):
+        levels = 1
+        while levels < self.MAX_LEVELS and random.random() < 0.5:
+            levels += 1
+        return levels
+
+    def insert(self, value):
+        chain = [None] * self.MAX_LEVELS
+        steps_at_level = [0] * self.MAX_LEVELS
+        node = self._head
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level].value <= value:
+                steps_at_level[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+
+        levels = self._random_levels()
+        new_node = _Node(value, levels)
+        steps = 0
+        for level in range(levels):
+            previous = chain[level]
+            new_node.next[level] = previous.next[level]
+            previous.next[level] = new_node
+            new_node.width[level] = previous.width[level] - steps
+            previous.width[level] = steps + 1
+            steps += steps_at_level[level]
+        for level in range(levels, self.MAX_LEVELS):
+            chain[level].width[level] += 1
+        self.size += 1
+
+    def remove(self, value):
+        chain = [None] * self.MAX_LEVELS
+        node = self._head
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level].value < value:
+                node = node.next[level]
+            chain[level] = node
+
+        target = chain[0].next[0]
+        if target is self._tail or target.value != value:
+            raise KeyError(value)
+        for level in range(len(target.next)):
+            previous = chain[level]
+            previous.width[level] += target.width[level] - 1
+            previous.next[level] = target.next[level]
+        for level in range(len(target.next), self.MAX_LEVELS):
+            chain[level].width[level] -= 1
+        self.size -= 1
+
+    def count_less(self, value):
+        """Number of stored values strictly below ``value``"""
+        count = 0
+        node = self._head
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level].value < value:
+                count += node.width[level]
+                node = node.next[level]
+        return count
+
+    def count_less_equal(self, value):
+        count = 0
+        node = self._head
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level] is not self._tail and node.next[level].value <= value:
+                count += node.width[level]
+                node = node.next[level]
+        return count
+
+
+class Partition:
+    """One leaderboard (type, test, filter values) and its in-memory index.
+
+    Index values are "order values": the score for lower-is-better tests,
+    the negated score otherwise, so a smaller value always ranks higher.
+    """
+
+    def __init__(self, leaderboard_type, fitness_test_id, lower_is_better, values=()):
+        self.leaderboard_type = leaderboard_type
+        self.fitness_test_id = fitness_test_id
+        self.lower_is_better = lower_is_better
+        self.filter_values = tuple(values)
+        self.index = OrderStatisticIndex()
+        self.order_values = {}  # athlete id -> order value
+        self.version = None  # LeaderboardPartition.version the index was built for
+        self.row = None  # LeaderboardPartition locked by the current writer
+
+    @property
+    def key(self):
+        return ':'.join([self.leaderboard_type, str(self.fitness_test_id), *self.filter_values])
+
+    def filters(self):
+        return {
+            'leaderboard_type': self.leaderboard_type,
+            'fitness_test_id': self.fitness_test_id,
+            **dict(zip(PARTITION_FIELDS[self.leaderboard_type], self.filter_values)),
+        }
+
+    def order_value(self, score):
+        return score if self.lower_is_better else -score
+
+    def score_range(self, low, high):
+        """``best_score`` lookups for order values in (low, high]"""
+        if self.lower_is_better:
+            lookups = {'best_score__gt': low}
+            if high != INFINITY:
+                lookups['best_score__lte'] = high
+        else:
+            lookups = {'best_score__lt': -low}
+            if high != INFINITY:
+                lookups['best_score__gte'] = -high
+        return lookups
+
+    def load(self):
+        self.index = OrderStatisticIndex()
+        self.order_values = {}
+        rows = Leaderboard.objects.filter(**self.filters()).values_list('athlete_id', 'best_score')
+        for athlete_id, best_score in rows.iterator(chunk_size=10000):
+            value = self.order_value(best_score)
+            self.order_values[athlete_id] = value
+            self.index.insert(value)
+
+    def rank(self, value):
+        return self.index.count_less(value) + 1
+
+    def move(self, athlete_id, score):
+        """Place an athlete's best score (None removes the athlete).
+
+        Returns (old rank, new rank, shifted range (low, high], shift) where
+        every other row with an order value in the range moves by ``shift``.
+        """
+        old_value = self.order_values.pop(athlete_id, None)
+        old_rank = None
+        if old_value is not None:
+            old_rank = self.rank(old_value)
+            self.index.remove(old_value)
+
+        new_value = self.order_value(score) if score is not None else None
+        new_rank = None
+        if new_value is not None:
+            new_rank = self.rank(new_value)
+            self.index.insert(new_value)
+            self.order_values[athlete_id] = new_value
+
+        old_bound = INFINITY if old_value is None else old_value
+        new_bound = INFINITY if new_value is None else new_value
+        if new_bound < old_bound:
+            return old_rank, new_rank, (new_bound, old_bound), 1
+        return old_rank, new_rank, (old_bound, new_bound), -1
+
+
+_partitions = OrderedDict()
+
+
+def _cached_partition(leaderboard_type, fitness_test_id, lower_is_better, values):
+    partition = Partition(leaderboard_type, fitness_test_id, lower_is_better, values)
+    cached = _partitions.get(partition.key)
+    if cached is not None:
+        _partitions.move_to_end(partition.key)
+        return cached
+
+    _partitions[partition.key] = partition
+    while len(_partitions) > getattr(settings, 'LEADERBOARD_INDEX_PARTITIONS', 256):
+        _partitions.popitem(last=False)
+    return partition
+
+
+@contextmanager
+def _locked(partition):
+    """Hold the partition's row lock for one transaction, with the index reloaded if it is stale"""
+    try:
+        with transaction.atomic():
+            row, _ = LeaderboardPartition.objects.get_or_create(key=partition.key, defaults=partition.filters())
+            row = LeaderboardPartition.objects.select_for_update().get(pk=row.pk)
+            if not row.version or row.version != partition.version:
+                partition.load()
+            partition.row = row
+            yield partition
+            row.participants = len(partition.index)
+            row.version = uuid.uuid4().hex
+            row.save(update_fields=['participants', 'version', 'updated_at'])
+        partition.version = row.version
+    except BaseException:
+        partition.version = None  # index may be ahead of the database; reload next time
+        raise
+    finally:
+        partition.row = None
+
+
+def athlete_partitions(athlete, fitness_test):
+    lower_is_better = getattr(REGISTRY.get(fitness_test.name), 'lower_is_better', False)
+    fields = {
+        'state': athlete.state,
+        'district': athlete.district,
+        'age_group': age_group(athlete.age),
+        'gender': athlete.gender,
+    }
+    return [
+        _cached_partition(leaderboard_type, fitness_test.id, lower_is_better,
+                          [fields[name] for name in names])
+        for leaderboard_type, names in PARTITION_FIELDS.items()
+    ]
+
+
+def stale_partitions(athlete, fitness_test, current):
+    """Partitions still holding a row of the athlete although their key no longer matches.
+
+    Left behind when the athlete's state, district, age group or gender
+    changed since the rows were written; ``current`` are the partitions the
+    athlete belongs to now.
+    """
+    lower_is_better = getattr(REGISTRY.get(fitness_test.name), 'lower_is_better', False)
+    keys = {partition.key for partition in current}
+    rows = Leaderboard.objects.filter(
+        athlete=athlete, fitness_test=fitness_test, leaderboard_type__in=PARTITION_FIELDS
+    ).values('leaderboard_type', 'state', 'district', 'age_group', 'gender')
+
+    stale = []
+    for row in rows:
+        partition = _cached_partition(row['leaderboard_type'], fitness_test.id, lower_is_better,
+                                      [row[name] for name in PARTITION_FIELDS[row['leaderboard_type']]])
+        if partition.key not in keys:
+            stale.append(partition)
+    return stale
+
+
+def best_recording(athlete, fitness_test):
+    """The athlete's best ranked recording for a test, or None"""
+    ordering = 'final_score' if getattr(REGISTRY.get(fitness_test.name), 'lower_is_better', False) else '-final_score'
+    return TestRecording.objects.filter(
+        athlete=athlete,
+        fitness_test=fitness_test,
+        processing_status__in=RANKED_STATUSES,
+        is_suspicious=False,
+        final_score__isnull=False,
+    ).order_by(ordering, 'created_at').first()
+
+
+def refresh_total_points(recordings):
+    """Copy re-graded points_earned onto the leaderboard rows of the recordings' athletes and tests.
+
+    Ranks only depend on scores, so regrading leaves them alone; one UPDATE
+    per test sets ``total_points`` from each athlete's best ranked recording.
+    """
+    athletes_by_test = {}
+    for recording in recordings:
+        athletes_by_test.setdefault(recording.fitness_test, set()).add(recording.athlete_id)
+
+    updated = 0
+    for fitness_test, athlete_ids in athletes_by_test.items():
+        ordering = 'final_score' if getattr(REGISTRY.get(fitness_test.name), 'lower_is_better', False) else '-final_score'
+        best_points = TestRecording.objects.filter(
+            athlete_id=OuterRef('athlete_id'),
+            fitness_test=fitness_test,
+            processing_status__in=RANKED_STATUSES,
+            is_suspicious=False,
+            final_score__isnull=False,
+        ).order_by(ordering, 'created_at').values('points_earned')[:1]
+        updated += Leaderboard.objects.filter(fitness_test=fitness_test, athlete_id__in=athlete_ids).update(
+            total_points=Coalesce(Subquery(best_points), Value(0))
+        )
+    return updated
+
+
+def _apply(partition, changes):
+    """Move every (athlete, best recording) in one partition and persist the affected rows"""
+    pending = {}  # athlete id -> Leaderboard row not yet in the database
+    operations = []
+    shifted = 0
+
+    for athlete, best in changes:
+        score = best.final_score if best else None
+        old_rank, new_rank, (low, high), shift = partition.move(athlete.id, score)
+        if old_rank is None and new_rank is None:
+            continue
+
+        if low != high:
+            moved_inside = shift < 0 and new_rank is not None  # the athlete's own new value is in the range
+            shifted += partition.index.count_less_equal(high) - partition.index.count_less_equal(low) - moved_inside
+            operations.append(('shift', athlete.id, partition.score_range(low, high), shift))
+            for row in pending.values():
+                if low < partition.order_value(row.best_score) <= high:
+                    row.previous_rank, row.current_rank = row.current_rank, row.current_rank + shift
+
+        if new_rank is None:
+            pending.pop(athlete.id, None)
+            operations.append(('delete', athlete.id, None, None))
+        elif old_rank is None or athlete.id in pending:
+            pending[athlete.id] = Leaderboard(
+                athlete=athlete,
+                fitness_test_id=partition.fitness_test_id,
+                leaderboard_type=partition.leaderboard_type,
+                current_rank=new_rank,
+                best_score=score,
+                total_points=best.points_earned or 0,
+                partition=partition.row,
+                age_group=age_group(athlete.age),
+                gender=athlete.gender,
+                state=athlete.state,
+                district=athlete.district,
+            )
+        else:
+            fields = {'best_score': score, 'total_points': best.points_earned or 0,
+                      'age_group': age_group(athlete.age), 'gender': athlete.gender,
+                      'state': athlete.state, 'district': athlete.district}
+            if new_rank != old_rank:
+                fields.update(previous_rank=F('current_rank'), current_rank=new_rank)
+            operations.append(('update', athlete.id, fields, None))
+
+    rows = Leaderboard.objects.filter(**partition.filters())
+    with transaction.atomic():
+        for operation, athlete_id, arguments, shift in operations:
+            if operation == 'shift':
+                shifted_rows = rows.filter(**arguments).exclude(athlete_id=athlete_id)
+                mark_rankings_stale(shifted_rows.values('athlete_id'))
+                shifted_rows.update(previous_rank=F('current_rank'), current_rank=F('current_rank') + shift)
+            elif operation == 'update':
+                rows.filter(athlete_id=athlete_id).update(**arguments)
+            else:
+                rows.filter(athlete_id=athlete_id).delete()
+        if pending:
+            Leaderboard.objects.bulk_create(
+                pending.values(), batch_size=getattr(settings, 'LEADERBOARD_BATCH_SIZE', 1000)
+            )
+    return shifted
+
+
+def update_leaderboards(*recordings):
+    """Re-rank the athletes of these recordings in every leaderboard of their test.
+
+    Recordings of the same partition are applied under one lock and one
+    transaction. Returns the number of other rows whose rank changed.
+    """
+    return _rerank((recording.athlete, recording.fitness_test) for recording in recordings)
+
+
+def relocate_athlete(athlete):
+    """Move an athlete whose state, district, age group or gender changed into their new partitions.
+
+    Only tests where one of the athlete's rows sits in a partition that no
+    longer matches are re-ranked. Returns the number of other rows whose
+    rank changed.
+    """
+    current = {'state': athlete.state, 'district': athlete.district,
+               'age_group': age_group(athlete.age), 'gender': athlete.gender}
+    moved = Leaderboard.objects.filter(athlete=athlete, leaderboard_type__in=PARTITION_FIELDS).exclude(
+        **current).select_related('fitness_test')
+    fitness_tests = {row.fitness_test_id: row.fitness_test for row in moved}
+    if not fitness_tests:
+        return 0
+    return _rerank((athlete, fitness_test) for fitness_test in fitness_tests.values())
+
+
+def _rerank(pairs):
+    """Re-rank each (athlete, fitness test); rows in stale partitions are removed"""
+    by_partition = {}
+    athletes = {}
+    for athlete, fitness_test in pairs:
+        if (athlete.id, fitness_test.id) in athletes:
+            continue
+        athletes[(athlete.id, fitness_test.id)] = athlete
+        best = best_recording(athlete, fitness_test)
+        current = athlete_partitions(athlete, fitness_test)
+        for partition in current:
+            by_partition.setdefault(partition.key, (partition, []))[1].append((athlete, best))
+        for partition in stale_partitions(athlete, fitness_test, current):
+            by_partition.setdefault(partition.key, (partition, []))[1].append((athlete, None))
+
+    shifted = 0
+    for partition, changes in by_partition.values():
+        with _locked(partition):
+            shifted += _apply(partition, changes)
+    for athlete in {athlete.id: athlete for athlete in athletes.values()}.values():
+        refresh_on_commit(athlete, 'current_rankings')
+    logger.info(f"Updated {len(by_partition)} leaderboard partitions, {shifted} ranks shifted")
+    return shifted
+
+
+def rebuild_leaderboards(fitness_test):
+    """Recompute every leaderboard of a test from the ranked recordings (full re-rank)"""
+    lower_is_better = getattr(REGISTRY.get(fitness_test.name), 'lower_is_better', False)
+    recordings = TestRecording.objects.filter(
+        fitness_test=fitness_test,
+        processing_status__in=RANKED_STATUSES,
+        is_suspicious=False,
+        final_score__isnull=False,
+    ).select_related('athlete').order_by('final_score' if lower_is_better else '-final_score', 'created_at')
+
+    best = {}
+    for recording in recordings.iterator(chunk_size=2000):
+        best.setdefault(recording.athlete_id, recording)
+
+    members = {}
+    for recording in best.values():
+        for partition in athlete_partitions(recording.athlete, fitness_test):
+            members.setdefault(partition.key, (partition, []))[1].append(recording)
+
+    created = []
+    with transaction.atomic():
+        # Locking the partition rows holds off concurrent incremental updates
+        existing = {row.key: row for row in LeaderboardPartition.objects.select_for_update().filter(
+            fitness_test=fitness_test)}
+        Leaderboard.objects.filter(fitness_test=fitness_test, leaderboard_type__in=PARTITION_FIELDS).delete()
+        # New versions make every process reload its indexes of this test
+        rows = []
+        for partition, ranked in members.values():
+            row = existing.pop(partition.key, None) or LeaderboardPartition(key=partition.key, **partition.filters())
+            row.participants = len(ranked)
+            row.version = uuid.uuid4().hex
+            row.save()
+            rows.append(row)
+        LeaderboardPartition.objects.filter(pk__in=[row.pk for row in existing.values()]).delete()
+
+        for (partition, ranked), row in zip(members.values(), rows):
+            values = [partition.order_value(recording.final_score) for recording in ranked]
+            rank = 0
+            for position, (recording, value) in enumerate(zip(ranked, values)):
+                if position == 0 or value != values[position - 1]:
+                    rank = position + 1
+                athlete = recording.athlete
+                created.append(Leaderboard(
+                    athlete=athlete,
+                    fitness_test=fitness_test,
+                    leaderboard_type=partition.leaderboard_type,
+                    current_rank=rank,
+                    best_score=recording.final_score,
+                    total_points=recording.points_earned or 0,
+                    partition=row,
+                    age_group=age_group(athlete.age),
+                    gender=athlete.gender,
+                    state=athlete.state,
+                    district=athlete.district,
+                ))
+        Leaderboard.objects.bulk_create(created, batch_size=getattr(settings, 'LEADERBOARD_BATCH_SIZE', 1000))
+        mark_rankings_stale(TestRecording.objects.filter(fitness_test=fitness_test).values('athlete_id'))
+    return len(created)
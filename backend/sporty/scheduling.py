@@ -0,0 +1,212 @@
+"""
+Priority and fair-share routing of video analysis onto Celery queues.
+
+Recordings go to a queue by cost class (estimated from the test's analyzer
+plug-in and the video duration), so a camp uploading hundreds of endurance
+runs cannot starve single sit-up clips. Retries and SAI re-reviews go to
+the priority queue. Within a queue, the message priority is lowered for
+districts and athletes that already have many recordings in flight.
+
+Queue depth, in-flight counts and wait times are counters in the shared
+Django cache (Redis, see CACHES), updated with atomic ``incr`` only, so
+every web and worker process reads the same numbers. Wait times are a
+histogram per queue and hour: percentiles are bucket upper bounds over
+the current and previous hour.
+"""
+
+import bisect
+import logging
+import time
+import uuid
+
+from celery.signals import task_prerun, task_postrun
+from django.conf import settings
+from django.core.cache import cache
+
+from .analyzers import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_QUEUE = 'analysis.priority'
+COST_QUEUES = (
+    # (queue, upper bound of estimated cost; None = unbounded)
+    ('analysis.short', 15),
+    ('analysis.standard', 60),
+    ('analysis.long', None),
+)
+ANALYSIS_QUEUES = (PRIORITY_QUEUE,) + tuple(queue for queue, _ in COST_QUEUES)
+
+PRIORITY_REASONS = ('retry', 'review')
+BASE_PRIORITY = 3  # Celery/Redis priority: 0 is served first, 9 last
+MAX_PRIORITY = 9
+
+WAIT_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200, 86400)  # upper bounds, s
+WAIT_WINDOW_SECONDS = 60 * 60
+METRICS_TIMEOUT = 24 * 60 * 60
+
+
+def queue_for(recording, reason='upload'):
+    """Queue name for a recording"""
+    if reason in PRIORITY_REASONS:
+        return PRIORITY_QUEUE
+    plugin = REGISTRY.get(recording.fitness_test.name)
+    cost = plugin.estimate_cost(recording.video_duration) if plugin else float(recording.video_duration or 30)
+    for queue, max_cost in COST_QUEUES:
+        if max_cost is None or cost < max_cost:
+            return queue
+
+
+def share_keys(recording):
+    athlete = recording.athlete
+    return (
+        f'sched:inflight:athlete:{athlete.id}',
+        f'sched:inflight:district:{athlete.state}:{athlete.district}',
+    )
+
+
+def fair_share_priority(recording, reason='upload'):
+    """Message priority; drops one step per slice of in-flight work of the same athlete/district"""
+    if reason in PRIORITY_REASONS:
+        return 0
+    athlete_key, district_key = share_keys(recording)
+    athlete_slice = getattr(settings, 'ANALYSIS_FAIR_SHARE_ATHLETE_SLICE', 5)
+    district_slice = getattr(settings, 'ANALYSIS_FAIR_SHARE_DISTRICT_SLICE', 50)
+    penalty = max(
+        (cache.get(athlete_key) or 0) // athlete_slice,
+        (cache.get(district_key) or 0) // district_slice,
+    )
+    return min(BASE_PRIORITY + penalty, MAX_PRIORITY)
+
+
+def _incr(key, delta=1):
+    cache.add(key, 0, METRICS_TIMEOUT)
+    try:
+        return cache.incr(key, delta)
+    except ValueError:  # expired between add and incr
+        cache.set(key, max(delta, 0), METRICS_TIMEOUT)
+        return max(delta, 0)
+
+
+def _dispatch(task, args, recordings, queue, priority):
+    """apply_async with the bookkeeping used for depth, wait and fair-share metrics"""
+    task_id = str(uuid.uuid4())
+    keys = tuple(key for recording in recordings for key in share_keys(recording)) + (f'sched:depth:{queue}',)
+    for key in keys:
+        _incr(key)
+    cache.set(f'sched:task:{task_id}', {
+        'queue': queue,
+        'enqueued_at': time.time(),
+        'keys': keys,
+    }, METRICS_TIMEOUT)
+
+    task.apply_async(args=args, queue=queue, priority=priority, task_id=task_id)
+    return task_id
+
+
+def enqueue_analysis(recording, reason='upload'):
+    """Queue process_video_analysis for a recording; returns the Celery task id"""
+    from .tasks import process_video_analysis
+
+    queue = queue_for(recording, reason)
+    priority = fair_share_priority(recording, reason)
+    # A re-review re-runs the analyzers rather than reusing the stored result
+    use_cache = reason != 'review'
+    task_id = _dispatch(process_video_analysis, [recording.id, use_cache], [recording], queue, priority)
+    logger.info(f"Queued recording {recording.id} on {queue} (priority {priority}, reason {reason})")
+    return task_id
+
+
+def enqueue_batch(recordings):
+    """Queue many recordings at once, grouping short and standard clips for batched pose inference.
+
+    Long recordings (and everything when POSE_BATCH_INFERENCE is off) are
+    queued one by one. Returns the Celery task ids.
+    """
+    from .tasks import process_video_batch
+
+    if not getattr(settings, 'POSE_BATCH_INFERENCE', False):
+        return [enqueue_analysis(recording) for recording in recordings]
+
+    task_ids = []
+    by_queue = {}
+    for recording in recordings:
+        queue = queue_for(recording)
+        if queue == COST_QUEUES[-1][0]:
+            task_ids.append(enqueue_analysis(recording))
+        else:
+            by_queue.setdefault(queue, []).append(recording)
+
+    batch_videos = getattr(settings, 'POSE_BATCH_VIDEOS', 8)
+    for queue, queued in by_queue.items():
+        for start in range(0, len(queued), batch_videos):
+            batch = queued[start:start + batch_videos]
+            priority = max(fair_share_priority(recording) for recording in batch)
+            task_ids.append(_dispatch(process_video_batch, [[recording.id for recording in batch]],
+                                      batch, queue, priority))
+        logger.info(f"Queued {len(queued)} recordings on {queue} in batches of {batch_videos}")
+    return task_ids
+
+
+def _wait_key(queue, window, field):
+    return f'sched:wait:{queue}:{window}:{field}'
+
+
+def _record_wait(queue, seconds):
+    window = int(time.time() // WAIT_WINDOW_SECONDS)
+    bucket = min(bisect.bisect_left(WAIT_BUCKETS, seconds), len(WAIT_BUCKETS) - 1)
+    _incr(_wait_key(queue, window, bucket))
+    _incr(_wait_key(queue, window, 'sum_ms'), int(seconds * 1000))
+
+
+@task_prerun.connect
+def _on_task_start(task_id=None, task=None, **kwargs):
+    info = cache.get(f'sched:task:{task_id}')
+    if info and not info.get('started'):
+        _record_wait(info['queue'], time.time() - info['enqueued_at'])
+        _incr(f"sched:depth:{info['queue']}", -1)
+        info['started'] = True
+        cache.set(f'sched:task:{task_id}', info, METRICS_TIMEOUT)
+
+
+@task_postrun.connect
+def _on_task_finish(task_id=None, task=None, **kwargs):
+    info = cache.get(f'sched:task:{task_id}')
+    if info:
+        for key in info['keys'][:-1]:  # athlete / district in-flight counters of every recording
+            _incr(key, -1)
+        cache.delete(f'sched:task:{task_id}')
+
+
+def _bucket_bound(counts, fraction):
+    """Upper bound of the histogram bucket holding the ``fraction`` quantile"""
+    target = fraction * sum(counts)
+    seen = 0
+    for bucket, count in enumerate(counts):
+        seen += count
+        if count and seen >= target:
+            return WAIT_BUCKETS[bucket]
+
+
+def queue_metrics():
+    """Depth and wait-time statistics (current and previous hour) for every analysis queue"""
+    window = int(time.time() // WAIT_WINDOW_SECONDS)
+    fields = tuple(range(len(WAIT_BUCKETS))) + ('sum_ms',)
+    keys = [_wait_key(queue, w, field) for queue in ANALYSIS_QUEUES for w in (window - 1, window) for field in fields]
+    values = cache.get_many(keys + [f'sched:depth:{queue}' for queue in ANALYSIS_QUEUES])
+
+    def total(queue, field):
+        return sum(values.get(_wait_key(queue, w, field)) or 0 for w in (window - 1, window))
+
+    metrics = {}
+    for queue in ANALYSIS_QUEUES:
+        counts = [total(queue, bucket) for bucket in range(len(WAIT_BUCKETS))]
+        samples = sum(counts)
+        metrics[queue] = {
+            'depth': max(values.get(f'sched:depth:{queue}') or 0, 0),
+            'wait_samples': samples,
+            'wait_mean_seconds': round(total(queue, 'sum_ms') / samples / 1000, 3) if samples else None,
+            'wait_p50_seconds': _bucket_bound(counts, 0.5) if samples else None,
+            'wait_p95_seconds': _bucket_bound(counts, 0.95) if samples else None,
+            'wait_max_seconds': _bucket_bound(counts, 1.0) if samples else None,
+        }
+    return metrics
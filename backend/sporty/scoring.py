@@ -0,0 +1,268 @@
+"""
+Grading of test scores against AgeBenchmark thresholds, and the session /
+athlete score rollups built on them.
+"""
+
+import logging
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Avg, Count, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .benchmarks import benchmark_index
+from .models import AthleteProfile, AssessmentSession, TestRecording
+from . import platform_stats, summaries
+from .profiles import forget_athletes
+
+logger = logging.getLogger(__name__)
+
+# Approximate percentile at each benchmark threshold
+THRESHOLD_PERCENTILES = (
+    ('below_average', 25),
+    ('average', 50),
+    ('good', 75),
+    ('excellent', 90),
+)
+
+
+def grade_from_points(points):
+    """Letter grade on the 0-100 points scale used for sessions and athletes"""
+    if points >= 90: return 'A+'
+    elif points >= 80: return 'A'
+    elif points >= 70: return 'B+'
+    elif points >= 60: return 'B'
+    elif points >= 50: return 'C+'
+    else: return 'C'
+
+
+def find_benchmark(fitness_test, athlete):
+    return benchmark_index.lookup(fitness_test.id, athlete.gender, athlete.age)
+
+
+def calculate_performance_grade(score, fitness_test, athlete, benchmark=None):
+    """(grade, percentile, points) of a score for the athlete's age/gender group.
+
+    Timed tests have thresholds that decrease from below-average to
+    excellent; the comparison direction follows the thresholds. Returns
+    (None, None, None) when no benchmark covers the athlete.
+    """
+    benchmark = benchmark or find_benchmark(fitness_test, athlete)
+    if benchmark is None or score is None:
+        return None, None, None
+
+    level = threshold_level(score, benchmark)
+    points = getattr(benchmark, f'{level}_points') if level else 0
+    score, thresholds = _increasing(float(score), [float(value) for value in _thresholds(benchmark)])
+    percentile = _interpolate_percentile(score, thresholds)
+    return grade_from_points(points), percentile, points
+
+
+def _thresholds(benchmark):
+    return [getattr(benchmark, f'{level}_threshold') for level, _ in THRESHOLD_PERCENTILES]
+
+
+def _increasing(score, thresholds):
+    """Lower is better (thresholds decrease): mirror so higher always means better"""
+    if thresholds[-1] < thresholds[0]:
+        return -score, [-value for value in thresholds]
+    return score, thresholds
+
+
+def threshold_level(score, benchmark):
+    """Highest threshold level the score reaches ('excellent' ... 'below_average'), or None.
+
+    Compares in Decimal, like the stored thresholds.
+    """
+    score, thresholds = _increasing(Decimal(str(score)), _thresholds(benchmark))
+    for (level, _), threshold in reversed(list(zip(THRESHOLD_PERCENTILES, thresholds))):
+        if score >= threshold:
+            return level
+    return None
+
+
+def _interpolate_percentile(score, thresholds):
+    """Piecewise-linear percentile through the threshold anchors, clamped to [1, 99]"""
+    anchors = [percentile for _, percentile in THRESHOLD_PERCENTILES]
+    if score <= thresholds[0]:
+        span = thresholds[1] - thresholds[0] or 1.0
+        return round(max(1.0, anchors[0] - (thresholds[0] - score) / span * anchors[0]), 2)
+    if score >= thresholds[-1]:
+        span = thresholds[-1] - thresholds[-2] or 1.0
+        return round(min(99.0, anchors[-1] + (score - thresholds[-1]) / span * (anchors[-1] - anchors[-2])), 2)
+    for (low, high), (low_pct, high_pct) in zip(zip(thresholds, thresholds[1:]), zip(anchors, anchors[1:])):
+        if low <= score <= high:
+            fraction = (score - low) / (high - low) if high > low else 1.0
+            return round(low_pct + fraction * (high_pct - low_pct), 2)
+    return float(anchors[0])
+
+
+# Session and athlete rollups
+
+def _recording_totals(recordings):
+    return recordings.filter(processing_status='completed').aggregate(
+        recordings=Count('id'),
+        points=Sum(Coalesce('points_earned', Value(0))),
+        percentile=Avg('percentile'),
+    )
+
+
+def session_score(totals):
+    """Score fields of a session from its completed recordings' totals (mean points, mean percentile)"""
+    overall = round(Decimal(totals['points'] or 0) / totals['recordings'], 2)
+    percentile = totals['percentile']
+    return {
+        'overall_score': overall,
+        'percentile_rank': round(Decimal(str(percentile)), 2) if percentile is not None else None,
+        'overall_grade': grade_from_points(overall),
+    }
+
+
+def athlete_score(average):
+    """Talent score fields of an athlete from the mean score of their completed sessions"""
+    average = round(Decimal(str(average)), 2)
+    return {'overall_talent_score': average, 'talent_grade': grade_from_points(average)}
+
+
+def _assign(instance, values):
+    """Set changed values on the instance; returns the names of the fields that changed"""
+    changed = [name for name, value in values.items() if getattr(instance, name) != value]
+    for name in changed:
+        setattr(instance, name, values[name])
+    return changed
+
+
+def score_athlete(athlete):
+    """Recompute the talent score from the athlete's completed sessions; saves only changed fields"""
+    average = AssessmentSession.objects.filter(
+        athlete=athlete, status='completed'
+    ).aggregate(average=Avg('overall_score'))['average']
+    if average is None:
+        return []
+    changed = _assign(athlete, athlete_score(average))
+    if changed:
+        athlete.save(update_fields=changed + ['updated_at'])
+    return changed
+
+
+def score_session(session, update_fields=()):
+    """Roll a session's completed recordings up into its score and the athlete's talent score.
+
+    One aggregate query per rollup. The session is saved once, with only the
+    score fields that changed plus ``update_fields`` the caller already set.
+    """
+    totals = _recording_totals(TestRecording.objects.filter(session=session))
+    changed = list(update_fields)
+    if totals['recordings']:
+        changed += _assign(session, session_score(totals))
+    if changed:
+        session.save(update_fields=changed)
+    if totals['recordings'] and session.athlete_id:
+        score_athlete(session.athlete)
+
+
+def _chunks(ids, size):
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def regrade_recordings(session_ids, histograms):
+    """Re-apply the current benchmarks to the completed recordings of some sessions; returns the changed recordings"""
+    from . import percentiles  # pulls in the analyzer registry; only needed for bulk re-scoring
+
+    changed = []
+    recordings = TestRecording.objects.filter(
+        session_id__in=session_ids, processing_status='completed'
+    ).select_related('fitness_test', 'athlete')
+    for recording in recordings:
+        grade, percentile, points = calculate_performance_grade(
+            recording.final_score, recording.fitness_test, recording.athlete
+        )
+        cohort_percentile = percentiles.lookup(recording, histograms)
+        if cohort_percentile is not None:
+            percentile = cohort_percentile
+        values = {
+            'performance_grade': grade,
+            'percentile': round(Decimal(str(percentile)), 2) if percentile is not None else None,
+            'points_earned': points,
+        }
+        if _assign(recording, values):
+            changed.append(recording)
+    TestRecording.objects.bulk_update(changed, ['performance_grade', 'percentile', 'points_earned'])
+    return changed
+
+
+def rescore_sessions(sessions, regrade=True, batch_size=500, progress=None):
+    """Re-score many sessions (e.g. after a benchmark change) in batches.
+
+    Per batch: optionally re-grade the recordings (and copy their new points
+    onto the leaderboard rows), then one grouped aggregate
+    for the rollups of completed sessions (in-progress ones are rolled up
+    when they complete); afterwards one grouped aggregate per batch of
+    athletes. Rows are written with bulk_update, so signal-maintained state is
+    reconciled at the end: platform counters are rebuilt and the affected
+    talent summary documents dropped (rebuilt on next read).
+    ``progress(done, total)`` is called after every batch.
+    """
+    from .ranking import refresh_total_points  # pulls in the analyzer registry, like regrade_recordings
+
+    session_ids = list(sessions.order_by('id').values_list('id', flat=True))
+    stats = {'sessions': len(session_ids), 'recordings_changed': 0, 'sessions_changed': 0, 'athletes_changed': 0}
+    histograms = {}
+    athlete_ids = set()
+
+    done = 0
+    for batch in _chunks(session_ids, batch_size):
+        with transaction.atomic():
+            if regrade:
+                regraded = regrade_recordings(batch, histograms)
+                refresh_total_points(regraded)
+                stats['recordings_changed'] += len(regraded)
+
+            totals = {
+                row['session_id']: row for row in TestRecording.objects.filter(
+                    session_id__in=batch, processing_status='completed'
+                ).values('session_id').annotate(
+                    recordings=Count('id'),
+                    points=Sum(Coalesce('points_earned', Value(0))),
+                    percentile=Avg('percentile'),
+                )
+            }
+            changed = []
+            for session in AssessmentSession.objects.filter(id__in=totals, status='completed').only(
+                'id', 'athlete_id', 'overall_score', 'percentile_rank', 'overall_grade'
+            ):
+                if _assign(session, session_score(totals[session.id])):
+                    changed.append(session)
+                if session.athlete_id:
+                    athlete_ids.add(session.athlete_id)
+            AssessmentSession.objects.bulk_update(changed, ['overall_score', 'percentile_rank', 'overall_grade'])
+            stats['sessions_changed'] += len(changed)
+
+        done += len(batch)
+        if progress:
+            progress(done, len(session_ids))
+
+    now = timezone.now()
+    for batch in _chunks(sorted(athlete_ids), batch_size):
+        with transaction.atomic():
+            averages = dict(AssessmentSession.objects.filter(
+                athlete_id__in=batch, status='completed', overall_score__isnull=False
+            ).values('athlete_id').annotate(average=Avg('overall_score')).values_list('athlete_id', 'average'))
+            changed = []
+            for athlete in AthleteProfile.objects.filter(id__in=averages).only(
+                'id', 'auth_user_id', 'overall_talent_score', 'talent_grade', 'updated_at'
+            ):
+                if _assign(athlete, athlete_score(averages[athlete.id])):
+                    athlete.updated_at = now
+                    changed.append(athlete)
+            AthleteProfile.objects.bulk_update(changed, ['overall_talent_score', 'talent_grade', 'updated_at'])
+            forget_athletes([athlete.auth_user_id for athlete in changed])
+            stats['athletes_changed'] += len(changed)
+
+    if stats['recordings_changed'] or stats['sessions_changed'] or stats['athletes_changed']:
+        summaries.discard(athlete_ids)
+        platform_stats.rebuild()
+    logger.info(f"Re-scored {stats['sessions']} sessions: {stats}")
+    return stats
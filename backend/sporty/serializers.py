@@ -1,7 +1,47 @@
 from rest_framework import serializers
 from .models import *
+from .storage import resolve_url
 from datetime import date
 
+
+def related_paths(serializer_class, model=None, prefix=''):
+    """select_related paths for the relations a serializer's fields read.
+
+    Dotted ``source`` attributes (``athlete.full_name``) and nested
+    serializers (``AssessmentSessionSerializer(source='assessment_session')``)
+    are followed through forward foreign keys; other fields cost no query.
+    """
+    model = model or serializer_class.Meta.model
+    paths = set()
+    for name, field in serializer_class._declared_fields.items():
+        parts = (field.source or name).split('.')
+        nested = isinstance(field, serializers.ModelSerializer)
+        relations = parts if nested else parts[:-1]
+
+        current, path = model, []
+        for part in relations:
+            try:
+                relation = current._meta.get_field(part)
+            except Exception:
+                break
+            if not (relation.many_to_one or relation.one_to_one):
+                break
+            path.append(part)
+            current = relation.related_model
+        else:
+            if path:
+                paths.add(prefix + '__'.join(path))
+                if nested:
+                    paths |= related_paths(type(field), current, prefix + '__'.join(path) + '__')
+    return paths
+
+
+def eager_load(queryset, serializer_class):
+    """``queryset`` with every relation ``serializer_class`` reads joined in"""
+    paths = related_paths(serializer_class, queryset.model)
+    return queryset.select_related(*sorted(paths)) if paths else queryset
+
+
 class AthleteProfileSerializer(serializers.ModelSerializer):
     age = serializers.SerializerMethodField()
     
@@ -50,28 +90,62 @@ class TestRecordingSerializer(serializers.ModelSerializer):
     class Meta:
         model = TestRecording
         fields = '__all__'
-        read_only_fields = ('id', 'created_at', 'processed_at')
+        read_only_fields = ('id', 'video_digest', 'created_at', 'processed_at')
+    
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data['original_video_url'] = resolve_url(data['original_video_url'])
+        return data
 
 class VideoUploadSerializer(serializers.Serializer):
     """Serializer for video upload endpoint"""
     session_id = serializers.UUIDField()
     fitness_test_id = serializers.IntegerField()
-    video_file = serializers.FileField()
+    video_file = serializers.FileField(required=False)
+    upload_id = serializers.UUIDField(required=False, help_text="Completed resumable upload to attach instead of video_file")
     device_analysis_score = serializers.DecimalField(max_digits=10, decimal_places=3, required=False)
     device_analysis_confidence = serializers.DecimalField(max_digits=5, decimal_places=4, required=False)
     device_analysis_data = serializers.JSONField(required=False)
     device_info = serializers.JSONField(required=False)
+    
+    def validate(self, data):
+        """Ensure exactly one of video_file or upload_id is provided"""
+        if not data.get('video_file') and not data.get('upload_id'):
+            raise serializers.ValidationError("Either video_file or upload_id must be provided")
+        
+        if data.get('video_file') and data.get('upload_id'):
+            raise serializers.ValidationError("Provide either video_file or upload_id, not both")
+        
+        return data
+
+class BatchUploadItemSerializer(serializers.Serializer):
+    """One recording of a batch upload manifest"""
+    session_id = serializers.UUIDField()
+    fitness_test_id = serializers.IntegerField()
+    file = serializers.CharField(required=False, help_text="Name of the multipart field holding the video")
+    upload_id = serializers.UUIDField(required=False, help_text="Completed resumable upload to attach instead of a file")
+    video_duration = serializers.DecimalField(max_digits=6, decimal_places=2, required=False)
+    device_analysis_score = serializers.DecimalField(max_digits=10, decimal_places=3, required=False)
+    device_analysis_confidence = serializers.DecimalField(max_digits=5, decimal_places=4, required=False)
+    device_analysis_data = serializers.JSONField(required=False)
+    
+    def validate(self, data):
+        """Ensure exactly one of file or upload_id is provided"""
+        if bool(data.get('file')) == bool(data.get('upload_id')):
+            raise serializers.ValidationError("Provide either file or upload_id")
+        return data
 
 class LeaderboardSerializer(serializers.ModelSerializer):
     athlete_name = serializers.CharField(source='athlete.full_name', read_only=True)
     athlete_state = serializers.CharField(source='athlete.state', read_only=True)
     athlete_district = serializers.CharField(source='athlete.district', read_only=True)
     fitness_test_name = serializers.CharField(source='fitness_test.display_name', read_only=True)
+    total_participants = serializers.IntegerField(source='partition.participants', read_only=True, default=None)
     rank_change = serializers.SerializerMethodField()
     
     class Meta:
         model = Leaderboard
-        fields = '__all__'
+        exclude = ('partition',)
     
     def get_rank_change(self, obj):
         if obj.previous_rank:
@@ -114,22 +188,22 @@ class TalentSummarySerializer(serializers.ModelSerializer):
     
     def get_recent_sessions(self, obj):
         sessions = AssessmentSession.objects.filter(athlete=obj).order_by('-created_at')[:3]
-        return AssessmentSessionSerializer(sessions, many=True).data
+        return AssessmentSessionSerializer(eager_load(sessions, AssessmentSessionSerializer), many=True).data
     
     def get_best_performances(self, obj):
         recordings = TestRecording.objects.filter(
             athlete=obj, 
             processing_status='completed'
         ).order_by('-percentile')[:5]
-        return TestRecordingSerializer(recordings, many=True).data
+        return TestRecordingSerializer(eager_load(recordings, TestRecordingSerializer), many=True).data
     
     def get_earned_badges(self, obj):
         badges = AthleteBadge.objects.filter(athlete=obj).order_by('-earned_at')[:10]
-        return AthleteBadgeSerializer(badges, many=True).data
+        return AthleteBadgeSerializer(eager_load(badges, AthleteBadgeSerializer), many=True).data
     
     def get_current_rankings(self, obj):
         rankings = Leaderboard.objects.filter(athlete=obj)
-        return LeaderboardSerializer(rankings, many=True).data
+        return LeaderboardSerializer(eager_load(rankings, LeaderboardSerializer), many=True).data
 
 class BenchmarkComparisonSerializer(serializers.Serializer):
     """For comparing athlete performance against benchmarks"""
@@ -172,6 +246,11 @@ class ExerciseUploadSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ('id', 'athlete', 'uploaded_at', 'processed_at', 'analysis_results')
     
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data['video_url'] = resolve_url(data['video_url'])
+        return data
+    
     def get_analysis_summary(self, obj):
         """Get a summary of the analysis results"""
         if obj.analysis_results and obj.status == 'completed':
@@ -200,4 +279,10 @@ class ExerciseUploadRequestSerializer(serializers.Serializer):
         if data.get('video_file') and data.get('image_file'):
             raise serializers.ValidationError("Provide either video_file or image_file, not both")
         
-        return data
\ No newline at end of file
+        return data
+
+class ResumableUploadSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ResumableUpload
+        fields = ('id', 'filename', 'upload_length', 'upload_offset', 'status', 'created_at', 'updated_at')
+        read_only_fields = ('id', 'upload_offset', 'status', 'created_at', 'updated_at')
@@ -61,6 +61,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'sporty.db.StatementTimeoutMiddleware',  # Default query timeout for web requests only
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -96,9 +97,32 @@ WSGI_APPLICATION = 'sporty.wsgi.application'
 
 import dj_database_url
 
+# Persistent connections, checked before reuse. Behind pgbouncer in transaction
+# pooling mode (DB_PGBOUNCER=true) server-side cursors and session-level settings
+# are unavailable; per-endpoint timeouts use transaction-local settings (db.py).
+# Web processes default to DB_STATEMENT_TIMEOUT_MS (StatementTimeoutMiddleware);
+# migrations, management commands and Celery tasks run without a timeout.
+DB_CONN_MAX_AGE = int(os.getenv('DB_CONN_MAX_AGE', 600))
+DB_PGBOUNCER = os.getenv('DB_PGBOUNCER', 'false').lower() == 'true'
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 30000))  # default for web request queries
+
+
+def database_config(url):
+    config = dj_database_url.parse(url, conn_max_age=DB_CONN_MAX_AGE, conn_health_checks=True)
+    if config['ENGINE'] == 'django.db.backends.postgresql':
+        if DB_PGBOUNCER:
+            config['DISABLE_SERVER_SIDE_CURSORS'] = True
+    return config
+
+
 DATABASES = {
-    'default': dj_database_url.parse(os.getenv("SUPABASE_DB_URL"))
+    'default': database_config(os.getenv("SUPABASE_DB_URL"))
 }
+# Read replica for the heavy read endpoints (leaderboards, talent summary, platform stats)
+if os.getenv('SUPABASE_DB_REPLICA_URL'):
+    DATABASES['replica'] = database_config(os.getenv('SUPABASE_DB_REPLICA_URL'))
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+DATABASE_ROUTERS = ['sporty.db_routers.ReplicaRouter']
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -143,22 +167,132 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
 # Media files (User uploaded files)
 MEDIA_URL = '/media/'
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+MEDIA_ROOT = os.getenv('MEDIA_ROOT', os.path.join(BASE_DIR, 'media'))  # point scratch runs at a temp dir
+
+# In-flight streaming uploads (spool files, partial pose timelines)
+VIDEO_INGEST_ROOT = os.path.join(MEDIA_ROOT, 'ingest')
 
 # File upload settings
-FILE_UPLOAD_MAX_MEMORY_SIZE = 50 * 1024 * 1024  # 50MB
+# Larger uploads spool to a temp file instead of being held in worker memory
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2 * 1024 * 1024  # 2MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 50 * 1024 * 1024  # 50MB
+BATCH_UPLOAD_MAX_ITEMS = 500  # recordings per camp-mode batch upload
+DATA_UPLOAD_MAX_NUMBER_FILES = BATCH_UPLOAD_MAX_ITEMS  # Django's default of 100 would cut camp batches short
+
+# Video storage: 'local' (MEDIA_ROOT) or 's3' (AWS S3 / MinIO)
+VIDEO_STORAGE_BACKEND = os.getenv('VIDEO_STORAGE_BACKEND', 'local')
+VIDEO_STORAGE_BUCKET = os.getenv('VIDEO_STORAGE_BUCKET')
+VIDEO_STORAGE_S3_ENDPOINT_URL = os.getenv('VIDEO_STORAGE_S3_ENDPOINT_URL')  # e.g. http://localhost:9000 for MinIO
+VIDEO_STORAGE_S3_REGION = os.getenv('VIDEO_STORAGE_S3_REGION')
+VIDEO_STORAGE_S3_ACCESS_KEY = os.getenv('VIDEO_STORAGE_S3_ACCESS_KEY')
+VIDEO_STORAGE_S3_SECRET_KEY = os.getenv('VIDEO_STORAGE_S3_SECRET_KEY')
+STORAGE_CHUNK_SIZE = 8 * 1024 * 1024  # multipart part size = max upload bytes held in memory per request
+
+# Resumable (tus-style) uploads
+RESUMABLE_UPLOAD_MAX_SIZE = 500 * 1024 * 1024  # 500MB
+RESUMABLE_UPLOAD_EXPIRY_SECONDS = 24 * 60 * 60  # partial uploads idle this long are garbage-collected
 
 # Supabase Configuration
 SUPABASE_URL = os.getenv('SUPABASE_URL')
 SUPABASE_ANON_KEY = os.getenv('SUPABASE_ANON_KEY')
 SUPABASE_JWT_SECRET = os.getenv('SUPABASE_JWT_SECRET')
 SUPABASE_BUCKET= os.getenv('SUPABASE_BUCKET')
+SUPABASE_SERVICE_ROLE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
+# Registration creates users already confirmed (admin API, needs the service role key) instead of
+# sending a confirmation email; without it, sign-up answers "confirmation pending" and no token
+SUPABASE_AUTO_CONFIRM_EMAIL = DEBUG
+
+# Shared keep-alive HTTP client for Supabase Auth/REST (supabase_client.py)
+SUPABASE_HTTP_POOL_SIZE = int(os.getenv('SUPABASE_HTTP_POOL_SIZE', 20))  # keep-alive connections per host
+SUPABASE_HTTP_CONNECT_TIMEOUT = 3
+SUPABASE_HTTP_READ_TIMEOUT = 10
+SUPABASE_HTTP_RETRIES = 2  # retries after the first attempt, with exponential backoff
+SUPABASE_HTTP_BACKOFF_SECONDS = 0.2
 
 # For development, you can skip JWT verification
 # Set this to False in production!
 SUPABASE_SKIP_JWT_VERIFICATION = DEBUG
 
+# RS256/ES256 tokens: JWKS document (defaults to <SUPABASE_URL>/auth/v1/.well-known/jwks.json);
+# SUPABASE_JWKS_FILE reads the key set from a local file instead (tests, offline development)
+SUPABASE_JWKS_URL = os.getenv('SUPABASE_JWKS_URL')
+SUPABASE_JWKS_FILE = os.getenv('SUPABASE_JWKS_FILE')
+JWKS_REFRESH_SECONDS = 600  # background re-fetch of the key set
+JWKS_MIN_REFRESH_SECONDS = 30  # rate limit of re-fetches caused by unknown key ids
+AUTH_TOKEN_CACHE_SIZE = 10000  # verified tokens kept per process, until their exp
+AUTH_TOKEN_NEGATIVE_SECONDS = 60  # how long a rejected token is rejected without re-verifying
+ATHLETE_PROFILE_CACHE_SECONDS = 60  # cached AthleteProfile per auth user, dropped on profile save (shared cache only)
+
+# Celery / pose inference workers
+CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0')
+
+# Cache shared by web and worker processes (stream progress and locks, queue
+# metrics, profiles). Defaults to the Redis broker; any other broker (e.g.
+# memory:// in tests) leaves Django's per-process LocMem cache.
+CACHE_URL = os.getenv('REDIS_URL') or CELERY_BROKER_URL
+if CACHE_URL.startswith(('redis://', 'rediss://', 'unix://')):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+CELERY_TASK_ACKS_LATE = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1  # Videos are long tasks; don't hoard them
+# Analysis queues by cost class (see sporty/scheduling.py); 0 is the highest priority
+CELERY_TASK_QUEUE_MAX_PRIORITY = 9
+CELERY_TASK_DEFAULT_PRIORITY = 3
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'priority_steps': list(range(10)),
+    'sep': ':',
+    'queue_order_strategy': 'priority',
+}
+ANALYSIS_FAIR_SHARE_ATHLETE_SLICE = 5  # in-flight recordings per athlete before its priority drops a step
+ANALYSIS_FAIR_SHARE_DISTRICT_SLICE = 50  # same, per district
+CELERY_BEAT_SCHEDULE = {
+    'cleanup-stale-uploads': {
+        'task': 'sporty.tasks.cleanup_stale_uploads',
+        'schedule': 60 * 60,
+    },
+    'rebuild-platform-stats': {
+        'task': 'sporty.tasks.rebuild_platform_stats',
+        'schedule': 24 * 60 * 60,
+    },
+    'rebuild-score-distributions': {
+        'task': 'sporty.tasks.rebuild_score_distributions',
+        'schedule': 24 * 60 * 60,
+    },
+}
+PLATFORM_STATS_CACHE_SECONDS = 60  # staleness bound of the platform_stats dashboard
+BENCHMARK_INDEX_CHECK_SECONDS = 5  # how often a process checks for changed AgeBenchmark rows
+PERCENTILE_BINS = 200  # histogram bins per (test, age group, gender) cohort
+PERCENTILE_MIN_COHORT = 30  # smaller cohorts keep the benchmark-interpolated percentile
+
+# One warm pose graph per worker process; defaults to one process per core
+POSE_WORKER_PROCESSES = int(os.getenv('POSE_WORKER_PROCESSES', 0)) or os.cpu_count()
+POSE_WORKER_MAX_VIDEOS = int(os.getenv('POSE_WORKER_MAX_VIDEOS', 200))  # Replace a worker process after N tasks
+POSE_WORKER_WARM_UP = True
+# Long recordings (tests with "parallel_decode": true in ai_model_config) are
+# split into segments decoded on POSE_PARALLEL_SEGMENT_THREADS threads of the
+# worker process, each with its own pose graph
+POSE_PARALLEL_SEGMENT_SECONDS = 30
+POSE_PARALLEL_SEGMENT_THREADS = int(os.getenv('POSE_PARALLEL_SEGMENT_THREADS', 4))
+POSE_PARALLEL_OVERLAP_SECONDS = 1.0  # Tracker warm-up decoded before each segment, then dropped
+# Batched TFLite pose inference across short clips (enqueue_batch); needs tensorflow
+POSE_BATCH_INFERENCE = os.getenv('POSE_BATCH_INFERENCE', 'False').lower() == 'true'
+POSE_BATCH_SIZE = 16  # frames per interpreter invocation
+POSE_BATCH_VIDEOS = 8  # recordings gathered into one batch task
+POSE_BATCH_THREADS = int(os.getenv('POSE_BATCH_THREADS', 0)) or None  # XNNPACK threads; default one per core
+POSE_LANDMARK_MODEL_PATH = os.getenv('POSE_LANDMARK_MODEL_PATH')  # default: model bundled with mediapipe
+CELERY_WORKER_CONCURRENCY = POSE_WORKER_PROCESSES
+CELERY_WORKER_MAX_TASKS_PER_CHILD = POSE_WORKER_MAX_VIDEOS
+
+# Incremental leaderboards (sporty/ranking.py)
+LEADERBOARD_INDEX_PARTITIONS = 256  # in-memory rank indexes kept per process (LRU)
+LEADERBOARD_BATCH_SIZE = 1000  # rows per bulk insert
+LEADERBOARD_MAX_PAGE_SIZE = 200  # upper bound of the rankings ?limit=
+LEADERBOARD_COUNT_TTL = 300  # seconds a filtered participant count is cached
+
 # Django REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [],  # Remove Django auth
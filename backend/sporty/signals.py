@@ -0,0 +1,106 @@
+"""
+Model signals that keep materialized talent summaries (summaries.py),
+platform counters (platform_stats.py), the benchmark index (benchmarks.py),
+cached athlete profiles (profiles.py) and leaderboard partitions (ranking.py)
+current.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import AthleteProfile, AssessmentSession, TestRecording, AthleteBadge, AgeBenchmark
+from .summaries import refresh_on_commit, PROFILE
+from . import platform_stats
+from .benchmarks import invalidate as invalidate_benchmarks
+from .profiles import forget_athletes
+
+IN_PROGRESS_STATUSES = ('uploaded', 'analyzing', 'cheat_checking')
+
+# Athlete fields that pick their leaderboard partitions (ranking.PARTITION_FIELDS)
+RANKED_ATHLETE_FIELDS = ('state', 'district', 'age', 'gender')
+
+
+# Values as loaded, so saves can apply counter deltas. Read from __dict__ so deferred fields are not fetched.
+
+@receiver(post_init, sender=AthleteProfile)
+def remember_athlete(sender, instance, **kwargs):
+    instance._stats_previous = (instance.__dict__.get('overall_talent_score'), instance.__dict__.get('state'))
+    instance._ranked_previous = tuple(instance.__dict__.get(name) for name in RANKED_ATHLETE_FIELDS)
+
+
+@receiver(post_init, sender=AssessmentSession)
+def remember_session(sender, instance, **kwargs):
+    instance._stats_previous = instance.__dict__.get('status')
+
+
+@receiver(post_init, sender=TestRecording)
+def remember_recording(sender, instance, **kwargs):
+    instance._stats_previous = instance.__dict__.get('processing_status')
+
+
+@receiver(post_save, sender=AthleteProfile)
+def athlete_saved(sender, instance, created, **kwargs):
+    # Read before the handlers below load deferred fields
+    ranked = tuple(instance.__dict__.get(name) for name in RANKED_ATHLETE_FIELDS)
+    platform_stats.athlete_saved(instance, created, instance._stats_previous)
+    instance._stats_previous = (instance.overall_talent_score, instance.state)
+    forget_athletes([instance.auth_user_id])
+    if not created:
+        refresh_on_commit(instance, PROFILE)
+
+    if not created and ranked != instance._ranked_previous:
+        # Moved to another state, district or age group: leave the old leaderboards
+        from .tasks import relocate_athlete_rankings
+        transaction.on_commit(lambda: relocate_athlete_rankings.delay(instance.id))
+    instance._ranked_previous = tuple(instance.__dict__.get(name) for name in RANKED_ATHLETE_FIELDS)
+
+
+@receiver(post_delete, sender=AthleteProfile)
+def athlete_deleted(sender, instance, **kwargs):
+    platform_stats.athlete_deleted(instance, instance._stats_previous)
+    forget_athletes([instance.auth_user_id])
+
+
+@receiver(post_save, sender=AssessmentSession)
+def session_saved(sender, instance, created, **kwargs):
+    platform_stats.session_saved(instance, created, instance._stats_previous)
+    instance._stats_previous = instance.status
+    refresh_on_commit(instance.athlete, 'recent_sessions')
+
+
+@receiver(post_delete, sender=AssessmentSession)
+def session_deleted(sender, instance, **kwargs):
+    platform_stats.session_deleted(instance, instance._stats_previous)
+    refresh_on_commit(instance.athlete, 'recent_sessions')
+
+
+@receiver(post_delete, sender=TestRecording)
+def recording_deleted(sender, instance, **kwargs):
+    platform_stats.recording_deleted(instance, instance._stats_previous)
+    refresh_on_commit(instance.athlete, 'best_performances')
+
+
+@receiver(post_save, sender=TestRecording)
+def recording_saved(sender, instance, created, update_fields=None, **kwargs):
+    platform_stats.recording_saved(instance, created, instance._stats_previous)
+    instance._stats_previous = instance.processing_status
+
+    # Progress updates while a video is processed do not change best performances
+    if update_fields is not None and 'processing_status' not in update_fields:
+        return
+    if instance.processing_status in IN_PROGRESS_STATUSES:
+        return
+    refresh_on_commit(instance.athlete, 'best_performances')
+
+
+@receiver(post_save, sender=AthleteBadge)
+@receiver(post_delete, sender=AthleteBadge)
+def badge_changed(sender, instance, **kwargs):
+    refresh_on_commit(instance.athlete, 'earned_badges')
+
+
+@receiver(post_save, sender=AgeBenchmark)
+@receiver(post_delete, sender=AgeBenchmark)
+def benchmark_changed(sender, instance, **kwargs):
+    invalidate_benchmarks()
@@ -0,0 +1,326 @@
+"""
+Pluggable video storage with chunked, resumable multipart uploads.
+
+Uploads are written part by part (``STORAGE_CHUNK_SIZE`` bytes at most in
+memory per request), so the footprint of a request does not grow with the
+size of the file. Two backends share the same multipart API:
+
+* ``local`` - parts are files under MEDIA_ROOT, concatenated on completion.
+  Also the stand-in for object storage in development and tests.
+* ``s3`` - S3 multipart upload via boto3; works against MinIO by setting
+  ``VIDEO_STORAGE_S3_ENDPOINT_URL``.
+
+Select the backend with ``VIDEO_STORAGE_BACKEND``.
+
+Models keep ``reference(name)``, which never expires (``s3://bucket/key`` on
+S3), and responses turn it into a readable URL with ``resolve_url``, which
+presigns S3 references at read time.
+"""
+
+import abc
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+logger = logging.getLogger(__name__)
+
+S3_SCHEME = 's3://'
+S3_MISSING_CODES = ('404', 'NoSuchKey', 'NotFound')  # HEAD answers a bare 404, GET NoSuchKey
+PRESIGNED_URL_CACHE_SIZE = 1024
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024  # S3 needs parts of at least 5MB (except the last)
+COPY_BLOCK_SIZE = 1024 * 1024
+
+
+def chunk_size():
+    return getattr(settings, 'STORAGE_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+
+
+def rechunk(blocks, size):
+    """Regroup an iterable of byte blocks into parts of exactly ``size`` bytes (last may be short)"""
+    buffer = bytearray()
+    for block in blocks:
+        buffer += block
+        while len(buffer) >= size:
+            yield bytes(buffer[:size])
+            del buffer[:size]
+    if buffer:
+        yield bytes(buffer)
+
+
+class VideoStorage(abc.ABC):
+    """Multipart upload API shared by all storage backends"""
+
+    @abc.abstractmethod
+    def create_multipart(self, name):
+        """Start a multipart upload of ``name``; returns an upload id"""
+
+    @abc.abstractmethod
+    def upload_part(self, upload_id, part_number, data):
+        """Store part ``part_number`` (1-based); re-sending a part overwrites it"""
+
+    @abc.abstractmethod
+    def list_parts(self, upload_id):
+        """{part_number: size} of parts already stored, for resuming an upload"""
+
+    @abc.abstractmethod
+    def complete_multipart(self, upload_id):
+        """Assemble the parts in order; returns the stored name"""
+
+    @abc.abstractmethod
+    def abort_multipart(self, upload_id):
+        """Discard the parts of an unfinished upload"""
+
+    @abc.abstractmethod
+    def exists(self, name):
+        """Whether ``name`` is stored"""
+
+    @abc.abstractmethod
+    def delete(self, name):
+        """Remove ``name`` if it is stored"""
+
+    @abc.abstractmethod
+    def move(self, name, new_name):
+        """Rename a stored object without reading it back through this process"""
+
+    @abc.abstractmethod
+    def url(self, name, request=None):
+        """URL a client can read ``name`` from now (may expire)"""
+
+    def reference(self, name, request=None):
+        """Value to store on a model for ``name``; must not expire"""
+        return self.url(name, request)
+
+    def local_path(self, name):
+        """Filesystem path of a stored object, or None when it only lives remotely"""
+        return None
+
+    def save_stream(self, name, blocks, sha=None):
+        """Store an iterable of byte blocks as ``name`` via multipart upload.
+
+        Every part is also fed to ``sha`` (a hashlib object) as it is
+        written, so callers get the digest without a second read.
+        """
+        upload_id = self.create_multipart(name)
+        try:
+            for part_number, part in enumerate(rechunk(blocks, chunk_size()), start=1):
+                if sha is not None:
+                    sha.update(part)
+                self.upload_part(upload_id, part_number, part)
+            return self.complete_multipart(upload_id)
+        except BaseException:
+            self.abort_multipart(upload_id)
+            raise
+
+    def save_file(self, name, uploaded_file, sha=None):
+        """Store a Django UploadedFile, reading it in ``chunk_size`` blocks"""
+        uploaded_file.seek(0)
+        return self.save_stream(name, uploaded_file.chunks(chunk_size()), sha)
+
+
+class LocalStorage(VideoStorage):
+    """Filesystem backend rooted at MEDIA_ROOT"""
+
+    def __init__(self, root=None, base_url=None):
+        self.root = root or settings.MEDIA_ROOT
+        self.base_url = base_url or settings.MEDIA_URL
+        self.multipart_root = os.path.join(self.root, '.multipart')
+
+    def _upload_dir(self, upload_id):
+        return os.path.join(self.multipart_root, str(uuid.UUID(str(upload_id))))
+
+    def create_multipart(self, name):
+        upload_id = str(uuid.uuid4())
+        upload_dir = self._upload_dir(upload_id)
+        os.makedirs(upload_dir)
+        with open(os.path.join(upload_dir, 'upload.json'), 'w') as f:
+            json.dump({'name': name}, f)
+        return upload_id
+
+    def upload_part(self, upload_id, part_number, data):
+        part_path = os.path.join(self._upload_dir(upload_id), f'{int(part_number):05d}.part')
+        tmp_path = f'{part_path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, part_path)
+
+    def list_parts(self, upload_id):
+        upload_dir = self._upload_dir(upload_id)
+        return {
+            int(entry[:-len('.part')]): os.path.getsize(os.path.join(upload_dir, entry))
+            for entry in os.listdir(upload_dir) if entry.endswith('.part')
+        }
+
+    def complete_multipart(self, upload_id):
+        upload_dir = self._upload_dir(upload_id)
+        with open(os.path.join(upload_dir, 'upload.json')) as f:
+            name = json.load(f)['name']
+
+        destination = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        tmp_path = f'{destination}.{upload_id}.tmp'
+        with open(tmp_path, 'wb') as out:
+            for part_number in sorted(self.list_parts(upload_id)):
+                with open(os.path.join(upload_dir, f'{part_number:05d}.part'), 'rb') as part:
+                    shutil.copyfileobj(part, out, COPY_BLOCK_SIZE)
+        os.replace(tmp_path, destination)
+        shutil.rmtree(upload_dir)
+        return name
+
+    def abort_multipart(self, upload_id):
+        shutil.rmtree(self._upload_dir(upload_id), ignore_errors=True)
+
+    def exists(self, name):
+        return os.path.exists(os.path.join(self.root, name))
+
+    def delete(self, name):
+        path = os.path.join(self.root, name)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def move(self, name, new_name):
+        destination = os.path.join(self.root, new_name)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        os.replace(os.path.join(self.root, name), destination)
+
+    def url(self, name, request=None):
+        url = f'{self.base_url}{name}'
+        return request.build_absolute_uri(url) if request is not None else url
+
+    def local_path(self, name):
+        return os.path.join(self.root, name)
+
+
+class S3Storage(VideoStorage):
+    """S3 / MinIO backend using native multipart uploads"""
+
+    def __init__(self):
+        try:
+            import boto3
+        except ImportError:
+            raise ImproperlyConfigured('VIDEO_STORAGE_BACKEND "s3" requires boto3')
+
+        self.bucket = getattr(settings, 'VIDEO_STORAGE_BUCKET', None)
+        if not self.bucket:
+            raise ImproperlyConfigured('VIDEO_STORAGE_BUCKET must be set for the s3 backend')
+        self.client = boto3.client(
+            's3',
+            endpoint_url=getattr(settings, 'VIDEO_STORAGE_S3_ENDPOINT_URL', None),
+            region_name=getattr(settings, 'VIDEO_STORAGE_S3_REGION', None),
+            aws_access_key_id=getattr(settings, 'VIDEO_STORAGE_S3_ACCESS_KEY', None),
+            aws_secret_access_key=getattr(settings, 'VIDEO_STORAGE_S3_SECRET_KEY', None),
+        )
+        self.url_expiry = getattr(settings, 'VIDEO_STORAGE_URL_EXPIRY', 24 * 60 * 60)
+        self._urls = OrderedDict()  # name -> (presigned url, reuse until)
+
+    # S3 upload ids are only unique per key, so the id handed out carries both
+    def _split(self, upload_id):
+        key, s3_upload_id = upload_id.split('|', 1)
+        return key, s3_upload_id
+
+    def create_multipart(self, name):
+        response = self.client.create_multipart_upload(Bucket=self.bucket, Key=name)
+        return f"{name}|{response['UploadId']}"
+
+    def upload_part(self, upload_id, part_number, data):
+        key, s3_upload_id = self._split(upload_id)
+        self.client.upload_part(Bucket=self.bucket, Key=key, UploadId=s3_upload_id,
+                                PartNumber=int(part_number), Body=data)
+
+    def _parts(self, upload_id):
+        key, s3_upload_id = self._split(upload_id)
+        parts = []
+        paginator = self.client.get_paginator('list_parts')
+        for page in paginator.paginate(Bucket=self.bucket, Key=key, UploadId=s3_upload_id):
+            parts.extend(page.get('Parts', []))
+        return parts
+
+    def list_parts(self, upload_id):
+        return {part['PartNumber']: part['Size'] for part in self._parts(upload_id)}
+
+    def complete_multipart(self, upload_id):
+        key, s3_upload_id = self._split(upload_id)
+        parts = [{'PartNumber': part['PartNumber'], 'ETag': part['ETag']}
+                 for part in sorted(self._parts(upload_id), key=lambda part: part['PartNumber'])]
+        self.client.complete_multipart_upload(Bucket=self.bucket, Key=key, UploadId=s3_upload_id,
+                                              MultipartUpload={'Parts': parts})
+        return key
+
+    def abort_multipart(self, upload_id):
+        key, s3_upload_id = self._split(upload_id)
+        try:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=s3_upload_id)
+        except self.client.exceptions.NoSuchUpload:
+            pass
+
+    def exists(self, name):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=name)
+            return True
+        except self.client.exceptions.ClientError as e:
+            # Only a missing object is "not stored"; auth, throttling and server errors propagate
+            if e.response.get('Error', {}).get('Code') in S3_MISSING_CODES:
+                return False
+            raise
+
+    def delete(self, name):
+        self.client.delete_object(Bucket=self.bucket, Key=name)
+
+    def move(self, name, new_name):
+        # Server-side copy (single request up to 5GB, above RESUMABLE_UPLOAD_MAX_SIZE)
+        self.client.copy_object(Bucket=self.bucket, Key=new_name, CopySource={'Bucket': self.bucket, 'Key': name})
+        self.client.delete_object(Bucket=self.bucket, Key=name)
+
+    def url(self, name, request=None):
+        """Presigned GET URL.
+
+        Reused for half its lifetime, so one object keeps one URL (the
+        analyzer's timeline cache is keyed by it).
+        """
+        now = time.monotonic()
+        cached = self._urls.get(name)
+        if cached and cached[1] > now:
+            return cached[0]
+        url = self.client.generate_presigned_url(
+            'get_object', Params={'Bucket': self.bucket, 'Key': name}, ExpiresIn=self.url_expiry
+        )
+        self._urls[name] = (url, now + self.url_expiry / 2)
+        while len(self._urls) > PRESIGNED_URL_CACHE_SIZE:
+            self._urls.popitem(last=False)
+        return url
+
+    def reference(self, name, request=None):
+        return f'{S3_SCHEME}{self.bucket}/{name}'
+
+
+BACKENDS = {
+    'local': LocalStorage,
+    's3': S3Storage,
+}
+
+_storage = None
+
+
+def get_storage():
+    """Process-wide storage backend selected by VIDEO_STORAGE_BACKEND"""
+    global _storage
+    if _storage is None:
+        backend = getattr(settings, 'VIDEO_STORAGE_BACKEND', 'local')
+        if backend not in BACKENDS:
+            raise ImproperlyConfigured(f'Unknown VIDEO_STORAGE_BACKEND: {backend}')
+        _storage = BACKENDS[backend]()
+    return _storage
+
+
+def resolve_url(reference, request=None):
+    """Readable URL for a stored reference: presigns ``s3://`` references, returns others unchanged"""
+    if not reference or not reference.startswith(S3_SCHEME):
+        return reference
+    name = reference[len(S3_SCHEME):].split('/', 1)[1]
+    return get_storage().url(name, request)
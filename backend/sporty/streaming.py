@@ -0,0 +1,322 @@
+"""
+Streaming ingest of test recordings.
+
+Chunks of an upload are appended to a spool file as they arrive. When the
+client records fragmented MP4 (init segment followed by moof/mdat
+fragments), every complete fragment is decodable on its own together with
+the init segment, so pose extraction runs on the first fragments while
+later ones are still in flight. Plain MP4 (moov at the end) is analysed
+once the last byte has landed.
+"""
+
+import fcntl
+import json
+import logging
+import os
+import struct
+import tempfile
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+STREAM_BLOCK_SIZE = 64 * 1024
+PROGRESS_TIMEOUT = 60 * 60
+
+
+def ingest_root():
+    root = getattr(settings, 'VIDEO_INGEST_ROOT', os.path.join(settings.MEDIA_ROOT, 'ingest'))
+    os.makedirs(root, exist_ok=True)
+    return root
+
+
+class OffsetMismatch(Exception):
+    """Chunk does not start where the spool currently ends"""
+
+    def __init__(self, expected):
+        self.expected = expected
+        super().__init__(f'Expected chunk at offset {expected}')
+
+
+class SpoolBusy(OffsetMismatch):
+    """Another request is still appending to the spool"""
+
+
+class UploadSpool:
+    """Append-only spool file for one in-flight upload, plus its JSON state"""
+
+    def __init__(self, upload_id):
+        self.upload_id = str(upload_id)
+        root = ingest_root()
+        self.path = os.path.join(root, f'{self.upload_id}.part')
+        self.state_path = os.path.join(root, f'{self.upload_id}.json')
+        self.timeline_path = os.path.join(root, f'{self.upload_id}.npz')
+        self.done_path = os.path.join(root, f'{self.upload_id}.done')
+
+    @property
+    def size(self):
+        try:
+            return os.path.getsize(self.path)
+        except FileNotFoundError:
+            return 0
+
+    def exists(self):
+        return os.path.exists(self.state_path)
+
+    def create(self, **state):
+        open(self.path, 'wb').close()
+        self.save_state({
+            'init_end': None,  # byte offset where the fMP4 init segment ends
+            'processed_offset': 0,  # bytes of fragments already analysed
+            'frames_done': 0,
+            'fps': None,
+            **state,
+        })
+
+    def load_state(self):
+        with open(self.state_path) as f:
+            return json.load(f)
+
+    def save_state(self, state):
+        tmp_path = f'{self.state_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def append_stream(self, stream, offset=None, limit=None):
+        """Copy a request body into the spool in fixed-size blocks; returns the new size.
+
+        Holds an exclusive lock on the spool file while copying, so a second
+        writer gets SpoolBusy instead of interleaving bytes. At most
+        ``limit`` bytes are read. Blocks written before the client went away
+        stay in the spool; ``size`` is always the resume offset.
+        """
+        with open(self.path, 'ab') as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise SpoolBusy(self.size)
+            size = os.fstat(f.fileno()).st_size
+            if offset is not None and offset != size:
+                raise OffsetMismatch(size)
+            remaining = limit
+            while remaining is None or remaining > 0:
+                block = stream.read(STREAM_BLOCK_SIZE if remaining is None else min(STREAM_BLOCK_SIZE, remaining))
+                if not block:
+                    break
+                f.write(block)
+                f.flush()
+                if remaining is not None:
+                    remaining -= len(block)
+        return self.size
+
+    def read_range(self, start, end):
+        with open(self.path, 'rb') as f:
+            f.seek(start)
+            return f.read(end - start)
+
+    def mark_finished(self, **info):
+        """Record that the last byte has landed (kept apart from the worker-owned state).
+
+        Returns False when the upload was already marked finished, so a
+        retried finish request is not counted twice.
+        """
+        tmp_path = f'{self.done_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(info, f)
+        try:
+            os.link(tmp_path, self.done_path)  # fails if it exists, unlike os.replace
+        except FileExistsError:
+            return False
+        finally:
+            os.remove(tmp_path)
+        return True
+
+    def finished_info(self):
+        """Info passed to ``mark_finished``, or None while chunks are still arriving"""
+        try:
+            with open(self.done_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def cleanup(self):
+        for path in (self.path, self.state_path, self.timeline_path, self.done_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def collect_stale_spools(max_age_seconds):
+    """Delete spool files (and stray batch files) untouched for ``max_age_seconds``.
+
+    Returns the upload ids whose spools were removed.
+    """
+    root = ingest_root()
+    cutoff = time.time() - max_age_seconds
+    spools = {}
+    for entry in os.listdir(root):
+        spools.setdefault(entry.split('.', 1)[0], []).append(os.path.join(root, entry))
+
+    removed = []
+    for upload_id, paths in spools.items():
+        if max(os.path.getmtime(path) for path in paths) >= cutoff:
+            continue
+        for path in paths:
+            os.remove(path)
+        removed.append(upload_id)
+    return removed
+
+
+def scan_boxes(path, start=0):
+    """Complete top-level MP4 boxes from ``start`` as (type, offset, end) tuples"""
+    boxes = []
+    file_size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        offset = start
+        while offset + 8 <= file_size:
+            f.seek(offset)
+            size, box_type = struct.unpack('>I4s', f.read(8))
+            if size == 1:
+                if offset + 16 > file_size:
+                    break
+                size = struct.unpack('>Q', f.read(8))[0]
+            if size < 8 or offset + size > file_size:
+                break  # size 0 (to end of file) or box still arriving
+            boxes.append((box_type.decode('latin-1'), offset, offset + size))
+            offset += size
+    return boxes
+
+
+def complete_fragments(spool, state):
+    """Byte ranges (start, end) of fMP4 fragments that arrived since the last pass.
+
+    Sets ``state['init_end']`` once the init segment (ftyp + moov) is complete.
+    Returns an empty list for non-fragmented files.
+    """
+    if state['init_end'] is None:
+        boxes = scan_boxes(spool.path)
+        types = [box[0] for box in boxes]
+        if 'moov' not in types:
+            return []
+        moov = boxes[types.index('moov')]
+        if 'moof' not in types[types.index('moov'):] and 'mdat' in types[:types.index('moov')]:
+            return []  # mdat before moov: regular MP4, not fragmented
+        state['init_end'] = moov[2]
+        state['processed_offset'] = moov[2]
+
+    fragments = []
+    fragment_start = None
+    for box_type, start, end in scan_boxes(spool.path, state['processed_offset']):
+        if box_type == 'moof':
+            fragment_start = start
+        elif box_type == 'mdat' and fragment_start is not None:
+            fragments.append((fragment_start, end))
+            fragment_start = None
+    return fragments
+
+
+def write_batch_file(spool, state, fragments, path):
+    """Write the init segment and ``fragments`` to ``path`` at their original offsets.
+
+    Fragment headers may carry absolute byte offsets (tfhd base_data_offset),
+    so fragments keep their position; the already-analysed span in between
+    is covered by a ``free`` box left as a sparse hole.
+    """
+    gap = fragments[0][0] - state['init_end']
+    with open(path, 'wb') as f:
+        f.write(spool.read_range(0, state['init_end']))
+        if gap:
+            if gap < 0xFFFFFFFF:
+                f.write(struct.pack('>I4s', gap, b'free'))
+            else:
+                f.write(struct.pack('>I4sQ', 1, b'free', gap))
+            f.seek(fragments[0][0])
+        with open(spool.path, 'rb') as source:
+            source.seek(fragments[0][0])
+            remaining = fragments[-1][1] - fragments[0][0]
+            while remaining:
+                block = source.read(min(STREAM_BLOCK_SIZE, remaining))
+                f.write(block)
+                remaining -= len(block)
+
+
+def analyse_new_fragments(spool, analyzer, policy):
+    """Run pose on fragments that completed since the last call.
+
+    Each batch is decoded from a temporary file holding the init segment and
+    the new fragments. Landmarks are appended to the spool's partial
+    timeline. Returns the number of frames analysed so far.
+    """
+    import cv2
+
+    state = spool.load_state()
+    fragments = complete_fragments(spool, state)
+    if not fragments:
+        spool.save_state(state)
+        return state['frames_done']
+
+    fd, tmp_path = tempfile.mkstemp(suffix='.mp4', dir=ingest_root())
+    os.close(fd)
+    try:
+        write_batch_file(spool, state, fragments, tmp_path)
+        cap = cv2.VideoCapture(tmp_path)
+        fps = state['fps'] or cap.get(cv2.CAP_PROP_FPS) or 30.0
+
+        # Keep the sampling grid aligned with frames already analysed; the
+        # leading frames are grabbed here so extract_range does not seek
+        step = policy.step(fps, policy.target_fps)
+        first = -state['frames_done'] % step
+        for _ in range(first):
+            cap.grab()
+        frame_indices, landmarks = analyzer.extract_range(cap, fps, first, None, policy)
+        frame_total = max(analyzer.range_end, first)
+        cap.release()
+    finally:
+        os.remove(tmp_path)
+
+    frame_indices = frame_indices + state['frames_done']
+    if os.path.exists(spool.timeline_path):
+        previous = np.load(spool.timeline_path)
+        frame_indices = np.concatenate([previous['frame_indices'], frame_indices])
+        landmarks = np.concatenate([previous['landmarks'], landmarks])
+    np.savez(spool.timeline_path, frame_indices=frame_indices, landmarks=landmarks)
+
+    state['fps'] = fps
+    state['frames_done'] += frame_total
+    state['processed_offset'] = fragments[-1][1]
+    spool.save_state(state)
+
+    set_progress(spool.upload_id, state)
+    return state['frames_done']
+
+
+def partial_timeline(spool):
+    """PoseTimeline of everything analysed so far, or None"""
+    from .ai_processor import PoseTimeline
+
+    if not os.path.exists(spool.timeline_path):
+        return None
+    state = spool.load_state()
+    data = np.load(spool.timeline_path)
+    return PoseTimeline(data['landmarks'], data['frame_indices'].astype(np.int32), state['fps'])
+
+
+def progress_key(upload_id):
+    return f'stream_progress:{upload_id}'
+
+
+def set_progress(upload_id, state):
+    expected_frames = None
+    if state.get('expected_duration') and state.get('fps'):
+        expected_frames = int(float(state['expected_duration']) * state['fps'])
+    cache.set(progress_key(upload_id), {
+        'frames_analyzed': state['frames_done'],
+        'expected_frames': expected_frames,
+    }, PROGRESS_TIMEOUT)
+
+
+def get_progress(upload_id):
+    return cache.get(progress_key(upload_id))
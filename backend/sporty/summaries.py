@@ -0,0 +1,100 @@
+"""
+Materialized talent summary documents.
+
+The talent_summary endpoint (the app's home screen) serves one stored JSON
+document per athlete instead of running TalentSummarySerializer's nested
+queries on every read. The document has the serializer's exact shape and
+is rebuilt section by section: a completed recording refreshes
+``best_performances``, a session change ``recent_sessions``, a badge
+``earned_badges``, a profile save the profile fields and a leaderboard move
+``current_rankings`` (see signals.py and ranking.py).
+
+Athletes shifted by one rank because of someone else's result are only
+flagged ``rankings_stale``; their rankings section is rebuilt on next read.
+"""
+
+from django.db import transaction
+
+from .models import TalentSummary
+from .serializers import TalentSummarySerializer
+
+SECTIONS = ('recent_sessions', 'best_performances', 'earned_badges', 'current_rankings')
+PROFILE = 'profile'
+
+
+def profile_fields(athlete):
+    serializer = TalentSummarySerializer(athlete)
+    fields = {}
+    for name, field in serializer.fields.items():
+        if name in SECTIONS:
+            continue
+        value = field.get_attribute(athlete)
+        fields[name] = field.to_representation(value) if value is not None else None
+    return fields
+
+
+def build_section(athlete, name):
+    if name == PROFILE:
+        return profile_fields(athlete)
+    serializer = TalentSummarySerializer(athlete)
+    return {name: getattr(serializer, f'get_{name}')(athlete)}
+
+
+def build(athlete):
+    """Compute and store the full document; returns it.
+
+    Runs in a transaction so that, even under @read_replica, every read
+    goes to the primary (db.read_alias): a document built from a lagging
+    replica would be stored as current and miss the latest writes.
+    """
+    with transaction.atomic():
+        athlete.refresh_from_db()
+        document = profile_fields(athlete)
+        for name in SECTIONS:
+            document.update(build_section(athlete, name))
+        TalentSummary.objects.update_or_create(
+            athlete=athlete, defaults={'document': document, 'rankings_stale': False}
+        )
+    return document
+
+
+def refresh(athlete, *sections):
+    """Rebuild some sections of an athlete's stored document.
+
+    Athletes without a document are skipped; theirs is built on first read.
+    """
+    with transaction.atomic():
+        summary = TalentSummary.objects.select_for_update().filter(athlete=athlete).first()
+        if summary is None:
+            return None
+
+        for name in sections:
+            summary.document.update(build_section(athlete, name))
+        if 'current_rankings' in sections:
+            summary.rankings_stale = False
+        summary.save(update_fields=['document', 'rankings_stale', 'updated_at'])
+        return summary.document
+
+
+def refresh_on_commit(athlete, *sections):
+    """Refresh once the current transaction commits, so the sections read committed rows"""
+    transaction.on_commit(lambda: refresh(athlete, *sections))
+
+
+def mark_rankings_stale(athlete_ids):
+    """Flag documents whose rankings moved; ``athlete_ids`` may be a values() subquery"""
+    return TalentSummary.objects.filter(athlete_id__in=athlete_ids).update(rankings_stale=True)
+
+
+def discard(athlete_ids):
+    """Drop stored documents (after bulk writes that bypass signals); rebuilt on next read"""
+    return TalentSummary.objects.filter(athlete_id__in=athlete_ids).delete()[0]
+
+
+def get_document(summary, athlete):
+    """Stored document of a TalentSummary row (or None), bringing stale rankings up to date"""
+    if summary is None:
+        return build(athlete)
+    if summary.rankings_stale:
+        return refresh(athlete, 'current_rankings')
+    return summary.document
@@ -0,0 +1,152 @@
+"""
+Process-wide HTTP client for Supabase Auth (GoTrue) and REST (PostgREST).
+
+The auth views used to build a supabase-py client, and so a new HTTP
+connection pool, on every request. Every login then paid for client setup
+and a TLS handshake. All calls now share one ``requests.Session`` per
+process, with SUPABASE_HTTP_POOL_SIZE keep-alive connections per host.
+Every call has connect/read timeouts. Failed calls are retried with
+exponential backoff:
+
+* idempotent calls (sign-in, sign-out, reads) on connection errors and
+  502/503/504;
+* sign-up only when the connection could not be opened, so a user is
+  never created twice.
+
+The client is stateless: tokens are passed per call, never stored, so one
+instance is safe to share between users. ``supabase_stub.py`` (the
+``run_supabase_stub`` command) serves the same endpoints locally for tests
+and development.
+"""
+
+import logging
+import time
+
+import requests
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = (502, 503, 504)
+
+
+class SupabaseError(Exception):
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+_session = None
+
+
+def http_session():
+    """Shared keep-alive session (created lazily, so forked workers get their own)"""
+    global _session
+    if _session is None:
+        pool_size = getattr(settings, 'SUPABASE_HTTP_POOL_SIZE', 20)
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        _session = session
+    return _session
+
+
+def error_message(response):
+    try:
+        body = response.json()
+    except ValueError:
+        return response.text or response.reason
+    return (body.get('error_description') or body.get('msg') or body.get('message')
+            or body.get('error') or response.reason)
+
+
+class SupabaseClient:
+    def __init__(self, url, anon_key, service_key=None):
+        self.url = url.rstrip('/')
+        self.anon_key = anon_key
+        self.service_key = service_key or anon_key
+        self.timeout = (
+            getattr(settings, 'SUPABASE_HTTP_CONNECT_TIMEOUT', 3),
+            getattr(settings, 'SUPABASE_HTTP_READ_TIMEOUT', 10),
+        )
+
+    def request(self, method, path, token=None, api_key=None, idempotent=True, headers=None, **kwargs):
+        """JSON body of a successful response; raises SupabaseError otherwise"""
+        api_key = api_key or self.anon_key
+        headers = {'apikey': api_key, 'Authorization': f'Bearer {token or api_key}', **(headers or {})}
+        retries = getattr(settings, 'SUPABASE_HTTP_RETRIES', 2)
+        backoff = getattr(settings, 'SUPABASE_HTTP_BACKOFF_SECONDS', 0.2)
+
+        for attempt in range(retries + 1):
+            retry = attempt < retries
+            try:
+                response = http_session().request(
+                    method, f'{self.url}{path}', headers=headers, timeout=self.timeout, **kwargs
+                )
+            except requests.ConnectTimeout as e:
+                error = e
+            except (requests.ConnectionError, requests.Timeout) as e:
+                # The request may have reached the server
+                error = e
+                retry = retry and idempotent
+            else:
+                if response.status_code in RETRY_STATUSES and retry and idempotent:
+                    error = SupabaseError(error_message(response), response.status_code)
+                elif response.status_code >= 400:
+                    raise SupabaseError(error_message(response), response.status_code)
+                else:
+                    return response.json() if response.content else None
+
+            if not retry:
+                raise SupabaseError(f'Supabase unavailable: {str(error)}', getattr(error, 'status_code', None))
+            delay = backoff * 2 ** attempt
+            logger.warning(f'Supabase {method} {path} failed ({str(error)}), retrying in {delay:.1f}s')
+            time.sleep(delay)
+
+    # Auth (GoTrue)
+
+    def sign_in_with_password(self, email, password):
+        """Session: access_token, refresh_token, expires_in and user"""
+        return self.request('POST', '/auth/v1/token', params={'grant_type': 'password'},
+                            json={'email': email, 'password': password})
+
+    def sign_up(self, email, password, data=None):
+        """Session with user, or just the user while email confirmation is pending"""
+        return self.request('POST', '/auth/v1/signup', idempotent=False,
+                            json={'email': email, 'password': password, 'data': data or {}})
+
+    def create_user(self, email, password, data=None, email_confirm=True):
+        """Create a user through the admin API (service key), confirmed unless ``email_confirm`` is False"""
+        return self.request('POST', '/auth/v1/admin/users', api_key=self.service_key, idempotent=False,
+                            json={'email': email, 'password': password, 'email_confirm': email_confirm,
+                                  'user_metadata': data or {}})
+
+    def sign_out(self, access_token):
+        return self.request('POST', '/auth/v1/logout', token=access_token)
+
+    # REST (PostgREST), with the service key
+
+    def select(self, table, params=None):
+        return self.request('GET', f'/rest/v1/{table}', api_key=self.service_key, params=params)
+
+    def insert(self, table, data):
+        return self.request('POST', f'/rest/v1/{table}', api_key=self.service_key, idempotent=False,
+                            json=data, headers={'Prefer': 'return=representation'})
+
+
+_client = None
+
+
+def get_supabase():
+    """Process-wide client for SUPABASE_URL"""
+    global _client
+    if _client is None:
+        url = getattr(settings, 'SUPABASE_URL', None)
+        anon_key = getattr(settings, 'SUPABASE_ANON_KEY', None)
+        if not url or not anon_key:
+            raise ImproperlyConfigured('SUPABASE_URL and SUPABASE_ANON_KEY must be configured')
+        _client = SupabaseClient(url, anon_key, getattr(settings, 'SUPABASE_SERVICE_ROLE_KEY', None))
+    return _client
@@ -0,0 +1,150 @@
+"""
+In-memory stand-in for the Supabase Auth and REST endpoints used by
+supabase_client.py, for tests and offline development.
+
+Users live in memory and tokens are HS256 JWTs signed with
+SUPABASE_JWT_SECRET, so SupabaseAuthMiddleware accepts them. The server
+speaks HTTP/1.1 keep-alive like the real service. Setting
+``server.fail_next`` answers that many requests with 503, to exercise
+client retries; ``server.confirm_email`` makes sign-up wait for an email
+confirmation like a project with confirmations enabled. Run it with ``manage.py run_supabase_stub`` and point
+SUPABASE_URL at it.
+"""
+
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import jwt
+
+TOKEN_LIFETIME = 3600
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # headers and body are separate writes
+
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, status, body=None):
+        payload = json.dumps(body).encode() if body is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def bearer_claims(self):
+        token = (self.headers.get('Authorization') or '').removeprefix('Bearer ')
+        try:
+            return jwt.decode(token, self.server.secret, algorithms=['HS256'], audience='authenticated')
+        except jwt.InvalidTokenError:
+            return None
+
+    def session(self, user):
+        now = int(time.time())
+        claims = {'sub': user['id'], 'email': user['email'], 'role': 'authenticated', 'aud': 'authenticated',
+                  'iat': now, 'exp': now + TOKEN_LIFETIME}
+        return {
+            'access_token': jwt.encode(claims, self.server.secret, algorithm='HS256'),
+            'token_type': 'bearer',
+            'expires_in': TOKEN_LIFETIME,
+            'refresh_token': uuid.uuid4().hex,
+            'user': user,
+        }
+
+    def handle_request(self, method):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            failing = server.fail_next > 0
+            server.fail_next -= failing
+        if failing:
+            if method == 'POST':
+                self.body()
+            return self.reply(503, {'message': 'Service unavailable'})
+        if not self.headers.get('apikey'):
+            return self.reply(401, {'message': 'No API key found in request'})
+
+        url = urlparse(self.path)
+        data = self.body() if method == 'POST' else None
+
+        if (method, url.path) in (('POST', '/auth/v1/signup'), ('POST', '/auth/v1/admin/users')):
+            admin = url.path.endswith('/admin/users')
+            with server.lock:
+                if data.get('email') in server.users:
+                    return self.reply(422, {'msg': 'User already registered'})
+                user = {'id': str(uuid.uuid4()), 'email': data.get('email'),
+                        'user_metadata': data.get('user_metadata' if admin else 'data', {})}
+                confirmed = data.get('email_confirm', False) if admin else not server.confirm_email
+                server.users[user['email']] = dict(user, password=data.get('password'), confirmed=confirmed)
+            # Admin creation and pending confirmation answer with the bare user, no session
+            return self.reply(200, user if admin or not confirmed else self.session(user))
+
+        if (method, url.path) == ('POST', '/auth/v1/token'):
+            if parse_qs(url.query).get('grant_type') != ['password']:
+                return self.reply(400, {'error': 'unsupported_grant_type', 'error_description': 'Unsupported grant type'})
+            stored = server.users.get(data.get('email'))
+            if not stored or stored['password'] != data.get('password'):
+                return self.reply(400, {'error': 'invalid_grant', 'error_description': 'Invalid login credentials'})
+            if not stored['confirmed']:
+                return self.reply(400, {'error': 'invalid_grant', 'error_description': 'Email not confirmed'})
+            user = {key: value for key, value in stored.items() if key not in ('password', 'confirmed')}
+            return self.reply(200, self.session(user))
+
+        if (method, url.path) == ('POST', '/auth/v1/logout'):
+            if self.bearer_claims() is None:
+                return self.reply(401, {'msg': 'Invalid token'})
+            return self.reply(204)
+
+        if (method, url.path) == ('GET', '/auth/v1/user'):
+            claims = self.bearer_claims()
+            if claims is None:
+                return self.reply(401, {'msg': 'Invalid token'})
+            return self.reply(200, {'id': claims['sub'], 'email': claims['email']})
+
+        if url.path.startswith('/rest/v1/'):
+            table = server.tables.setdefault(url.path[len('/rest/v1/'):], [])
+            if method == 'GET':
+                return self.reply(200, table)
+            rows = data if isinstance(data, list) else [data]
+            with server.lock:
+                table.extend(rows)
+            return self.reply(201, rows)
+
+        return self.reply(404, {'message': f'No stub for {method} {url.path}'})
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+
+def make_server(host='127.0.0.1', port=0, secret=None):
+    """Stub server (port 0 picks a free port: see ``server.server_address``)"""
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.secret = secret
+    server.lock = threading.Lock()
+    server.users = {}
+    server.tables = {}
+    server.fail_next = 0
+    server.confirm_email = False  # sign-up leaves users unconfirmed, without a session
+    server.requests = 0
+    return server
+
+
+def start(host='127.0.0.1', port=0, secret=None):
+    """Serve in a background thread; returns the server and its base URL"""
+    server = make_server(host, port, secret)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://{server.server_address[0]}:{server.server_address[1]}'
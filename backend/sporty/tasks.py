@@ -1,51 +1,336 @@
 # tasks.py
 from celery import shared_task
-from .models import TestRecording
-from .ai_processor import VideoAnalyzer
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from datetime import timedelta
+from urllib.parse import urlparse
+from .models import FitnessTest, AthleteProfile, AssessmentSession, TestRecording, AnalysisResult, ResumableUpload
+from . import content_store, percentiles, platform_stats
+from .storage import get_storage, resolve_url
+from .ai_processor import SamplingPolicy
+from .analyzers import REGISTRY, get_test_analyzer
+from .scoring import calculate_performance_grade, score_session
+from .ranking import update_leaderboards, relocate_athlete
+from . import scheduling  # noqa: F401  connects queue wait/depth signal handlers
+from .pose_worker import get_analyzer, extract_landmarks_parallel
+from .streaming import UploadSpool, analyse_new_fragments, partial_timeline, collect_stale_spools
+import hashlib
 import logging
+import math
+import os
+
+STREAM_LOCK_TIMEOUT = 10 * 60
+
+
+def video_source(recording):
+    """Local path for videos served from MEDIA_ROOT, otherwise a readable URL"""
+    path = urlparse(recording.original_video_url).path
+    if path.startswith(settings.MEDIA_URL):
+        local_path = os.path.join(settings.MEDIA_ROOT, path[len(settings.MEDIA_URL):])
+        if os.path.exists(local_path):
+            return local_path
+    return resolve_url(recording.original_video_url)
+
+
+def result_version(recording, policy):
+    """Analyzer version of a recording's result: the policy, plus athlete data the analyzer reads"""
+    version = policy.version()
+    test_analyzer = REGISTRY.get(recording.fitness_test.name)
+    inputs = test_analyzer.result_inputs(recording) if test_analyzer else ()
+    if inputs:
+        version = f"{version}-{hashlib.sha1(repr(inputs).encode()).hexdigest()[:12]}"
+    return version
+
+
+def cached_result(recording, policy):
+    """Stored analyzer output for a byte-identical video, or None"""
+    if not recording.video_digest:
+        return None
+    cached = AnalysisResult.objects.filter(
+        video_digest=recording.video_digest,
+        test_type=recording.fitness_test.name,
+        analyzer_version=result_version(recording, policy)
+    ).first()
+    return cached.results if cached else None
+
+
+def store_result(recording, policy, results):
+    if recording.video_digest:
+        AnalysisResult.objects.get_or_create(
+            video_digest=recording.video_digest,
+            test_type=recording.fitness_test.name,
+            analyzer_version=result_version(recording, policy),
+            defaults={'results': results, 'source_recording': recording}
+        )
+
+
+def flag_duplicate_video(recording):
+    """Flag recordings whose video bytes were already submitted by another athlete"""
+    if not recording.video_digest:
+        return
+    other_recordings = TestRecording.objects.filter(
+        video_digest=recording.video_digest
+    ).exclude(athlete_id=recording.athlete_id).values_list('id', flat=True)
+    other_ids = [str(other_id) for other_id in other_recordings]
+    if not other_ids:
+        return
+    
+    recording.cheat_flags = [flag for flag in recording.cheat_flags
+                             if not (isinstance(flag, dict) and flag.get('type') == 'duplicate_video')]
+    recording.cheat_flags.append({
+        'type': 'duplicate_video',
+        'detail': 'Identical video submitted by another athlete',
+        'recording_ids': other_ids,
+    })
+    recording.is_suspicious = True
+    recording.save(update_fields=['cheat_flags', 'is_suspicious'])
+
+def analysis_policy(fitness_test):
+    """Sampling policy of the test's analyzer plug-in, falling back to the raw config"""
+    if fitness_test.name in REGISTRY:
+        return get_test_analyzer(fitness_test.name).policy(fitness_test.ai_model_config)
+    return SamplingPolicy.from_config(fitness_test.ai_model_config)
+
 
 @shared_task
-def process_video_analysis(recording_id):
-    """Background task to process video analysis"""
+def process_video_analysis(recording_id, use_cache=True, backend=None):
+    """Background task to process video analysis.
+
+    ``use_cache=False`` (SAI re-review) re-runs the analyzers even when a
+    result for the same bytes is stored. ``backend`` names the pose backend
+    of a timeline stored beforehand (batched inference); its results are
+    cached apart from full MediaPipe results.
+    """
+    recording = None
     try:
-        recording = TestRecording.objects.get(id=recording_id)
-        recording.processing_status = 'processing'
-        recording.save()
+        recording = TestRecording.objects.select_related('fitness_test', 'athlete').get(id=recording_id)
+        # Re-analysis replaces this recording's score in its cohort distribution
+        counted_score = recording.final_score if percentiles.is_ranked(recording) else None
+        recording.processing_status = 'analyzing'
+        recording.save(update_fields=['processing_status'])
+        
+        fitness_test = recording.fitness_test
+        test_analyzer = get_test_analyzer(fitness_test.name)
         
-        analyzer = VideoAnalyzer()
+        flag_duplicate_video(recording)
+        policy = test_analyzer.policy(fitness_test.ai_model_config)
+        if backend:
+            policy = policy.with_backend(backend)
         
-        # Determine analysis type based on test category
-        if recording.test_category.name == 'Vertical Jump':
-            results = analyzer.analyze_vertical_jump(recording.original_video_url)
-        elif recording.test_category.name == 'Sit-ups':
-            results = analyzer.analyze_situps(recording.original_video_url)
-        # Add other test types...
+        # Byte-identical video already analysed: reuse the stored result, no decode
+        results = cached_result(recording, policy) if use_cache else None
+        if results is None:
+            analyzer = get_analyzer()
+            video_path = video_source(recording)
+            
+            # Long recordings: decode segments in parallel, analyzers reuse the stitched timeline
+            if (test_analyzer.use_parallel_decode(fitness_test.ai_model_config)
+                    and not analyzer.has_timeline(video_path, policy)):
+                timeline = extract_landmarks_parallel(video_path, policy)
+                analyzer.store_timeline(video_path, policy, timeline)
+            
+            results = test_analyzer.analyze(analyzer, video_path, policy, recording)
+            if results['score'] is None or not math.isfinite(results['score']):
+                raise ValueError('No usable pose found in the video')
+            store_result(recording, policy, results)
+        else:
+            logging.info(f"Reusing cached analysis for recording {recording_id} ({recording.video_digest})")
         
         # Update recording with results
-        recording.ai_raw_score = results['score']
-        recording.ai_confidence = results['confidence']
+        recording.ai_raw_score = round(float(results['score']), 3)
+        recording.ai_confidence = round(float(results['confidence']), 4)
         recording.ai_analysis_data = results['analysis_data']
-        recording.processing_status = 'completed'
+        recording.final_score = recording.ai_raw_score
         
         # Calculate grade and percentile
-        grade, percentile = calculate_performance_grade(
-            recording.ai_raw_score,
-            recording.test_category,
-            recording.user
+        grade, percentile, points = calculate_performance_grade(
+            recording.final_score,
+            fitness_test,
+            recording.athlete
         )
-        recording.grade = grade
+        recording.performance_grade = grade
         recording.percentile = percentile
-        recording.final_score = recording.ai_raw_score
+        recording.points_earned = points
+        recording.processing_status = 'completed'
+        recording.processed_at = timezone.now()
+        
+        # Empirical percentile within the athlete's cohort once it is large enough
+        try:
+            cohort_percentile = percentiles.record(recording, counted_score)
+            if cohort_percentile is not None:
+                recording.percentile = cohort_percentile
+        except Exception as e:
+            logging.error(f"Failed to update score distribution for recording {recording_id}: {str(e)}")
         
         recording.save()
         
-        # Update leaderboards
-        update_leaderboards(recording)
+        # Update leaderboards; a ranking failure must not fail the analysis
+        try:
+            update_leaderboards(recording)
+        except Exception as e:
+            logging.error(f"Failed to update leaderboards for recording {recording_id}: {str(e)}")
+        
+        rescore_completed_session(recording)
         
         logging.info(f"Successfully processed recording {recording_id}")
         
     except Exception as e:
+        if recording is None:
+            logging.error(f"Failed to load recording {recording_id}: {str(e)}")
+            return
         recording.processing_status = 'failed'
         recording.processing_error = str(e)
-        recording.save()
-        logging.error(f"Failed to process recording {recording_id}: {str(e)}")
\ No newline at end of file
+        recording.save(update_fields=['processing_status', 'processing_error'])
+        logging.error(f"Failed to process recording {recording_id}: {str(e)}")
+        # A failed re-analysis no longer counts towards its completed session
+        rescore_completed_session(recording)
+
+
+def rescore_completed_session(recording):
+    """Roll a newly graded recording into its session's (and athlete's) scores.
+
+    Sessions are marked completed when their last video is uploaded, before
+    the analyses finish, so each graded recording re-scores a completed
+    session; sessions still in progress are scored when they complete.
+    """
+    try:
+        session = AssessmentSession.objects.select_related('athlete').get(id=recording.session_id)
+        if session.status == 'completed':
+            score_session(session)
+    except Exception as e:
+        logging.error(f"Failed to re-score session {recording.session_id}: {str(e)}")
+
+
+@shared_task
+def relocate_athlete_rankings(athlete_id):
+    """Re-rank an athlete whose state, district, age or gender changed, out of their old partitions"""
+    try:
+        athlete = AthleteProfile.objects.get(id=athlete_id)
+    except AthleteProfile.DoesNotExist:
+        return 0
+    return relocate_athlete(athlete)
+
+
+@shared_task
+def process_video_batch(recording_ids):
+    """Batched pose inference for several short recordings, then the usual per-recording analysis"""
+    from .batch_inference import BACKEND, get_estimator
+
+    recordings = list(TestRecording.objects.select_related('fitness_test', 'athlete').filter(id__in=recording_ids))
+    jobs = {}
+    for recording in recordings:
+        policy = analysis_policy(recording.fitness_test)
+        if cached_result(recording, policy) is None:
+            jobs[recording.id] = (video_source(recording), policy)
+
+    try:
+        timelines = get_estimator().run(jobs) if jobs else {}
+    except Exception as e:
+        logging.error(f"Batch pose inference failed, analysing {len(jobs)} recordings one by one: {str(e)}")
+        timelines = {}
+
+    for recording in recordings:
+        # Hand each timeline to the analyzer right before its recording is scored
+        if recording.id in timelines:
+            video_path, policy = jobs[recording.id]
+            get_analyzer().store_timeline(video_path, policy.with_backend(BACKEND), timelines[recording.id])
+            process_video_analysis(recording.id, backend=BACKEND)
+        else:
+            process_video_analysis(recording.id)
+
+
+@shared_task(bind=True, max_retries=None)
+def process_video_stream(self, recording_id):
+    """Analyse the fragments of a streaming upload that have arrived so far.
+
+    Queued after every chunk. Once the upload is marked finished, the spool
+    is moved into the content store and the regular analysis runs on the stitched
+    timeline without decoding the video again.
+    """
+    spool = UploadSpool(recording_id)
+    if not spool.exists():
+        return
+
+    lock_key = f'stream_lock:{recording_id}'
+    if not cache.add(lock_key, True, STREAM_LOCK_TIMEOUT):
+        # A pass is already running; it picks up new chunks unless this is the last call
+        if spool.finished_info():
+            raise self.retry(countdown=2)
+        return
+
+    recording = None
+    try:
+        recording = TestRecording.objects.select_related('fitness_test').get(id=recording_id)
+        analyzer = get_analyzer()
+        policy = analysis_policy(recording.fitness_test)
+
+        if recording.processing_status == 'uploaded':
+            recording.processing_status = 'analyzing'
+            recording.save(update_fields=['processing_status'])
+
+        analyse_new_fragments(spool, analyzer, policy)
+
+        finished = spool.finished_info()
+        if not finished:
+            return
+
+        # Last byte has landed: keep the video and hand the timeline to the analyzers
+        timeline = partial_timeline(spool)
+        digest, name = content_store.store_file(spool.path)
+        spool.cleanup()
+
+        video_url = get_storage().reference(name)
+        if video_url.startswith('/'):
+            video_url = f"{finished['site_url']}{video_url}"
+        recording.original_video_url = video_url
+        recording.video_digest = digest
+        recording.save(update_fields=['original_video_url', 'video_digest'])
+        if timeline is not None:
+            analyzer.store_timeline(video_source(recording), policy, timeline)
+    except Exception as e:
+        if recording is None:
+            logging.error(f"Failed to load streaming recording {recording_id}: {str(e)}")
+            return
+        recording.processing_status = 'failed'
+        recording.processing_error = str(e)
+        recording.save(update_fields=['processing_status', 'processing_error'])
+        logging.error(f"Failed to analyse streaming upload {recording_id}: {str(e)}")
+        return
+    finally:
+        cache.delete(lock_key)
+
+    process_video_analysis(recording_id)
+
+
+@shared_task
+def cleanup_stale_uploads():
+    """Expire resumable uploads and streaming spools that stopped receiving bytes"""
+    max_age = getattr(settings, 'RESUMABLE_UPLOAD_EXPIRY_SECONDS', 24 * 60 * 60)
+    cutoff = timezone.now() - timedelta(seconds=max_age)
+
+    expired = ResumableUpload.objects.filter(
+        status__in=['in_progress', 'completed'], updated_at__lt=cutoff
+    ).update(status='expired')
+    removed = collect_stale_spools(max_age)
+
+    logging.info(f"Expired {expired} resumable uploads, removed {len(removed)} stale spools")
+    return {'expired_uploads': expired, 'removed_spools': len(removed)}
+
+
+@shared_task
+def rebuild_platform_stats():
+    """Reconcile the platform_stats counters with the tables (catches writes that bypassed signals)"""
+    return platform_stats.rebuild()
+
+
+@shared_task
+def rebuild_score_distributions():
+    """Re-fit the percentile histograms to the ranked recordings and log their error against exact percentiles"""
+    reports = {}
+    for fitness_test in FitnessTest.objects.filter(is_active=True):
+        reports[fitness_test.name] = percentiles.rebuild(fitness_test)
+        for report in reports[fitness_test.name]:
+            logging.info(f"Percentiles {fitness_test.name} {report['age_group']}/{report['gender']}: "
+                         f"{report['scores']} scores, before {report['before']}, after {report.get('after')}")
+    return reports
@@ -0,0 +1,58 @@
+"""
+Keyset pages of a leaderboard whose ranks are tied.
+"""
+
+import datetime
+import uuid
+
+from django.test import TestCase
+
+from sporty.models import AthleteProfile, FitnessTest, Leaderboard
+from sporty.pagination import InvalidCursor, keyset_page
+
+# Shared ranks, as ties on best_score produce them
+RANKS = [1, 2, 2, 2, 5, 5, 7, 7, 7, 7]
+
+
+class KeysetPageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        fitness_test = FitnessTest.objects.create(
+            name='vertical_jump', display_name='Vertical Jump', description='Jump', instructions='Jump',
+            measurement_unit='cm',
+        )
+        for number, rank in enumerate(RANKS):
+            athlete = AthleteProfile.objects.create(
+                auth_user_id=uuid.uuid4(), full_name=f'Athlete {number}', date_of_birth=datetime.date(2009, 1, 1),
+                age=15, gender='female', height=160, weight=50, phone_number='9999999999', address='Camp road',
+                state='Kerala', district='Ernakulam', pin_code='682001', location_category='urban',
+                aadhaar_number=f'{number:012d}',
+            )
+            Leaderboard.objects.create(
+                athlete=athlete, leaderboard_type='national', fitness_test=fitness_test,
+                current_rank=rank, best_score=10 - rank, total_points=0,
+            )
+        cls.queryset = Leaderboard.objects.filter(leaderboard_type='national', fitness_test=fitness_test)
+
+    def page_through(self, limit):
+        ids, cursor = [], None
+        while True:
+            rows, cursor = keyset_page(self.queryset, cursor, limit)
+            ids.extend(row.id for row in rows)
+            if cursor is None:
+                return ids
+
+    def test_pages_split_ties_without_gaps_or_repeats(self):
+        expected = list(self.queryset.order_by('current_rank', 'id').values_list('id', flat=True))
+        for limit in (1, 2, 3, 4, len(RANKS)):
+            with self.subTest(limit=limit):
+                self.assertEqual(self.page_through(limit), expected)
+
+    def test_last_page_has_no_cursor(self):
+        rows, cursor = keyset_page(self.queryset, None, len(RANKS))
+        self.assertEqual(len(rows), len(RANKS))
+        self.assertIsNone(cursor)
+
+    def test_foreign_cursor_is_rejected(self):
+        with self.assertRaises(InvalidCursor):
+            keyset_page(self.queryset, 'not-a-cursor')
@@ -0,0 +1,89 @@
+"""
+Fixed query counts of the list and ranking endpoints.
+
+Every page is served by a constant number of queries whatever its length;
+a serializer that reads a relation eager_load does not join pushes an
+endpoint over its count. Each endpoint is exercised with several rows.
+"""
+
+import datetime
+import uuid
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+
+from sporty import views
+from sporty.models import AssessmentSession, AthleteProfile, FitnessTest, Leaderboard, TestRecording
+from sporty.ranking import rebuild_leaderboards
+
+ATHLETES = 6
+
+
+def make_athlete(number, state):
+    return AthleteProfile.objects.create(
+        auth_user_id=uuid.uuid4(), full_name=f'Athlete {number}', date_of_birth=datetime.date(2009, 1, 1),
+        age=15, gender='male', height=170, weight=60, phone_number='9999999999', address='Camp road',
+        state=state, district='Ernakulam', pin_code='682001', location_category='urban',
+        aadhaar_number=f'{number:012d}',
+    )
+
+
+class QueryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.fitness_test = FitnessTest.objects.create(
+            name='vertical_jump', display_name='Vertical Jump', description='Jump', instructions='Jump',
+            measurement_unit='cm',
+        )
+        cls.athletes = [make_athlete(number, 'Kerala') for number in range(ATHLETES)]
+        for number, athlete in enumerate(cls.athletes):
+            session = AssessmentSession.objects.create(athlete=athlete, status='completed', total_tests=1)
+            TestRecording.objects.create(
+                session=session, fitness_test=cls.fitness_test, athlete=athlete,
+                original_video_url='https://example.com/video.mp4', processing_status='completed',
+                final_score=Decimal(30 + number % 3), points_earned=60,
+            )
+        rebuild_leaderboards(cls.fitness_test)
+
+    def setUp(self):
+        cache.clear()  # participant counts of partial filters are cached between requests
+
+    def get(self, viewset, action, params=None, role='sai_official'):
+        request = RequestFactory().get('/', params or {})
+        request.user_id = str(self.athletes[0].auth_user_id)
+        request.user_role = role
+        request.is_authenticated = True
+        response = viewset.as_view({'get': action})(request)
+        response.render()
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_national_rankings(self):
+        # The page, then the participant count from the partition row
+        with self.assertNumQueries(2):
+            data = self.get(views.LeaderboardViewSet, 'national_rankings', {'test_id': self.fitness_test.id})
+        self.assertEqual(len(data['rankings']), ATHLETES)
+
+    def test_state_rankings(self):
+        with self.assertNumQueries(2):
+            data = self.get(views.LeaderboardViewSet, 'state_rankings',
+                            {'state': 'Kerala', 'test_id': self.fitness_test.id})
+        self.assertEqual(len(data['rankings']), ATHLETES)
+
+    def test_athlete_rankings(self):
+        # Profile, rankings, best national rank, competition count
+        with self.assertNumQueries(4):
+            data = self.get(views.LeaderboardViewSet, 'athlete_rankings', role='authenticated')
+        self.assertEqual(len(data['rankings']), Leaderboard.objects.filter(athlete=self.athletes[0]).count())
+        self.assertGreater(len(data['rankings']), 1)
+
+    def test_recording_list(self):
+        with self.assertNumQueries(1):
+            data = self.get(views.TestRecordingViewSet, 'list')
+        self.assertEqual(len(data), ATHLETES)
+
+    def test_session_list(self):
+        with self.assertNumQueries(1):
+            data = self.get(views.AssessmentSessionViewSet, 'list')
+        self.assertEqual(len(data), ATHLETES)
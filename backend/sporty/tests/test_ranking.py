@@ -0,0 +1,75 @@
+"""
+Incremental ranking when an athlete moves to another partition.
+"""
+
+import datetime
+import uuid
+from decimal import Decimal
+
+from django.test import TestCase
+
+from sporty.models import AssessmentSession, AthleteProfile, FitnessTest, Leaderboard, LeaderboardPartition, TestRecording
+from sporty.ranking import rebuild_leaderboards, relocate_athlete, update_leaderboards
+
+
+def make_athlete(number, state):
+    return AthleteProfile.objects.create(
+        auth_user_id=uuid.uuid4(), full_name=f'Athlete {number}', date_of_birth=datetime.date(2009, 1, 1),
+        age=15, gender='male', height=170, weight=60, phone_number='9999999999', address='Camp road',
+        state=state, district='Central', pin_code='682001', location_category='urban',
+        aadhaar_number=f'{number:012d}',
+    )
+
+
+class RelocationTests(TestCase):
+    def setUp(self):
+        self.fitness_test = FitnessTest.objects.create(
+            name='vertical_jump', display_name='Vertical Jump', description='Jump', instructions='Jump',
+            measurement_unit='cm',
+        )
+        self.athletes = [make_athlete(number, 'Kerala') for number in range(3)] + [make_athlete(3, 'Goa')]
+        for number, athlete in enumerate(self.athletes):
+            self.record(athlete, 40 - number)
+        rebuild_leaderboards(self.fitness_test)
+
+    def record(self, athlete, score):
+        session = AssessmentSession.objects.create(athlete=athlete, status='completed', total_tests=1)
+        return TestRecording.objects.create(
+            session=session, fitness_test=self.fitness_test, athlete=athlete,
+            original_video_url='https://example.com/video.mp4', processing_status='completed',
+            final_score=Decimal(score), points_earned=50,
+        )
+
+    def state_ranks(self, state):
+        rows = Leaderboard.objects.filter(leaderboard_type='state', fitness_test=self.fitness_test, state=state)
+        return dict(rows.values_list('athlete__full_name', 'current_rank'))
+
+    def participants(self, state):
+        return LeaderboardPartition.objects.get(key=f'state:{self.fitness_test.id}:{state}').participants
+
+    def move(self, athlete, state):
+        athlete.state = state
+        athlete.save()
+
+    def test_relocation_leaves_the_old_partition(self):
+        leader = self.athletes[0]
+        self.move(leader, 'Goa')
+        relocate_athlete(leader)
+
+        self.assertEqual(self.state_ranks('Kerala'), {'Athlete 1': 1, 'Athlete 2': 2})
+        self.assertEqual(self.state_ranks('Goa'), {'Athlete 0': 1, 'Athlete 3': 2})
+        self.assertEqual((self.participants('Kerala'), self.participants('Goa')), (2, 2))
+        national = Leaderboard.objects.get(leaderboard_type='national', athlete=leader)
+        self.assertEqual((national.current_rank, national.state), (1, 'Goa'))
+
+    def test_next_recording_cleans_up_a_missed_move(self):
+        athlete = self.athletes[1]
+        self.move(athlete, 'Goa')
+        update_leaderboards(self.record(athlete, 20))
+
+        self.assertEqual(self.state_ranks('Kerala'), {'Athlete 0': 1, 'Athlete 2': 2})
+        self.assertEqual(self.state_ranks('Goa'), {'Athlete 1': 1, 'Athlete 3': 2})
+
+    def test_unchanged_athlete_is_not_reranked(self):
+        self.assertEqual(relocate_athlete(self.athletes[2]), 0)
+        self.assertEqual(self.state_ranks('Kerala'), {'Athlete 0': 1, 'Athlete 1': 2, 'Athlete 2': 3})
@@ -33,6 +33,7 @@ router.register(r'leaderboards', views.LeaderboardViewSet, basename='leaderboard
 router.register(r'badges', views.BadgeViewSet, basename='badges')
 router.register(r'sai-submissions', views.SAISubmissionViewSet, basename='sai-submissions')
 router.register(r'stats', views.StatsViewSet, basename='stats')
+router.register(r'uploads', views.ResumableUploadViewSet, basename='uploads')
 urlpatterns = [
     # Admin interface  
     path('admin/', admin.site.urls),
@@ -1,17 +1,9 @@
 # supabase_utils.py
-import requests
-from django.conf import settings
+from ..supabase_client import get_supabase
 
-headers = {
-    "apikey": settings.SUPABASE_KEY,
-    "Authorization": f"Bearer {settings.SUPABASE_KEY}",
-    "Content-Type": "application/json",
-}
 
 def fetch_from_supabase(table):
-    url = f"{settings.SUPABASE_URL}/rest/v1/{table}"
-    return requests.get(url, headers=headers).json()
+    return get_supabase().select(table)
 
 def insert_to_supabase(table, data):
-    url = f"{settings.SUPABASE_URL}/rest/v1/{table}"
-    return requests.post(url, json=data, headers=headers).json()
+    return get_supabase().insert(table, data)
@@ -5,19 +5,42 @@ from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.permissions import AllowAny
 from django.views.decorators.csrf import csrf_exempt
-from django.core.files.storage import default_storage
 from django.db.models import Q, Avg, Count, Max, Min
 from django.utils import timezone
 from django.http import JsonResponse
 from django.shortcuts import render
+from django.core.exceptions import ValidationError
+from django.conf import settings
+from django.db import transaction
+from django.core.cache import cache
 from datetime import datetime, timedelta
+from decimal import Decimal
+import hashlib
 import uuid
 import json
 import sys
+import io
 
 from .models import *
 from .serializers import *
-from .middleware import supabase_auth_required, get_current_user_profile
+from .middleware import supabase_auth_required, get_current_user_profile, current_athlete
+from .auth_tokens import token_verifier
+from .profiles import load_athlete
+from .supabase_client import get_supabase, SupabaseError
+from .db import read_replica, statement_timeout
+from . import content_store, summaries
+from .storage import get_storage
+from .pagination import keyset_page, InvalidCursor
+from .platform_stats import get_platform_stats
+from .benchmarks import benchmark_index
+from .scoring import find_benchmark, threshold_level, score_session
+from .streaming import UploadSpool, OffsetMismatch, get_progress as get_stream_progress
+
+class EagerLoadingMixin:
+    """Join in the relations the viewset's serializer reads, so list pages cost a fixed number of queries"""
+
+    def filter_queryset(self, queryset):
+        return eager_load(super().filter_queryset(queryset), self.get_serializer_class())
 
 class AthleteProfileViewSet(viewsets.ModelViewSet):
     queryset = AthleteProfile.objects.all()
@@ -35,11 +58,19 @@ class AthleteProfileViewSet(viewsets.ModelViewSet):
         return AthleteProfile.objects.filter(auth_user_id=self.request.user_id)
     
     @action(detail=True, methods=['get'])
+    @read_replica
+    @statement_timeout(5000)
     def talent_summary(self, request, pk=None):
-        """Get comprehensive talent summary for an athlete"""
-        athlete = self.get_object()
-        serializer = TalentSummarySerializer(athlete)
-        return Response(serializer.data)
+        """Get comprehensive talent summary for an athlete (precomputed document, see summaries.py)"""
+        try:
+            summary = TalentSummary.objects.filter(athlete__in=self.get_queryset(), athlete_id=pk).first()
+        except ValidationError:
+            summary = None
+        if summary is not None and not summary.rankings_stale:
+            return Response(summary.document)
+        
+        athlete = summary.athlete if summary else self.get_object()
+        return Response(summaries.get_document(summary, athlete))
     
     @action(detail=False, methods=['post'])
     def register_athlete(self, request):
@@ -81,7 +112,6 @@ class AthleteProfileViewSet(viewsets.ModelViewSet):
         except Badge.DoesNotExist:
             pass
 
-import pprint
 class FitnessTestViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = FitnessTest.objects.filter(is_active=True)
     serializer_class = FitnessTestSerializer
@@ -90,18 +120,13 @@ class FitnessTestViewSet(viewsets.ReadOnlyModelViewSet):
     def benchmarks(self, request, pk=None):
         """Get age-specific benchmarks for a test"""
         test = self.get_object()
-        age = request.query_params.get('age')
         gender = request.query_params.get('gender', 'male')
+        try:
+            age = int(request.query_params['age'])
+        except (KeyError, ValueError):
+            return Response({'error': 'age must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
         
-        benchmark = AgeBenchmark.objects.filter(
-            fitness_test=test,
-            age_min__lte=age,
-            age_max__gte=age,
-            gender=gender
-        ).first()
-        
-        pprint(AgeBenchmarkSerializer(benchmark).data)
-        print(AgeBenchmarkSerializer(benchmark).data)
+        benchmark = benchmark_index.lookup(test.id, gender, age)
         if benchmark:
             return Response(AgeBenchmarkSerializer(benchmark).data)
         
@@ -109,7 +134,7 @@ class FitnessTestViewSet(viewsets.ReadOnlyModelViewSet):
                        status=status.HTTP_404_NOT_FOUND)
 
 
-class AssessmentSessionViewSet(viewsets.ModelViewSet):
+class AssessmentSessionViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = AssessmentSession.objects.all()
     serializer_class = AssessmentSessionSerializer
 
@@ -142,7 +167,7 @@ class AssessmentSessionViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
 
         try:
-            athlete = AthleteProfile.objects.get(auth_user_id=request.user_id)
+            athlete = current_athlete(request)
             print(f"DEBUG: Athlete found: {athlete}")
 
             ongoing_session = AssessmentSession.objects.filter(
@@ -266,7 +291,7 @@ class AssessmentSessionViewSet(viewsets.ModelViewSet):
             print("DEBUG: Badge 'First SAI Submission' does not exist")
             pass
 
-class TestRecordingViewSet(viewsets.ModelViewSet):
+class TestRecordingViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = TestRecording.objects.all()
     serializer_class = TestRecordingSerializer
     parser_classes = [MultiPartParser, FormParser]
@@ -292,7 +317,7 @@ class TestRecordingViewSet(viewsets.ModelViewSet):
             # Get session and test info
             session = AssessmentSession.objects.get(id=serializer.validated_data['session_id'])
             fitness_test = FitnessTest.objects.get(id=serializer.validated_data['fitness_test_id'])
-            video_file = serializer.validated_data['video_file']
+            video_file = serializer.validated_data.get('video_file')
             
             # Check if test already completed for this session
             existing_recording = TestRecording.objects.filter(
@@ -306,8 +331,30 @@ class TestRecordingViewSet(viewsets.ModelViewSet):
                     'recording_id': existing_recording.id
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            # Save video to Supabase Storage
-            video_url = self.save_to_supabase_storage(video_file)
+            # Save video to storage, hashed on the way in
+            if video_file:
+                video_digest, video_url = self.save_to_supabase_storage(video_file, request)
+                video_size = video_file.size
+            else:
+                try:
+                    video_digest, name, video_size = attach_resumable_upload(
+                        serializer.validated_data['upload_id'], session.athlete
+                    )
+                except ResumableUpload.DoesNotExist:
+                    return Response({'error': 'No completed resumable upload with this id'},
+                                    status=status.HTTP_409_CONFLICT)
+                video_url = content_store.media_url(request, name)
+            
+            # Byte-identical retry of an upload that is still being analysed
+            if (existing_recording and existing_recording.video_digest == video_digest
+                    and existing_recording.processing_status in ['uploaded', 'analyzing', 'cheat_checking']):
+                return Response({
+                    'recording_id': existing_recording.id,
+                    'status': existing_recording.processing_status,
+                    'message': 'Identical video already received. AI analysis in progress.',
+                    'session_progress': f"{session.completed_tests}/{session.total_tests}",
+                    'estimated_analysis_time': self.estimate_analysis_time(fitness_test.name)
+                })
             
             # Create or update test recording
             recording, created = TestRecording.objects.update_or_create(
@@ -316,8 +363,9 @@ class TestRecordingViewSet(viewsets.ModelViewSet):
                 athlete=session.athlete,
                 defaults={
                     'original_video_url': video_url,
+                    'video_digest': video_digest,
                     'video_duration': serializer.validated_data.get('video_duration'),
-                    'video_size_mb': video_file.size / (1024 * 1024),  # Convert to MB
+                    'video_size_mb': video_size / (1024 * 1024),  # Convert to MB
                     'device_analysis_score': serializer.validated_data.get('device_analysis_score'),
                     'device_analysis_confidence': serializer.validated_data.get('device_analysis_confidence'),
                     'device_analysis_data': serializer.validated_data.get('device_analysis_data', {}),
@@ -325,23 +373,13 @@ class TestRecordingViewSet(viewsets.ModelViewSet):
                 }
             )
             
-            # Trigger AI analysis (async task)
-            from .tasks import process_video_analysis
-            process_video_analysis.delay(recording.id)
+            # Trigger AI analysis (async task, queued by cost class)
+            from .scheduling import enqueue_analysis
+            enqueue_analysis(recording)
             
             # Update session progress
             if created:
-                session.completed_tests += 1
-                if session.status == 'created':
-                    session.status = 'in_progress'
-                
-                # Check if all tests completed
-                if session.completed_tests >= session.total_tests:
-                    session.status = 'completed'
-                    session.completed_at = timezone.now()
-                    self.calculate_session_overall_score(session)
-                
-                session.save()
+                self.record_session_progress(session)
             
             return Response({
                 'recording_id': recording.id,
@@ -358,6 +396,312 @@ class TestRecordingViewSet(viewsets.ModelViewSet):
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
+    def record_session_progress(self, session):
+        """Count a newly created recording towards its session"""
+        self.advance_sessions({session: 1})
+    
+    def advance_sessions(self, new_recordings):
+        """Count newly created recordings towards their sessions, one pass for all ({session: count}).
+        
+        The sessions are re-read under a row lock, so concurrent uploads to one
+        session each add their count instead of overwriting the other's.
+        """
+        in_progress = []
+        with transaction.atomic():
+            current = {
+                session.pk: session for session in AssessmentSession.objects.select_for_update().filter(
+                    pk__in=[session.pk for session in new_recordings]
+                ).order_by('pk').only('id', 'completed_tests', 'status', 'completed_at')
+            }
+            for session, count in new_recordings.items():
+                latest = current[session.pk]
+                session.completed_tests = latest.completed_tests + count
+                session.status = 'in_progress' if latest.status == 'created' else latest.status
+                session.completed_at = latest.completed_at
+                session._stats_previous = latest.status  # platform counters diff against the stored status
+                
+                # Check if all tests completed
+                if session.completed_tests >= session.total_tests:
+                    session.status = 'completed'
+                    session.completed_at = timezone.now()
+                    score_session(session, ['completed_tests', 'status', 'completed_at'])
+                else:
+                    in_progress.append(session)
+            
+            # Not completed: no counters change, only the athletes' recent sessions
+            AssessmentSession.objects.bulk_update(in_progress, ['completed_tests', 'status'])
+        for session in in_progress:
+            summaries.refresh_on_commit(session.athlete, 'recent_sessions')
+    
+    @action(detail=False, methods=['post'])
+    def batch_upload(self, request):
+        """Camp mode: many recordings, across athletes and sessions, in one multipart request.
+        
+        ``manifest`` is a JSON list of BatchUploadItemSerializer items, each naming
+        the multipart field holding its video (or a completed resumable upload).
+        Rows are written in bulk, session progress is updated once per session and
+        the analyses are queued together. Returns one result per manifest item.
+        """
+        if not getattr(self.request, 'is_authenticated', False):
+            return Response({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
+        
+        manifest = request.data.get('manifest')
+        if isinstance(manifest, str):
+            try:
+                manifest = json.loads(manifest)
+            except ValueError:
+                manifest = None
+        if not isinstance(manifest, list) or not manifest:
+            return Response({'error': 'manifest must be a non-empty JSON list'}, status=status.HTTP_400_BAD_REQUEST)
+        max_items = getattr(settings, 'BATCH_UPLOAD_MAX_ITEMS', 500)
+        if len(manifest) > max_items:
+            return Response({'error': f'At most {max_items} recordings per batch'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        items = [BatchUploadItemSerializer(data=item) for item in manifest]
+        valid = [item.validated_data for item in items if item.is_valid()]
+        session_ids = {item['session_id'] for item in valid}
+        test_ids = {item['fitness_test_id'] for item in valid}
+        
+        # Everything the items refer to, in three queries
+        sessions = AssessmentSession.objects.select_related('athlete').in_bulk(session_ids)
+        tests = FitnessTest.objects.in_bulk(test_ids)
+        existing = {}
+        for recording in TestRecording.objects.filter(session_id__in=session_ids, fitness_test_id__in=test_ids):
+            existing.setdefault((recording.session_id, recording.fitness_test_id), recording)
+        
+        # Athletes upload to their own sessions only; SAI officials (camp coaches) to any
+        official = getattr(request, 'user_role', 'authenticated') == 'sai_official'
+        own_athlete = None if official else get_current_user_profile(request)
+        
+        results = []
+        to_create, to_update, new_recordings, seen = [], [], {}, set()
+        
+        def reject(index, error, **extra):
+            results.append({'index': index, 'status': 'rejected', 'error': error, **extra})
+        
+        for index, item in enumerate(items):
+            if item.errors:
+                reject(index, item.errors)
+                continue
+            data = item.validated_data
+            session = sessions.get(data['session_id'])
+            fitness_test = tests.get(data['fitness_test_id'])
+            key = (data['session_id'], data['fitness_test_id'])
+            if session is None or not (official or (own_athlete and session.athlete_id == own_athlete.id)):
+                reject(index, 'Assessment session not found')
+                continue
+            if fitness_test is None:
+                reject(index, 'Fitness test not found')
+                continue
+            if key in seen:
+                reject(index, 'Session and test repeated in this manifest')
+                continue
+            seen.add(key)
+            
+            existing_recording = existing.get(key)
+            if existing_recording and existing_recording.processing_status == 'completed':
+                reject(index, 'Test already completed for this session', recording_id=existing_recording.id)
+                continue
+            
+            # Save video to storage, hashed on the way in
+            try:
+                if data.get('file'):
+                    video_file = request.FILES.get(data['file'])
+                    if video_file is None:
+                        reject(index, f"No file in multipart field {data['file']}")
+                        continue
+                    video_digest, video_url = self.save_to_supabase_storage(video_file, request)
+                    video_size = video_file.size
+                else:
+                    video_digest, name, video_size = attach_resumable_upload(data['upload_id'], session.athlete)
+                    video_url = content_store.media_url(request, name)
+            except ResumableUpload.DoesNotExist:
+                reject(index, 'No completed resumable upload with this id')
+                continue
+            except Exception as e:
+                reject(index, f'Storing the video failed: {str(e)}')
+                continue
+            
+            # Byte-identical retry of an upload that is still being analysed
+            if (existing_recording and existing_recording.video_digest == video_digest
+                    and existing_recording.processing_status in ['uploaded', 'analyzing', 'cheat_checking']):
+                results.append({'index': index, 'status': 'duplicate', 'recording_id': existing_recording.id})
+                continue
+            
+            values = {
+                'original_video_url': video_url,
+                'video_digest': video_digest,
+                'video_duration': data.get('video_duration'),
+                'video_size_mb': video_size / (1024 * 1024),  # Convert to MB
+                'device_analysis_score': data.get('device_analysis_score'),
+                'device_analysis_confidence': data.get('device_analysis_confidence'),
+                'device_analysis_data': data.get('device_analysis_data', {}),
+                'processing_status': 'uploaded',
+            }
+            if existing_recording:
+                for field, value in values.items():
+                    setattr(existing_recording, field, value)
+                to_update.append(existing_recording)
+                recording = existing_recording
+            else:
+                recording = TestRecording(session=session, fitness_test=fitness_test, athlete=session.athlete, **values)
+                to_create.append(recording)
+                new_recordings[session] = new_recordings.get(session, 0) + 1
+            results.append({'index': index, 'status': 'uploaded', 'recording_id': recording.id,
+                            'created': existing_recording is None})
+        
+        # Status 'uploaded' affects neither platform counters nor summaries, so bulk writes skip no signal work
+        with transaction.atomic():
+            TestRecording.objects.bulk_create(to_create, batch_size=500)
+            TestRecording.objects.bulk_update(to_update, ['original_video_url', 'video_digest', 'video_duration',
+                                                          'video_size_mb', 'device_analysis_score',
+                                                          'device_analysis_confidence', 'device_analysis_data',
+                                                          'processing_status'], batch_size=500)
+            self.advance_sessions(new_recordings)
+        
+        # Trigger AI analysis (short clips share batched pose inference)
+        from .scheduling import enqueue_batch
+        enqueue_batch(to_create + to_update)
+        
+        accepted = len(to_create) + len(to_update)
+        rejected = sum(result['status'] == 'rejected' for result in results)
+        if not rejected:
+            response_status = status.HTTP_200_OK
+        elif accepted or len(results) > rejected:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response({
+            'results': results,
+            'created': len(to_create),
+            'updated': len(to_update),
+            'rejected': rejected,
+            'session_progress': {
+                str(session_id): f"{sessions[session_id].completed_tests}/{sessions[session_id].total_tests}"
+                for session_id in {session_id for session_id, _ in seen}
+            },
+        }, status=response_status)
+    
+    def stream_owner_error(self, request, session):
+        """403 response unless the session belongs to the requesting athlete, else None"""
+        athlete = get_current_user_profile(request) if getattr(request, 'is_authenticated', False) else None
+        if athlete is None or session.athlete_id != athlete.id:
+            return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
+        return None
+    
+    @action(detail=False, methods=['post'])
+    def stream_start(self, request):
+        """Open a streaming upload; analysis starts while chunks are still arriving"""
+        try:
+            session = AssessmentSession.objects.get(id=request.data.get('session_id'))
+            fitness_test = FitnessTest.objects.get(id=request.data.get('fitness_test_id'))
+        except (AssessmentSession.DoesNotExist, ValidationError):
+            return Response({'error': 'Assessment session not found'}, status=status.HTTP_404_NOT_FOUND)
+        except (FitnessTest.DoesNotExist, ValueError):
+            return Response({'error': 'Fitness test not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        denied = self.stream_owner_error(request, session)
+        if denied:
+            return denied
+        
+        existing_recording = TestRecording.objects.filter(session=session, fitness_test=fitness_test).first()
+        if existing_recording and existing_recording.processing_status == 'completed':
+            return Response({
+                'error': 'Test already completed for this session',
+                'recording_id': existing_recording.id
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        expected_duration = request.data.get('expected_duration')
+        recording, created = TestRecording.objects.update_or_create(
+            session=session,
+            fitness_test=fitness_test,
+            athlete=session.athlete,
+            defaults={
+                'original_video_url': '',
+                'video_duration': expected_duration,
+                'processing_status': 'uploaded'
+            }
+        )
+        
+        UploadSpool(recording.id).create(expected_duration=expected_duration, created=created)
+        
+        return Response({
+            'recording_id': recording.id,
+            'upload_offset': 0,
+            'message': 'Streaming upload opened. Send chunks in order; analysis starts on the first fragments.'
+        }, status=status.HTTP_201_CREATED)
+    
+    @action(detail=True, methods=['post', 'put'])
+    def stream_chunk(self, request, pk=None):
+        """Append the raw request body to a streaming upload"""
+        recording = self.get_object()
+        denied = self.stream_owner_error(request, recording.session)
+        if denied:
+            return denied
+        
+        spool = UploadSpool(recording.id)
+        if not spool.exists() or spool.finished_info():
+            return Response({'error': 'No open streaming upload for this recording'},
+                            status=status.HTTP_404_NOT_FOUND)
+        
+        offset = request.META.get('HTTP_UPLOAD_OFFSET')
+        try:
+            size = spool.append_stream(request.stream or io.BytesIO(),
+                                       int(offset) if offset is not None else None)
+        except OffsetMismatch as e:
+            return Response({
+                'error': 'Chunk offset does not match bytes received',
+                'upload_offset': e.expected
+            }, status=status.HTTP_409_CONFLICT)
+        
+        from .tasks import process_video_stream
+        process_video_stream.delay(recording.id)
+        
+        return Response({'recording_id': recording.id, 'upload_offset': size})
+    
+    @action(detail=True, methods=['post'])
+    def stream_finish(self, request, pk=None):
+        """Mark the last chunk received and queue the final analysis pass"""
+        recording = self.get_object()
+        session = recording.session
+        denied = self.stream_owner_error(request, session)
+        if denied:
+            return denied
+        
+        spool = UploadSpool(recording.id)
+        if not spool.exists():
+            if recording.original_video_url:
+                # Retried finish after the final pass already moved the video to storage
+                return Response({
+                    'recording_id': recording.id,
+                    'status': recording.processing_status,
+                    'session_progress': f"{session.completed_tests}/{session.total_tests}",
+                })
+            return Response({'error': 'No open streaming upload for this recording'},
+                            status=status.HTTP_404_NOT_FOUND)
+        
+        state = spool.load_state()
+        first_finish = spool.mark_finished(
+            site_url=request.build_absolute_uri('/').rstrip('/')
+        )
+        if first_finish:
+            recording.video_size_mb = spool.size / (1024 * 1024)
+            recording.save(update_fields=['video_size_mb'])
+            
+            from .tasks import process_video_stream
+            process_video_stream.delay(recording.id)
+            
+            if state.get('created'):
+                self.record_session_progress(session)
+        
+        return Response({
+            'recording_id': recording.id,
+            'status': recording.processing_status,
+            'frames_analyzed': state['frames_done'],
+            'session_progress': f"{session.completed_tests}/{session.total_tests}",
+            'estimated_analysis_time': self.estimate_analysis_time(recording.fitness_test.name)
+        })
+    
     @action(detail=True, methods=['get'])
     def analysis_status(self, request, pk=None):
         """Check analysis status and progress"""
@@ -380,6 +724,14 @@ class TestRecordingViewSet(viewsets.ModelViewSet):
             'progress_percentage': progress_map.get(recording.processing_status, 0),
         }
         
+        # Streaming uploads report progress from the real number of analysed frames
+        stream_progress = get_stream_progress(recording.id)
+        if stream_progress and recording.processing_status in ['uploaded', 'analyzing']:
+            response_data['frames_analyzed'] = stream_progress['frames_analyzed']
+            if stream_progress['expected_frames']:
+                fraction = min(stream_progress['frames_analyzed'] / stream_progress['expected_frames'], 1)
+                response_data['progress_percentage'] = 10 + int(70 * fraction)
+        
         # Add results if analysis is complete
         if recording.processing_status in ['completed', 'manually_verified']:
             response_data.update({
@@ -424,22 +776,41 @@ class TestRecordingViewSet(viewsets.ModelViewSet):
         recording.processing_error = None
         recording.save()
         
-        # Trigger analysis again
-        from .tasks import process_video_analysis
-        process_video_analysis.delay(recording.id)
+        # Trigger analysis again, ahead of fresh uploads
+        from .scheduling import enqueue_analysis
+        enqueue_analysis(recording, reason='retry')
         
         return Response({
             'message': 'Analysis retry initiated',
             'retry_count': recording.retry_count
         })
     
-    def save_to_supabase_storage(self, video_file):
-        """Save video file to Supabase storage"""
-        # This would integrate with your Supabase storage
-        # For now, returning a placeholder URL
-        file_name = f"videos/{uuid.uuid4()}.mp4"
-        # Implement actual Supabase storage upload here
-        return f"https://your-supabase-storage-url.com/{file_name}"
+    @action(detail=True, methods=['post'])
+    def request_reanalysis(self, request, pk=None):
+        """SAI official re-review: re-run AI analysis on the priority queue"""
+        user_role = getattr(self.request, 'user_role', 'authenticated')
+        if user_role != 'sai_official':
+            return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
+        
+        recording = self.get_object()
+        if recording.processing_status in ['uploaded', 'analyzing']:
+            return Response({
+                'error': 'Analysis already in progress for this recording'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        recording.processing_status = 'uploaded'
+        recording.processing_error = None
+        recording.save(update_fields=['processing_status', 'processing_error'])
+        
+        from .scheduling import enqueue_analysis
+        enqueue_analysis(recording, reason='review')
+        
+        return Response({'message': 'Re-analysis queued', 'recording_id': recording.id})
+    
+    def save_to_supabase_storage(self, video_file, request):
+        """Save video file under its content digest; returns (digest, url)"""
+        video_digest, name = content_store.store_upload(video_file)
+        return video_digest, content_store.media_url(request, name)
     
     def estimate_analysis_time(self, test_name):
         """Estimate analysis time based on test type"""
@@ -452,76 +823,23 @@ class TestRecordingViewSet(viewsets.ModelViewSet):
         }
         return time_estimates.get(test_name, '1-2 minutes')
     
-    def calculate_session_overall_score(self, session):
-        """Calculate overall session score when all tests are complete"""
-        recordings = TestRecording.objects.filter(
-            session=session,
-            processing_status='completed'
-        )
-        
-        if recordings.exists():
-            # Calculate weighted average based on test importance
-            total_points = sum(rec.points_earned or 0 for rec in recordings)
-            avg_percentile = recordings.aggregate(avg_percentile=Avg('percentile'))['avg_percentile']
-            
-            session.overall_score = total_points / len(recordings) if recordings else 0
-            session.percentile_rank = avg_percentile
-            session.overall_grade = self.calculate_grade_from_score(session.overall_score)
-            session.save()
-            
-            # Update athlete's overall talent score
-            self.update_athlete_talent_score(session.athlete)
-    
-    def calculate_grade_from_score(self, score):
-        """Convert score to grade"""
-        if score >= 90: return 'A+'
-        elif score >= 80: return 'A'
-        elif score >= 70: return 'B+'
-        elif score >= 60: return 'B'
-        elif score >= 50: return 'C+'
-        else: return 'C'
-    
-    def update_athlete_talent_score(self, athlete):
-        """Update athlete's overall talent score"""
-        completed_sessions = AssessmentSession.objects.filter(
-            athlete=athlete,
-            status='completed'
-        )
-        
-        if completed_sessions.exists():
-            avg_score = completed_sessions.aggregate(
-                avg_score=Avg('overall_score')
-            )['avg_score']
-            
-            athlete.overall_talent_score = avg_score
-            athlete.talent_grade = self.calculate_grade_from_score(avg_score)
-            athlete.save()
-    
     def get_benchmark_comparison(self, recording):
         """Get benchmark comparison for the recording"""
         try:
-            benchmark = AgeBenchmark.objects.filter(
-                fitness_test=recording.fitness_test,
-                age_min__lte=recording.athlete.age,
-                age_max__gte=recording.athlete.age,
-                gender=recording.athlete.gender
-            ).first()
+            benchmark = find_benchmark(recording.fitness_test, recording.athlete)
             
             if benchmark and recording.final_score:
-                score = float(recording.final_score)
+                score = Decimal(recording.final_score)
                 
-                # Determine performance category
-                if score >= benchmark.excellent_threshold:
-                    category = 'Excellent'
-                elif score >= benchmark.good_threshold:
-                    category = 'Good'
-                elif score >= benchmark.average_threshold:
-                    category = 'Average'
-                else:
-                    category = 'Below Average'
+                # Determine performance category (timed tests: lower is better)
+                category = {
+                    'excellent': 'Excellent',
+                    'good': 'Good',
+                    'average': 'Average',
+                }.get(threshold_level(score, benchmark), 'Below Average')
                 
                 return {
-                    'athlete_score': score,
+                    'athlete_score': float(score),
                     'benchmark_excellent': float(benchmark.excellent_threshold),
                     'benchmark_good': float(benchmark.good_threshold),
                     'benchmark_average': float(benchmark.average_threshold),
@@ -535,33 +853,72 @@ class TestRecordingViewSet(viewsets.ModelViewSet):
         
         return None
 
-class LeaderboardViewSet(viewsets.ReadOnlyModelViewSet):
+def participant_count(**filters):
+    """Leaderboard rows matching ``filters`` without a full COUNT per request.
+
+    A complete partition reads the participant count of its
+    LeaderboardPartition row; other filter combinations are counted once
+    and cached for LEADERBOARD_COUNT_TTL seconds.
+    """
+    partitions = {
+        'national': {'fitness_test_id'},
+        'state': {'fitness_test_id', 'state'},
+    }
+    if set(filters) - {'leaderboard_type'} == partitions.get(filters.get('leaderboard_type')):
+        return LeaderboardPartition.objects.filter(**filters).values_list('participants', flat=True).first() or 0
+
+    key = 'leaderboard_count:' + hashlib.sha1(repr(sorted(filters.items())).encode()).hexdigest()
+    count = cache.get(key)
+    if count is None:
+        count = Leaderboard.objects.filter(**filters).count()
+        cache.set(key, count, getattr(settings, 'LEADERBOARD_COUNT_TTL', 300))
+    return count
+
+
+def page_limit(request, default):
+    """``limit`` query parameter clamped to LEADERBOARD_MAX_PAGE_SIZE; ValueError if not a number"""
+    limit = int(request.query_params.get('limit', default))
+    return max(1, min(limit, getattr(settings, 'LEADERBOARD_MAX_PAGE_SIZE', 200)))
+
+
+class LeaderboardViewSet(EagerLoadingMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Leaderboard.objects.all()
     serializer_class = LeaderboardSerializer
     
     @action(detail=False, methods=['get'])
+    @read_replica
+    @statement_timeout(5000)
     def national_rankings(self, request):
-        """Get national leaderboard rankings"""
+        """Get national leaderboard rankings (keyset pages: pass back ``next_cursor`` as ``cursor``)"""
         test_id = request.query_params.get('test_id')
         age_group = request.query_params.get('age_group')
         gender = request.query_params.get('gender')
-        limit = int(request.query_params.get('limit', 100))
-        
-        queryset = Leaderboard.objects.filter(leaderboard_type='national')
+        try:
+            limit = page_limit(request, 100)
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
         
+        filters = {'leaderboard_type': 'national'}
         if test_id:
-            queryset = queryset.filter(fitness_test_id=test_id)
+            filters['fitness_test_id'] = test_id
         if age_group:
-            queryset = queryset.filter(age_group=age_group)
+            filters['age_group'] = age_group
         if gender:
-            queryset = queryset.filter(gender=gender)
+            filters['gender'] = gender
         
-        rankings = queryset.order_by('current_rank')[:limit]
+        try:
+            rankings, next_cursor = keyset_page(
+                eager_load(Leaderboard.objects.filter(**filters), LeaderboardSerializer),
+                request.query_params.get('cursor'), limit
+            )
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         serializer = LeaderboardSerializer(rankings, many=True)
         
         return Response({
             'rankings': serializer.data,
-            'total_participants': queryset.count(),
+            'next_cursor': next_cursor,
+            'total_participants': participant_count(**filters),
             'filters_applied': {
                 'test_id': test_id,
                 'age_group': age_group,
@@ -570,43 +927,53 @@ class LeaderboardViewSet(viewsets.ReadOnlyModelViewSet):
         })
     
     @action(detail=False, methods=['get'])
+    @read_replica
+    @statement_timeout(5000)
     def state_rankings(self, request):
-        """Get state-wise leaderboard rankings"""
+        """Get state-wise leaderboard rankings (keyset pages: pass back ``next_cursor`` as ``cursor``)"""
         state = request.query_params.get('state')
         if not state:
             return Response({'error': 'State parameter required'}, 
                            status=status.HTTP_400_BAD_REQUEST)
         
         test_id = request.query_params.get('test_id')
-        limit = int(request.query_params.get('limit', 50))
-        
-        queryset = Leaderboard.objects.filter(
-            leaderboard_type='state',
-            state=state
-        )
+        try:
+            limit = page_limit(request, 50)
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
         
+        filters = {'leaderboard_type': 'state', 'state': state}
         if test_id:
-            queryset = queryset.filter(fitness_test_id=test_id)
+            filters['fitness_test_id'] = test_id
         
-        rankings = queryset.order_by('current_rank')[:limit]
+        try:
+            rankings, next_cursor = keyset_page(
+                eager_load(Leaderboard.objects.filter(**filters), LeaderboardSerializer),
+                request.query_params.get('cursor'), limit
+            )
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         serializer = LeaderboardSerializer(rankings, many=True)
         
         return Response({
             'state': state,
             'rankings': serializer.data,
-            'total_participants': queryset.count()
+            'next_cursor': next_cursor,
+            'total_participants': participant_count(**filters)
         })
     
     @action(detail=False, methods=['get'])
+    @read_replica
+    @statement_timeout(3000)
     def athlete_rankings(self, request):
         """Get specific athlete's rankings across all categories"""
         if not getattr(self.request, 'is_authenticated', False):
             return Response({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
             
         try:
-            athlete = AthleteProfile.objects.get(auth_user_id=request.user_id)
+            athlete = current_athlete(request)
             rankings = Leaderboard.objects.filter(athlete=athlete)
-            serializer = LeaderboardSerializer(rankings, many=True)
+            serializer = LeaderboardSerializer(eager_load(rankings, LeaderboardSerializer), many=True)
             
             return Response({
                 'athlete_name': athlete.full_name,
@@ -634,7 +1001,7 @@ class BadgeViewSet(viewsets.ReadOnlyModelViewSet):
             return Response({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
             
         try:
-            athlete = AthleteProfile.objects.get(auth_user_id=request.user_id)
+            athlete = current_athlete(request)
             earned_badges = AthleteBadge.objects.filter(athlete=athlete).select_related('badge')
             serializer = AthleteBadgeSerializer(earned_badges, many=True)
             
@@ -651,7 +1018,7 @@ class BadgeViewSet(viewsets.ReadOnlyModelViewSet):
             return Response({'error': 'Athlete profile not found'}, 
                            status=status.HTTP_404_NOT_FOUND)
 
-class SAISubmissionViewSet(viewsets.ReadOnlyModelViewSet):
+class SAISubmissionViewSet(EagerLoadingMixin, viewsets.ReadOnlyModelViewSet):
     queryset = SAISubmission.objects.all()
     serializer_class = SAISubmissionSerializer
     
@@ -697,7 +1064,7 @@ class SAISubmissionViewSet(viewsets.ReadOnlyModelViewSet):
         })
 
 # Utility Views
-class ExerciseUploadViewSet(viewsets.ModelViewSet):
+class ExerciseUploadViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     """Handle exercise video/image uploads with dummy analysis"""
     queryset = ExerciseUpload.objects.all()
     serializer_class = ExerciseUploadSerializer
@@ -715,7 +1082,7 @@ class ExerciseUploadViewSet(viewsets.ModelViewSet):
         
         # Filter by athlete profile
         try:
-            athlete = AthleteProfile.objects.get(auth_user_id=self.request.user_id)
+            athlete = current_athlete(self.request)
             return ExerciseUpload.objects.filter(athlete=athlete)
         except AthleteProfile.DoesNotExist:
             return ExerciseUpload.objects.none()
@@ -734,19 +1101,20 @@ class ExerciseUploadViewSet(viewsets.ModelViewSet):
         
         try:
             # Get athlete profile
-            athlete = AthleteProfile.objects.get(auth_user_id=request.user_id)
+            athlete = current_athlete(request)
             print(f"DEBUG: Athlete found: {athlete.full_name}")
             
             # Extract data from request
             exercise_type = request.data.get('exercise_type')
             video_url = request.data.get('video_url')  # From Supabase
             video_file = request.FILES.get('video_file')  # Fallback file upload
+            upload_id = request.data.get('upload_id')  # Completed resumable upload
             duration = request.data.get('duration', 0)
             
-            if not exercise_type or (not video_url and not video_file):
+            if not exercise_type or (not video_url and not video_file and not upload_id):
                 return Response({
                     'success': False,
-                    'error': 'exercise_type and either video_url or video_file are required'
+                    'error': 'exercise_type and one of video_url, video_file or upload_id are required'
                 }, status=status.HTTP_400_BAD_REQUEST)
             
             # Validate exercise type
@@ -759,12 +1127,21 @@ class ExerciseUploadViewSet(viewsets.ModelViewSet):
             
             # Handle video URL (Supabase) or file upload (fallback)
             final_url = video_url
-            if not video_url and video_file:
+            if not video_url and upload_id:
+                try:
+                    _, name, _ = attach_resumable_upload(upload_id, athlete)
+                except (ResumableUpload.DoesNotExist, ValidationError):
+                    return Response({
+                        'success': False,
+                        'error': 'No completed resumable upload with this id'
+                    }, status=status.HTTP_409_CONFLICT)
+                final_url = content_store.media_url(request, name)
+            elif not video_url and video_file:
                 print(f"DEBUG: Using fallback file upload for video")
                 # Save file locally as fallback
                 file_name = f"exercise_videos/{athlete.id}_{uuid.uuid4()}.mp4"
-                file_path = default_storage.save(file_name, video_file)
-                final_url = f"http://172.27.75.222:8000/media/{file_path}"
+                file_path = get_storage().save_file(file_name, video_file)
+                final_url = get_storage().reference(file_path, request)
             else:
                 print(f"DEBUG: Using Supabase video URL: {video_url}")
             
@@ -822,7 +1199,7 @@ class ExerciseUploadViewSet(viewsets.ModelViewSet):
         
         try:
             # Get athlete profile
-            athlete = AthleteProfile.objects.get(auth_user_id=request.user_id)
+            athlete = current_athlete(request)
             
             # Extract data from request
             exercise_type = request.data.get('exercise_type')
@@ -849,8 +1226,8 @@ class ExerciseUploadViewSet(viewsets.ModelViewSet):
                 print(f"DEBUG: Using fallback file upload for image")
                 # Save file locally as fallback
                 file_name = f"exercise_images/{athlete.id}_{uuid.uuid4()}.jpg"
-                file_path = default_storage.save(file_name, image_file)
-                final_url = f"http://172.27.75.222:8000/media/{file_path}"
+                file_path = get_storage().save_file(file_name, image_file)
+                final_url = get_storage().reference(file_path, request)
             else:
                 print(f"DEBUG: Using Supabase image URL: {image_url}")
             
@@ -934,7 +1311,7 @@ class ExerciseUploadViewSet(viewsets.ModelViewSet):
             }, status=status.HTTP_401_UNAUTHORIZED)
         
         try:
-            athlete = AthleteProfile.objects.get(auth_user_id=request.user_id)
+            athlete = current_athlete(request)
             uploads = ExerciseUpload.objects.filter(athlete=athlete).order_by('-created_at')
             
             uploads_data = []
@@ -961,35 +1338,173 @@ class ExerciseUploadViewSet(viewsets.ModelViewSet):
             }, status=status.HTTP_404_NOT_FOUND)
 
 
+class ResumableUploadViewSet(viewsets.ViewSet):
+    """tus-style resumable uploads: create, PATCH byte ranges, HEAD for the offset.
+    
+    Once every byte has arrived, pass the upload id as ``upload_id`` to
+    test-recordings/upload_video or exercise-uploads/upload_video.
+    """
+    TUS_VERSION = '1.0.0'
+    
+    def get_athlete(self, request):
+        if not getattr(request, 'is_authenticated', False):
+            return None
+        return get_current_user_profile(request)
+    
+    def tus_response(self, upload, status_code=status.HTTP_200_OK, data=None, offset=None):
+        if offset is None:
+            # The spool is the source of truth while bytes are arriving
+            offset = UploadSpool(upload.id).size if upload.status == 'in_progress' else upload.upload_offset
+        response = Response(data, status=status_code)
+        response['Tus-Resumable'] = self.TUS_VERSION
+        response['Upload-Offset'] = str(offset)
+        response['Upload-Length'] = str(upload.upload_length)
+        response['Cache-Control'] = 'no-store'
+        return response
+    
+    def create(self, request):
+        """Declare a new upload; the body of later PATCH requests fills it"""
+        athlete = self.get_athlete(request)
+        if athlete is None:
+            return Response({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
+        
+        upload_length = request.META.get('HTTP_UPLOAD_LENGTH') or request.data.get('upload_length')
+        try:
+            upload_length = int(upload_length)
+        except (TypeError, ValueError):
+            return Response({'error': 'Upload-Length header or upload_length is required'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        max_size = getattr(settings, 'RESUMABLE_UPLOAD_MAX_SIZE', 500 * 1024 * 1024)
+        if upload_length <= 0 or upload_length > max_size:
+            return Response({'error': f'Upload-Length must be between 1 and {max_size} bytes'},
+                            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        
+        upload = ResumableUpload.objects.create(
+            athlete=athlete,
+            filename=request.data.get('filename', ''),
+            upload_length=upload_length
+        )
+        UploadSpool(upload.id).create()
+        
+        response = self.tus_response(upload, status.HTTP_201_CREATED, ResumableUploadSerializer(upload).data)
+        response['Location'] = request.build_absolute_uri(f'{request.path.rstrip("/")}/{upload.id}/')
+        return response
+    
+    def retrieve(self, request, pk=None):
+        """Current offset (also answers HEAD, as tus clients expect)"""
+        athlete = self.get_athlete(request)
+        upload = ResumableUpload.objects.filter(id=pk, athlete=athlete).first() if athlete else None
+        if upload is None:
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+        return self.tus_response(upload, data=ResumableUploadSerializer(upload).data)
+    
+    def partial_update(self, request, pk=None):
+        """Append the raw body at the Upload-Offset header position"""
+        athlete = self.get_athlete(request)
+        if athlete is None:
+            return Response({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
+        
+        try:
+            offset = int(request.META['HTTP_UPLOAD_OFFSET'])
+        except (KeyError, ValueError):
+            return Response({'error': 'Upload-Offset header is required'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        upload = ResumableUpload.objects.filter(id=pk, athlete=athlete).first()
+        if upload is None:
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+        if upload.status != 'in_progress':
+            return self.tus_response(upload, status.HTTP_409_CONFLICT, {'error': 'Upload already complete'})
+        
+        remaining = max(upload.upload_length - offset, 0)
+        if offset <= upload.upload_length and int(request.META.get('CONTENT_LENGTH') or 0) > remaining:
+            return self.tus_response(upload, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                                     {'error': 'Body runs past Upload-Length'})
+        
+        # The body is copied outside any transaction (slow links would hold a
+        # row lock for minutes); the spool's file lock serialises writers
+        spool = UploadSpool(upload.id)
+        try:
+            spool.append_stream(request.stream or io.BytesIO(), offset, limit=remaining)
+        except OffsetMismatch as e:
+            return self.tus_response(upload, status.HTTP_409_CONFLICT,
+                                     {'error': 'Upload-Offset does not match bytes received'}, offset=e.expected)
+        except OSError:
+            # Client went away mid-body: keep what arrived so it can resume from there
+            self.record_offset(upload.id)
+            raise
+        
+        return self.tus_response(self.record_offset(upload.id), status.HTTP_204_NO_CONTENT)
+    
+    def record_offset(self, upload_id):
+        """Copy the spool size onto the upload row, completing it once every byte has arrived"""
+        with transaction.atomic():
+            upload = ResumableUpload.objects.select_for_update().get(id=upload_id)
+            size = UploadSpool(upload.id).size
+            if upload.status == 'in_progress' and size != upload.upload_offset:
+                upload.upload_offset = size
+                if size >= upload.upload_length:
+                    upload.status = 'completed'
+                upload.save(update_fields=['upload_offset', 'status', 'updated_at'])
+        return upload
+    
+    def destroy(self, request, pk=None):
+        """Abandon an upload and free its bytes"""
+        athlete = self.get_athlete(request)
+        upload = ResumableUpload.objects.filter(id=pk, athlete=athlete).first() if athlete else None
+        if upload is None:
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        UploadSpool(upload.id).cleanup()
+        upload.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+def attach_resumable_upload(upload_id, athlete):
+    """Move a completed resumable upload into the content store.
+    
+    Returns (digest, storage name, size in bytes); raises
+    ResumableUpload.DoesNotExist when there is no completed upload with that
+    id for the athlete.
+    """
+    with transaction.atomic():
+        # Row lock: of two concurrent finalizes only one finds the upload completed
+        upload = ResumableUpload.objects.select_for_update().get(id=upload_id, athlete=athlete, status='completed')
+        video_digest, name = content_store.store_file(UploadSpool(upload.id).path)
+        UploadSpool(upload.id).cleanup()
+        upload.status = 'finalized'
+        upload.save(update_fields=['status', 'updated_at'])
+    return video_digest, name, upload.upload_length
+
+
 class StatsViewSet(viewsets.ViewSet):
     """Platform statistics for dashboard"""
     
     @action(detail=False, methods=['get'])
+    @read_replica
+    @statement_timeout(5000)
     def platform_stats(self, request):
-        """Get overall platform statistics"""
-        stats = {
-            'total_athletes': AthleteProfile.objects.count(),
-            'total_assessments': AssessmentSession.objects.filter(status='completed').count(),
-            'total_videos_analyzed': TestRecording.objects.filter(processing_status='completed').count(),
-            'avg_talent_score': AthleteProfile.objects.aggregate(
-                avg_score=Avg('overall_talent_score')
-            )['avg_score'],
-            'top_performing_states': list(
-                AthleteProfile.objects.values('state')
-                .annotate(avg_score=Avg('overall_talent_score'))
-                .order_by('-avg_score')[:10]
-            ),
-            'recent_activity': {
-                'new_athletes_this_week': AthleteProfile.objects.filter(
-                    created_at__gte=timezone.now() - timedelta(days=7)
-                ).count(),
-                'assessments_this_week': AssessmentSession.objects.filter(
-                    created_at__gte=timezone.now() - timedelta(days=7)
-                ).count()
-            }
-        }
+        """Get overall platform statistics (incremental counters, cached; see platform_stats.py)"""
+        return Response(get_platform_stats())
+    
+    @action(detail=False, methods=['get'])
+    def queue_metrics(self, request):
+        """Depth and wait-time statistics of the video analysis queues"""
+        user_role = getattr(self.request, 'user_role', 'authenticated')
+        if user_role != 'sai_official':
+            return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
         
-        return Response(stats)
+        from .scheduling import queue_metrics
+        return Response({'queues': queue_metrics(), 'generated_at': timezone.now()})
+    
+    @action(detail=False, methods=['get'])
+    def auth_metrics(self, request):
+        """Token verification cache hits and latency of this server process"""
+        user_role = getattr(self.request, 'user_role', 'authenticated')
+        if user_role != 'sai_official':
+            return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
+        
+        return Response({**token_verifier.metrics(), 'generated_at': timezone.now()})
     
     @action(detail=False, methods=['get'])
     def athlete_stats(self, request):
@@ -998,7 +1513,7 @@ class StatsViewSet(viewsets.ViewSet):
             return Response({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
             
         try:
-            athlete = AthleteProfile.objects.get(auth_user_id=request.user_id)
+            athlete = current_athlete(request)
             
             stats = {
                 'personal_best_scores': list(
@@ -1239,10 +1754,6 @@ def custom_500(request):
 def login(request):
     """Flutter → Django login endpoint that authenticates with Supabase"""
     try:
-        from supabase import create_client, Client
-        import os
-        from datetime import datetime
-        
         email = request.data.get('email')
         password = request.data.get('password')
         
@@ -1252,33 +1763,24 @@ def login(request):
                 'message': 'Email and password are required'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Initialize Supabase client
-        supabase_url = os.getenv('SUPABASE_URL')
-        supabase_key = os.getenv('SUPABASE_ANON_KEY')
-        supabase: Client = create_client(supabase_url, supabase_key)
-        
-        # Authenticate with Supabase
+        # Authenticate with Supabase (shared pooled client)
         try:
-            auth_response = supabase.auth.sign_in_with_password({
-                "email": email,
-                "password": password
-            })
+            auth_response = get_supabase().sign_in_with_password(email, password)
             
-            if not auth_response.user:
+            if not auth_response or not auth_response.get('user'):
                 return Response({
                     'success': False,
                     'message': 'Invalid email or password'
                 }, status=status.HTTP_401_UNAUTHORIZED)
             
-            user = auth_response.user
-            session = auth_response.session
+            user = auth_response['user']
             
             # Get or create athlete profile in Django
             athlete, created = AthleteProfile.objects.get_or_create(
-                auth_user_id=user.id,
+                auth_user_id=user['id'],
                 defaults={
-                    'email': user.email,
-                    'full_name': user.email.split('@')[0],  # Default name from email
+                    'email': user['email'],
+                    'full_name': user['email'].split('@')[0],  # Default name from email
                     'date_of_birth': datetime(2000, 1, 1).date(),
                     'gender': 'male',
                     'height': 0,
@@ -1290,13 +1792,13 @@ def login(request):
             return Response({
                 'success': True,
                 'message': 'Login successful',
-                'token': session.access_token,
+                'token': auth_response['access_token'],
                 'athlete': AthleteProfileSerializer(athlete).data,
-                'user_id': user.id,
-                'email': user.email
+                'user_id': user['id'],
+                'email': user['email']
             })
             
-        except Exception as e:
+        except SupabaseError as e:
             return Response({
                 'success': False,
                 'message': f'Authentication failed: {str(e)}'
@@ -1314,10 +1816,6 @@ def login(request):
 def register(request):
     """Flutter → Django registration endpoint that creates user in Supabase"""
     try:
-        from supabase import create_client, Client
-        import os
-        from datetime import datetime
-        
         # Extract registration data
         email = request.data.get('email')
         password = request.data.get('password')
@@ -1339,41 +1837,25 @@ def register(request):
                 'message': 'Email and password are required'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Initialize Supabase client
-        supabase_url = os.getenv('SUPABASE_URL')
-        supabase_key = os.getenv('SUPABASE_ANON_KEY')
-        supabase: Client = create_client(supabase_url, supabase_key)
-        
-        # Register with Supabase
+        # Register with Supabase (shared pooled client)
         try:
-            auth_response = supabase.auth.sign_up({
-                "email": email,
-                "password": password,
-                "options": {
-                    "email_confirm": False  # Skip email confirmation for development
-                }
-            })
+            supabase = get_supabase()
+            if (getattr(settings, 'SUPABASE_AUTO_CONFIRM_EMAIL', False)
+                    and getattr(settings, 'SUPABASE_SERVICE_ROLE_KEY', None)):
+                # Development: create the user confirmed (no email), then sign in for a session
+                supabase.create_user(email, password, email_confirm=True)
+                auth_response = supabase.sign_in_with_password(email, password)
+            else:
+                auth_response = supabase.sign_up(email, password)
             
-            if not auth_response.user:
+            # With email confirmation pending, Supabase returns the bare user and no session
+            user = (auth_response or {}).get('user', auth_response)
+            if not user or not user.get('id'):
                 return Response({
                     'success': False,
                     'message': 'Registration failed'
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            user = auth_response.user
-            session = auth_response.session
-            
-            # For development: manually confirm the user
-            # This bypasses the email confirmation step
-            try:
-                # Use admin API to confirm user
-                from supabase.client import create_client
-                admin_client = create_client(supabase_url, os.getenv('SUPABASE_SERVICE_ROLE_KEY', supabase_key))
-                # Note: This would require service role key, but let's try with regular key first
-            except Exception as e:
-                print(f"Admin confirmation failed: {e}")
-                # Continue anyway - user can manually confirm via email
-            
             # Parse date of birth with default
             if isinstance(date_of_birth, str):
                 try:
@@ -1386,9 +1868,9 @@ def register(request):
             
             # Create athlete profile in Django
             athlete = AthleteProfile.objects.create(
-                auth_user_id=user.id,
-                email=user.email,
-                full_name=full_name or user.email.split('@')[0],
+                auth_user_id=user['id'],
+                email=user['email'],
+                full_name=full_name or user['email'].split('@')[0],
                 phone_number=phone_number or '',
                 date_of_birth=date_of_birth,
                 gender=gender,
@@ -1398,20 +1880,23 @@ def register(request):
                 district=district,
                 address=address,
                 pin_code=pincode,
-                aadhaar_number=aadhaar_number or str(user.id)[:12],
+                aadhaar_number=aadhaar_number or str(user['id'])[:12],
                 age=datetime.now().year - date_of_birth.year,
             )
             
+            token = auth_response.get('access_token')
             return Response({
                 'success': True,
-                'message': 'Registration successful',
-                'token': session.access_token if session else None,
+                'message': 'Registration successful' if token else
+                           'Registration successful. Confirm your email address, then log in.',
+                'token': token,
+                'confirmation_required': not token,
                 'athlete': AthleteProfileSerializer(athlete).data,
-                'user_id': user.id,
-                'email': user.email
+                'user_id': user['id'],
+                'email': user['email']
             }, status=status.HTTP_201_CREATED)
             
-        except Exception as e:
+        except SupabaseError as e:
             return Response({
                 'success': False,
                 'message': f'Registration failed: {str(e)}'
@@ -1435,19 +1920,9 @@ def logout(request):
         if auth_header and auth_header.startswith('Bearer '):
             token = auth_header.split(' ')[1]
             
-            # Initialize Supabase client and sign out
-            from supabase import create_client, Client
-            import os
-            
-            supabase_url = os.getenv('SUPABASE_URL')
-            supabase_key = os.getenv('SUPABASE_ANON_KEY')
-            supabase: Client = create_client(supabase_url, supabase_key)
-            
             try:
-                # Set the session token and sign out
-                supabase.auth.set_session(token, '')
-                supabase.auth.sign_out()
-            except:
+                get_supabase().sign_out(token)
+            except SupabaseError:
                 pass  # Ignore errors during sign out
         
         return Response({
@@ -1536,13 +2011,12 @@ def get_athlete_profile(request):
             'error': 'user_id parameter required'
         }, status=status.HTTP_400_BAD_REQUEST)
     
-    try:
-        athlete = AthleteProfile.objects.get(auth_user_id=user_id)
-        return Response({
-            'athlete': AthleteProfileSerializer(athlete).data
-        })
-    except AthleteProfile.DoesNotExist:
+    athlete = load_athlete(user_id)
+    if athlete is None:
         return Response({
             'error': 'Athlete profile not found',
             'message': 'Please complete your profile setup'
         }, status=status.HTTP_404_NOT_FOUND)
+    return Response({
+        'athlete': AthleteProfileSerializer(athlete).data
+    })